@@ -1,14 +1,35 @@
-import { Hono } from "hono";
-import { validateOrganization, validateRepoName } from "./lib/index.js";
+import { type Context, Hono } from "hono";
+import { RequestTimer, streamBatchResponse, validateOrganization, validateRepoName } from "./lib/index.js";
 import { extractToken } from "./services/auth.js";
 import { withCache } from "./services/cache.js";
-import { GitHubRateLimitError, getRepositoryPermission, hasOperationPermission } from "./services/github.js";
-import { processBatchRequest, validateBatchRequest } from "./services/lfs.js";
-import type { LFSBatchRequest } from "./types/index.js";
+import { CircuitOpenError, withCircuitBreaker } from "./services/circuit-breaker.js";
+import { createAppPermissionFetcher, isAppModeEnabled } from "./services/github-app.js";
+import {
+  GitHubRateLimitError,
+  getGitHubRequestPolicy,
+  getRepositoryPermission,
+  hasOperationPermission,
+  type PermissionValidator,
+} from "./services/github.js";
+import {
+  processBatchObjects,
+  processBatchRequest,
+  type ValidationResult,
+  validateBatchRequest,
+} from "./services/lfs.js";
+import { writeBatchMetrics } from "./services/metrics.js";
+import type { LFSBatchRequest, LFSOperation } from "./types/index.js";
 
 const LFS_CONTENT_TYPE = "application/vnd.git-lfs+json";
 
-export const app = new Hono<{ Bindings: Env }>();
+type AppEnv = {
+  Bindings: Env;
+  Variables: { timer: RequestTimer; batch?: { operation: LFSOperation; objects: number } };
+};
+
+const BATCH_ROUTE = "/:org/:repoGit/info/lfs/objects/batch";
+
+export const app = new Hono<AppEnv>();
 
 function lfsJson(c: { json: (data: unknown, status?: number) => Response }, data: unknown, status = 200): Response {
   const response = c.json(data, status);
@@ -16,15 +37,62 @@ function lfsJson(c: { json: (data: unknown, status?: number) => Response }, data
   return response;
 }
 
+function getExecutionContext(c: Context): ExecutionContext | undefined {
+  // Hono throws when the worker is invoked without an execution context (e.g. app.fetch in tests)
+  try {
+    return c.executionCtx;
+  } catch {
+    return undefined;
+  }
+}
+
+interface ParsedBatchRequest {
+  body: LFSBatchRequest;
+  validation: ValidationResult;
+}
+
+async function parseBatchRequest(c: Context<AppEnv>): Promise<ParsedBatchRequest | null> {
+  let body: LFSBatchRequest;
+  try {
+    body = await c.req.json();
+  } catch {
+    return null;
+  }
+  return { body, validation: validateBatchRequest(body, c.env.MAX_BATCH_OBJECTS) };
+}
+
 // Health check endpoint
 app.get("/health", (c) => {
   return c.json({ status: "ok" });
 });
 
+// Per-stage timings of batch requests, reported in Server-Timing. Metrics and the optional log record are
+// written once every stage is done, which for streamed batches is after the response headers went out
+app.use(BATCH_ROUTE, async (c, next) => {
+  const timer = new RequestTimer();
+  c.set("timer", timer);
+  await timer.measure("total", next);
+  c.res.headers.set("Server-Timing", timer.toServerTiming());
+
+  const { path } = c.req;
+  const { status } = c.res;
+  const { operation = "unknown", objects = 0 } = c.get("batch") ?? {};
+  const report = () => {
+    writeBatchMetrics(c.env, { org: c.req.param("org"), operation, objects, status, timer });
+    if (c.env.LOG_TIMINGS) {
+      // biome-ignore lint/suspicious/noConsole: opt-in timing log
+      console.log(JSON.stringify({ message: "lfs batch", path, status, timings: timer.toJSON() }));
+    }
+  };
+  const reported = timer.settled().then(report);
+  getExecutionContext(c)?.waitUntil(reported);
+});
+
 // LFS Batch API endpoint
-app.post("/:org/:repoGit/info/lfs/objects/batch", async (c) => {
+app.post(BATCH_ROUTE, async (c) => {
   const { org, repoGit } = c.req.param();
   const repo = repoGit.replace(/\.git$/, "");
+  const timer = c.get("timer");
 
   // 1. Extract and validate token
   const token = extractToken(c.req.raw);
@@ -44,11 +112,25 @@ app.post("/:org/:repoGit/info/lfs/objects/batch", async (c) => {
     return lfsJson(c, { message: "Invalid repository name" }, 400);
   }
 
-  // 4. Get GitHub permission (with caching)
-  const getCachedPermission = withCache(c.env, getRepositoryPermission);
+  // 4. Start the GitHub permission lookup (with caching) and parse/validate the body while it runs
+  const policy = getGitHubRequestPolicy(c.env);
+  const fetchPermission = isAppModeEnabled(c.env)
+    ? createAppPermissionFetcher(c.env)
+    : (token: string, org: string, repo: string, validator?: PermissionValidator) =>
+        getRepositoryPermission(token, org, repo, validator, policy);
+  const getCachedPermission = withCache(
+    c.env,
+    withCircuitBreaker(c.env, fetchPermission),
+    getExecutionContext(c),
+    timer
+  );
+  const permissionLookup = timer.measure("permission", () => getCachedPermission(token, org, repo));
+  const batchRequest = timer.measure("body", () => parseBatchRequest(c));
+
+  // 5. Wait for the permission; its errors take precedence over body errors
   let permission: Awaited<ReturnType<typeof getRepositoryPermission>>;
   try {
-    permission = await getCachedPermission(token, org, repo);
+    permission = await permissionLookup;
   } catch (error) {
     if (error instanceof GitHubRateLimitError) {
       const retryAfter =
@@ -59,37 +141,45 @@ app.post("/:org/:repoGit/info/lfs/objects/batch", async (c) => {
       }
       return response;
     }
+    if (error instanceof CircuitOpenError) {
+      const response = lfsJson(c, { message: "Upstream service unavailable" }, 503);
+      response.headers.set("Retry-After", String(error.retryAfter));
+      return response;
+    }
     if (error instanceof Error && error.message.includes("GitHub API error:")) {
       return lfsJson(c, { message: "Upstream service error" }, 502);
     }
     return lfsJson(c, { message: "Internal server error" }, 500);
   }
 
-  // 5. Check permission level (no access)
+  // 6. Check permission level (no access)
   if (permission === "none") {
     return lfsJson(c, { message: "Access denied" }, 403);
   }
 
-  // 6. Parse request body
-  let body: LFSBatchRequest;
-  try {
-    body = await c.req.json();
-  } catch {
+  // 7. Report body errors (invalid JSON, then batch validation)
+  const parsed = await batchRequest;
+  if (!parsed) {
     return lfsJson(c, { message: "Invalid JSON body" }, 422);
   }
-
-  // 7. Validate batch request
-  const validation = validateBatchRequest(body);
+  const { body, validation } = parsed;
   if (!validation.valid) {
     return lfsJson(c, { message: validation.error }, validation.status);
   }
 
+  c.set("batch", { operation: body.operation, objects: body.objects.length });
+
   // 8. Check operation permission
   if (!hasOperationPermission(permission, body.operation)) {
     return lfsJson(c, { message: "Insufficient permissions for this operation" }, 403);
   }
 
-  // 9. Process batch request
-  const response = await processBatchRequest(c.env, org, repo, body);
+  // 9. Process batch request; large batches are streamed object by object instead of serialized in one go
+  if (body.objects.length >= (c.env.STREAM_RESPONSE_MIN_OBJECTS ?? Number.POSITIVE_INFINITY)) {
+    const batch = processBatchObjects(c.env, org, repo, body, timer);
+    void timer.measure("batch", () => batch.done);
+    return c.body(streamBatchResponse(batch.response), 200, { "Content-Type": LFS_CONTENT_TYPE });
+  }
+  const response = await timer.measure("batch", () => processBatchRequest(c.env, org, repo, body, timer));
   return lfsJson(c, response, 200);
 });
@@ -1 +1,16 @@
-export { isValidOID, isValidSize, parseAllowedOrgs, validateOrganization, validateRepoName } from "./validation.js";
+export { mapWithConcurrency } from "./concurrency.js";
+export { streamBatchResponse } from "./json-stream.js";
+export type { LRUWeightOptions } from "./lru.js";
+export { LRUCache } from "./lru.js";
+export { RequestTimer, timed } from "./timing.js";
+export type { OrgAllowlist } from "./validation.js";
+export {
+  compileAllowedOrgs,
+  getAllowedOrgs,
+  isOrgAllowed,
+  isValidOID,
+  isValidSize,
+  parseAllowedOrgs,
+  validateOrganization,
+  validateRepoName,
+} from "./validation.js";
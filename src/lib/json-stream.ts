@@ -0,0 +1,32 @@
+import type { PendingBatchResponse } from "../types/index.js";
+
+const encoder = new TextEncoder();
+
+// Produces the same bytes as JSON.stringify(response), but one object per chunk, so a large batch is never
+// held as a single string. The head goes out right away and each object is written as soon as it and every
+// object before it have settled, instead of after the slowest object in the batch
+export function streamBatchResponse(response: PendingBatchResponse): ReadableStream<Uint8Array> {
+  const { transfer, objects, hash_algo } = response;
+  const pending: (Promise<unknown> | undefined)[] = [...objects];
+  let next = -1;
+
+  return new ReadableStream<Uint8Array>({
+    async pull(controller) {
+      if (next < 0) {
+        const head = transfer === undefined ? "" : `"transfer":${JSON.stringify(transfer)},`;
+        controller.enqueue(encoder.encode(`{${head}"objects":[`));
+      } else if (next < pending.length) {
+        const object = await pending[next];
+        // Drop the written object so the stream does not keep the whole batch alive
+        pending[next] = undefined;
+        const separator = next > 0 ? "," : "";
+        controller.enqueue(encoder.encode(`${separator}${JSON.stringify(object)}`));
+      } else {
+        const tail = hash_algo === undefined ? "" : `,"hash_algo":${JSON.stringify(hash_algo)}`;
+        controller.enqueue(encoder.encode(`]${tail}}`));
+        controller.close();
+      }
+      next++;
+    },
+  });
+}
@@ -0,0 +1,71 @@
+interface LRUEntry<V> {
+  value: V;
+  expiresAt: number;
+  weight: number;
+}
+
+export interface LRUWeightOptions<V> {
+  // Upper bound on the summed weight of all entries, in addition to maxEntries
+  maxWeight: number;
+  weigh: (value: V) => number;
+}
+
+export class LRUCache<V> {
+  readonly maxEntries: number;
+  private readonly entries = new Map<string, LRUEntry<V>>();
+  private readonly weights?: LRUWeightOptions<V>;
+  private totalWeight = 0;
+
+  constructor(maxEntries: number, weights?: LRUWeightOptions<V>) {
+    this.maxEntries = maxEntries;
+    this.weights = weights;
+  }
+
+  get size(): number {
+    return this.entries.size;
+  }
+
+  get(key: string, now = Date.now()): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      return undefined;
+    }
+    if (entry.expiresAt <= now) {
+      this.delete(key);
+      return undefined;
+    }
+    // Map preserves insertion order, so re-inserting marks the entry as most recently used
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  set(key: string, value: V, ttlMs: number, now = Date.now()): void {
+    this.delete(key);
+    if (ttlMs <= 0) {
+      return;
+    }
+    const weight = this.weights?.weigh(value) ?? 0;
+    this.entries.set(key, { value, expiresAt: now + ttlMs, weight });
+    this.totalWeight += weight;
+    // An entry heavier than maxWeight on its own is evicted right away
+    while (this.entries.size > this.maxEntries || this.totalWeight > (this.weights?.maxWeight ?? Infinity)) {
+      const oldest = this.entries.keys().next();
+      if (oldest.done) break;
+      this.delete(oldest.value);
+    }
+  }
+
+  delete(key: string): void {
+    const entry = this.entries.get(key);
+    if (entry) {
+      this.totalWeight -= entry.weight;
+      this.entries.delete(key);
+    }
+  }
+
+  clear(): void {
+    this.entries.clear();
+    this.totalWeight = 0;
+  }
+}
@@ -0,0 +1,56 @@
+// Collects the duration of each stage of one request. Stages may overlap (the body is parsed while the
+// permission lookup runs), so each is measured on its own rather than as a slice of the total.
+// Workers only advance the clock on I/O, so the durations are time spent waiting on KV, GitHub and R2
+export class RequestTimer {
+  private readonly durations = new Map<string, number>();
+  private readonly counters = new Map<string, number>();
+  private readonly inflight = new Set<Promise<unknown>>();
+
+  record(name: string, duration: number): void {
+    this.durations.set(name, (this.durations.get(name) ?? 0) + duration);
+  }
+
+  getDuration(name: string): number | undefined {
+    return this.durations.get(name);
+  }
+
+  // Counters (cache hits, R2 calls) travel with the timings but are not part of Server-Timing
+  count(name: string, amount = 1): void {
+    this.counters.set(name, (this.counters.get(name) ?? 0) + amount);
+  }
+
+  getCount(name: string): number {
+    return this.counters.get(name) ?? 0;
+  }
+
+  measure<T>(name: string, work: () => Promise<T>): Promise<T> {
+    const start = performance.now();
+    const result = work().finally(() => {
+      this.record(name, performance.now() - start);
+      this.inflight.delete(result);
+    });
+    this.inflight.add(result);
+    return result;
+  }
+
+  // Resolves once every stage started so far has finished, e.g. a streamed batch that outlives its headers
+  async settled(): Promise<void> {
+    while (this.inflight.size > 0) {
+      await Promise.allSettled(this.inflight);
+    }
+  }
+
+  toJSON(): Record<string, number> {
+    return Object.fromEntries([...this.durations].map(([name, duration]) => [name, Math.round(duration * 10) / 10]));
+  }
+
+  toServerTiming(): string {
+    return Object.entries(this.toJSON())
+      .map(([name, duration]) => `${name};dur=${duration}`)
+      .join(", ");
+  }
+}
+
+export function timed<T>(timer: RequestTimer | undefined, name: string, work: () => Promise<T>): Promise<T> {
+  return timer ? timer.measure(name, work) : work();
+}
@@ -3,6 +3,17 @@ const ORG_NAME_REGEX = /^[a-zA-Z0-9_-]+$/;
 const MAX_ORG_LENGTH = 255;
 const REPO_NAME_REGEX = /^[a-zA-Z0-9_.-]+$/;
 const MAX_REPO_LENGTH = 100;
+const WILDCARD = "*";
+
+export interface OrgAllowlist {
+  any: boolean;
+  exact: ReadonlySet<string>;
+  prefixes: ReadonlySet<string>;
+  prefixLengths: readonly number[];
+}
+
+// ALLOWED_ORGS only changes with a deploy, so the compiled allowlist is kept for the lifetime of the isolate
+let compiledAllowlist: { raw: string; allowlist: OrgAllowlist } | undefined;
 
 export function isValidOID(oid: string): boolean {
   return OID_REGEX.test(oid);
@@ -19,6 +30,41 @@ export function parseAllowedOrgs(allowedOrgs: string): string[] {
     .filter((org) => org.length > 0);
 }
 
+// Entries are exact names, "*" for any organization, or a prefix followed by "*" (e.g. "acme-*")
+export function compileAllowedOrgs(allowedOrgs: string): OrgAllowlist {
+  const exact = new Set<string>();
+  const prefixes = new Set<string>();
+  let any = false;
+
+  for (const entry of parseAllowedOrgs(allowedOrgs)) {
+    if (entry === WILDCARD) {
+      any = true;
+    } else if (entry.endsWith(WILDCARD)) {
+      prefixes.add(entry.slice(0, -WILDCARD.length));
+    } else {
+      exact.add(entry);
+    }
+  }
+
+  const prefixLengths = Array.from(new Set(Array.from(prefixes, (prefix) => prefix.length)));
+  return { any, exact, prefixes, prefixLengths };
+}
+
+export function getAllowedOrgs(allowedOrgs: string): OrgAllowlist {
+  if (compiledAllowlist?.raw !== allowedOrgs) {
+    compiledAllowlist = { raw: allowedOrgs, allowlist: compileAllowedOrgs(allowedOrgs) };
+  }
+  return compiledAllowlist.allowlist;
+}
+
+export function isOrgAllowed(allowlist: OrgAllowlist, org: string): boolean {
+  if (allowlist.any || allowlist.exact.has(org)) {
+    return true;
+  }
+  // One set lookup per distinct prefix length keeps the check independent of the number of rules
+  return allowlist.prefixLengths.some((length) => allowlist.prefixes.has(org.slice(0, length)));
+}
+
 export function validateOrganization(env: Env, org: string): boolean {
   if (!org || org.length > MAX_ORG_LENGTH) {
     return false;
@@ -28,8 +74,7 @@ export function validateOrganization(env: Env, org: string): boolean {
     return false;
   }
 
-  const allowedOrgs = parseAllowedOrgs(env.ALLOWED_ORGS);
-  return allowedOrgs.includes(org);
+  return isOrgAllowed(getAllowedOrgs(env.ALLOWED_ORGS), org);
 }
 
 export function validateRepoName(repo: string): boolean {
@@ -1,6 +1,39 @@
+import { LRUCache } from "../lib/lru.js";
+import { type RequestTimer, timed } from "../lib/timing.js";
 import type { PermissionLevel } from "../types/index.js";
+import type { PermissionValidator } from "./github.js";
+import { GitHubRateLimitError } from "./github.js";
+import { getRateLimit, RATE_LIMIT_RESERVE, recordRateLimit } from "./rate-limit.js";
 
 const VALID_PERMISSIONS: readonly PermissionLevel[] = ["admin", "write", "read", "none"];
+const MEMORY_CACHE_MAX_ENTRIES = 1000;
+const MEMORY_CACHE_TTL = 60;
+
+// Per-isolate tier in front of KV; repeated batch calls from one client usually land on the same isolate
+const memoryCache = new LRUCache<PermissionLevel>(MEMORY_CACHE_MAX_ENTRIES);
+
+// Concurrent misses for the same key share a single KV read and GitHub call
+const inflightLookups = new Map<string, Promise<PermissionLevel>>();
+const backgroundRefreshes = new Set<string>();
+
+type PermissionFetcher = (
+  token: string,
+  org: string,
+  repo: string,
+  validator?: PermissionValidator
+) => Promise<PermissionLevel>;
+
+interface CacheMetadata {
+  staleAt: number;
+  etag?: string;
+}
+
+interface CachedPermission {
+  permission: PermissionLevel;
+  stale: boolean;
+  etag?: string;
+  staleAt?: number;
+}
 
 export function isValidPermission(value: string | null): value is PermissionLevel {
   return value !== null && VALID_PERMISSIONS.includes(value as PermissionLevel);
@@ -14,9 +47,66 @@ export async function hashToken(token: string): Promise<string> {
   return hashArray.map((b) => b.toString(16).padStart(2, "0")).join("");
 }
 
+function formatCacheKey(tokenHash: string, org: string, repo: string): string {
+  return `perm:${tokenHash}:${org}/${repo}`;
+}
+
 export async function generateCacheKey(token: string, org: string, repo: string): Promise<string> {
-  const hash = await hashToken(token);
-  return `perm:${hash}:${org}/${repo}`;
+  return formatCacheKey(await hashToken(token), org, repo);
+}
+
+async function readPermission(env: Env, key: string): Promise<PermissionLevel | null> {
+  const cached = await env.AUTH_CACHE.get(key);
+  return isValidPermission(cached) ? cached : null;
+}
+
+function getStaleTtl(env: Env): number {
+  return env.AUTH_CACHE_STALE_TTL ?? 0;
+}
+
+// With a stale TTL, entries outlive AUTH_CACHE_TTL in KV and carry the time they become stale as metadata
+async function readEntry(env: Env, key: string): Promise<CachedPermission | null> {
+  if (getStaleTtl(env) <= 0) {
+    const permission = await readPermission(env, key);
+    return permission === null ? null : { permission, stale: false };
+  }
+
+  const { value, metadata } = await env.AUTH_CACHE.getWithMetadata<CacheMetadata>(key);
+  if (!isValidPermission(value)) {
+    return null;
+  }
+  return {
+    permission: value,
+    stale: metadata !== null && metadata.staleAt <= Date.now(),
+    etag: metadata?.etag,
+    staleAt: metadata?.staleAt,
+  };
+}
+
+// The ETag is only kept when entries outlive their freshness, since it is only used to revalidate stale entries
+async function writePermission(env: Env, key: string, permission: PermissionLevel, etag?: string): Promise<void> {
+  const staleTtl = getStaleTtl(env);
+  if (staleTtl <= 0) {
+    await env.AUTH_CACHE.put(key, permission, { expirationTtl: env.AUTH_CACHE_TTL });
+    return;
+  }
+
+  const metadata: CacheMetadata = { staleAt: Date.now() + env.AUTH_CACHE_TTL * 1000 };
+  if (etag) {
+    metadata.etag = etag;
+  }
+  await env.AUTH_CACHE.put(key, permission, { expirationTtl: env.AUTH_CACHE_TTL + staleTtl, metadata });
+}
+
+// A KV entry read close to its staleAt is only kept in memory for the freshness it has left
+function rememberPermission(env: Env, key: string, permission: PermissionLevel, staleAt?: number): void {
+  const ttl = Math.min(MEMORY_CACHE_TTL, env.AUTH_CACHE_TTL) * 1000;
+  const now = Date.now();
+  memoryCache.set(key, permission, staleAt === undefined ? ttl : Math.min(ttl, staleAt - now), now);
+}
+
+export function clearMemoryCache(): void {
+  memoryCache.clear();
 }
 
 export async function getCachedPermission(
@@ -26,8 +116,7 @@ export async function getCachedPermission(
   repo: string
 ): Promise<PermissionLevel | null> {
   const key = await generateCacheKey(token, org, repo);
-  const cached = await env.AUTH_CACHE.get(key);
-  return isValidPermission(cached) ? cached : null;
+  return readPermission(env, key);
 }
 
 export async function setCachedPermission(
@@ -38,20 +127,117 @@ export async function setCachedPermission(
   permission: PermissionLevel
 ): Promise<void> {
   const key = await generateCacheKey(token, org, repo);
-  await env.AUTH_CACHE.put(key, permission, { expirationTtl: env.AUTH_CACHE_TTL });
+  await writePermission(env, key, permission);
+}
+
+// Stale entries are revalidated with their ETag; a 304 renews the cached permission for another AUTH_CACHE_TTL
+async function refreshPermission(
+  env: Env,
+  key: string,
+  tokenHash: string,
+  fn: PermissionFetcher,
+  token: string,
+  org: string,
+  repo: string,
+  cached: CachedPermission | null
+): Promise<PermissionLevel> {
+  const validator: PermissionValidator = { permission: cached?.permission, etag: cached?.etag };
+  let permission: PermissionLevel;
+  try {
+    permission = await fn(token, org, repo, validator);
+  } finally {
+    if (validator.rateLimit) {
+      recordRateLimit(tokenHash, validator.rateLimit);
+    }
+  }
+  await writePermission(env, key, permission, validator.etag);
+  rememberPermission(env, key, permission);
+  return permission;
+}
+
+async function lookupPermission(
+  env: Env,
+  key: string,
+  tokenHash: string,
+  fn: PermissionFetcher,
+  token: string,
+  org: string,
+  repo: string,
+  ctx?: ExecutionContext,
+  timer?: RequestTimer
+): Promise<PermissionLevel> {
+  const cached = await timed(timer, "kv", () => readEntry(env, key));
+  if (cached !== null && !cached.stale) {
+    rememberPermission(env, key, cached.permission, cached.staleAt);
+    timer?.count("cache.kv");
+    return cached.permission;
+  }
+
+  // With the token's budget (nearly) spent, keep serving what is cached and fail fast instead of
+  // sending a request that GitHub would reject
+  const budget = getRateLimit(tokenHash);
+  if (budget && budget.remaining <= RATE_LIMIT_RESERVE) {
+    if (cached !== null) {
+      timer?.count("cache.stale");
+      return cached.permission;
+    }
+    if (budget.remaining <= 0) {
+      throw new GitHubRateLimitError("Rate limit exceeded", { resetAt: budget.resetAt });
+    }
+  }
+
+  // Serve the stale permission right away and refresh it once the response has been sent
+  if (cached !== null && ctx) {
+    if (!backgroundRefreshes.has(key)) {
+      backgroundRefreshes.add(key);
+      ctx.waitUntil(
+        refreshPermission(env, key, tokenHash, fn, token, org, repo, cached)
+          .catch(() => undefined)
+          .finally(() => backgroundRefreshes.delete(key))
+      );
+    }
+    timer?.count("cache.stale");
+    return cached.permission;
+  }
+
+  // A stale entry is the last known permission; serve it rather than an error while GitHub is failing
+  const timedFn: PermissionFetcher = (...args) => timed(timer, "github", () => fn(...args));
+  try {
+    return await refreshPermission(env, key, tokenHash, timedFn, token, org, repo, cached);
+  } catch (error) {
+    if (cached !== null) {
+      timer?.count("cache.stale");
+      return cached.permission;
+    }
+    throw error;
+  }
 }
 
 export function withCache(
   env: Env,
-  fn: (token: string, org: string, repo: string) => Promise<PermissionLevel>
+  fn: PermissionFetcher,
+  ctx?: ExecutionContext,
+  timer?: RequestTimer
 ): (token: string, org: string, repo: string) => Promise<PermissionLevel> {
   return async (token: string, org: string, repo: string): Promise<PermissionLevel> => {
-    const cached = await getCachedPermission(env, token, org, repo);
-    if (cached !== null) {
-      return cached;
+    const tokenHash = await hashToken(token);
+    const key = formatCacheKey(tokenHash, org, repo);
+
+    const remembered = memoryCache.get(key);
+    if (remembered !== undefined) {
+      timer?.count("cache.memory");
+      return remembered;
+    }
+
+    let lookup = inflightLookups.get(key);
+    if (!lookup) {
+      lookup = lookupPermission(env, key, tokenHash, fn, token, org, repo, ctx, timer).finally(() =>
+        inflightLookups.delete(key)
+      );
+      inflightLookups.set(key, lookup);
+      // Other requests may join this lookup; keep it running if the request that started it is cancelled
+      ctx?.waitUntil(lookup.catch(() => undefined));
     }
-    const permission = await fn(token, org, repo);
-    await setCachedPermission(env, token, org, repo, permission);
-    return permission;
+    return lookup;
   };
 }
@@ -0,0 +1,98 @@
+import { GitHubRateLimitError } from "./github.js";
+
+export type CircuitState = "closed" | "open" | "half-open";
+
+const WINDOW_SIZE = 20;
+const MIN_CALLS = 10;
+export const CIRCUIT_FAILURE_THRESHOLD = 0.5;
+export const CIRCUIT_OPEN_SECONDS = 30;
+
+export class CircuitOpenError extends Error {
+  readonly retryAfter: number;
+
+  constructor(retryAfter: number) {
+    super("GitHub API unavailable");
+    this.name = "CircuitOpenError";
+    this.retryAfter = retryAfter;
+  }
+}
+
+// Per-isolate view of GitHub's health: the outcomes of the last WINDOW_SIZE calls (true for a failure)
+let outcomes: boolean[] = [];
+let openedAt: number | null = null;
+let trialInFlight = false;
+
+function getOpenDuration(env: Env): number {
+  return (env.GITHUB_CIRCUIT_OPEN_SECONDS ?? CIRCUIT_OPEN_SECONDS) * 1000;
+}
+
+export function getCircuitState(env: Env, now = Date.now()): CircuitState {
+  if (openedAt === null) {
+    return "closed";
+  }
+  return now - openedAt < getOpenDuration(env) ? "open" : "half-open";
+}
+
+export function resetCircuitBreaker(): void {
+  outcomes = [];
+  openedAt = null;
+  trialInFlight = false;
+}
+
+function recordOutcome(env: Env, failed: boolean, now: number): void {
+  outcomes.push(failed);
+  if (outcomes.length > WINDOW_SIZE) {
+    outcomes.shift();
+  }
+
+  const failures = outcomes.filter(Boolean).length;
+  const threshold = env.GITHUB_CIRCUIT_FAILURE_THRESHOLD ?? CIRCUIT_FAILURE_THRESHOLD;
+  if (outcomes.length >= MIN_CALLS && failures / outcomes.length >= threshold) {
+    openedAt = now;
+    outcomes = [];
+  }
+}
+
+// Calls started before the circuit opened do not count once it is open; the trial call alone decides what happens next
+function settle(env: Env, trial: boolean, failed: boolean): void {
+  if (trial) {
+    resetCircuitBreaker();
+    if (failed) {
+      openedAt = Date.now();
+    }
+  } else if (openedAt === null) {
+    recordOutcome(env, failed, Date.now());
+  }
+}
+
+// Rate limits are specific to one token and say nothing about GitHub's health, so they are not counted
+function isFailure(error: unknown): boolean {
+  return !(error instanceof GitHubRateLimitError);
+}
+
+// Fails fast while GitHub keeps failing instead of holding every cache miss on a slow or broken upstream.
+// Once the open period has passed, a single trial call decides whether the circuit closes or opens again
+export function withCircuitBreaker<A extends unknown[], R>(
+  env: Env,
+  fn: (...args: A) => Promise<R>
+): (...args: A) => Promise<R> {
+  return async (...args: A): Promise<R> => {
+    const now = Date.now();
+    const state = getCircuitState(env, now);
+    if (state === "open" || (state === "half-open" && trialInFlight)) {
+      const remaining = openedAt === null ? 0 : openedAt + getOpenDuration(env) - now;
+      throw new CircuitOpenError(Math.max(1, Math.ceil(remaining / 1000)));
+    }
+
+    const trial = state === "half-open";
+    trialInFlight ||= trial;
+    try {
+      const result = await fn(...args);
+      settle(env, trial, false);
+      return result;
+    } catch (error) {
+      settle(env, trial, isFailure(error));
+      throw error;
+    }
+  };
+}
@@ -0,0 +1,270 @@
+import { LRUCache } from "../lib/lru.js";
+import type { PermissionLevel } from "../types/index.js";
+import { hashToken, isValidPermission } from "./cache.js";
+import type { PermissionValidator } from "./github.js";
+import {
+  createGitHubHeaders,
+  fetchWithRetry,
+  getGitHubRequestPolicy,
+  getRateLimitError,
+  getRepositoryPermission,
+  isValidGitHubRepository,
+} from "./github.js";
+
+const JWT_LIFETIME = 540;
+const JWT_CLOCK_SKEW = 60;
+const TOKEN_REFRESH_MARGIN = 300;
+const INSTALLATION_CACHE_TTL = 3600;
+const LOGIN_CACHE_TTL = 3600;
+const MAX_CACHED_INSTALLATIONS = 100;
+const MAX_CACHED_LOGINS = 1000;
+const REGULAR_FLOW_TOKEN_PREFIXES = ["ghs_", "ghu_", "github_pat_"];
+
+const encoder = new TextEncoder();
+
+interface UserLogin {
+  login: string;
+  // Classic tokens with only the public_repo scope must not unlock private repositories
+  publicOnly: boolean;
+}
+
+// Installation IDs and tokens are shared by every user of an organization, so they are kept per isolate
+const installationIds = new LRUCache<number>(MAX_CACHED_INSTALLATIONS);
+const installationTokens = new LRUCache<string>(MAX_CACHED_INSTALLATIONS);
+const userLogins = new LRUCache<UserLogin>(MAX_CACHED_LOGINS);
+let signingKey: { pem: string; key: Promise<CryptoKey> } | undefined;
+
+export function isAppModeEnabled(env: Env): boolean {
+  return Boolean(env.GITHUB_APP_ID && env.GITHUB_APP_PRIVATE_KEY);
+}
+
+export function clearAppCaches(): void {
+  installationIds.clear();
+  installationTokens.clear();
+  userLogins.clear();
+  signingKey = undefined;
+}
+
+function base64UrlEncode(data: ArrayBuffer | Uint8Array): string {
+  const bytes = data instanceof Uint8Array ? data : new Uint8Array(data);
+  return btoa(String.fromCharCode(...bytes))
+    .replace(/\+/g, "-")
+    .replace(/\//g, "_")
+    .replace(/=+$/, "");
+}
+
+function importPrivateKey(pem: string): Promise<CryptoKey> {
+  const body = pem.replace(/-----(BEGIN|END) PRIVATE KEY-----/g, "").replace(/\s+/g, "");
+  const der = Uint8Array.from(atob(body), (c) => c.charCodeAt(0));
+  return crypto.subtle.importKey("pkcs8", der, { name: "RSASSA-PKCS1-v1_5", hash: "SHA-256" }, false, ["sign"]);
+}
+
+function getSigningKey(pem: string): Promise<CryptoKey> {
+  if (signingKey?.pem !== pem) {
+    signingKey = { pem, key: importPrivateKey(pem) };
+  }
+  return signingKey.key;
+}
+
+export async function createAppJwt(appId: string, privateKey: string, now = Date.now()): Promise<string> {
+  const issuedAt = Math.floor(now / 1000) - JWT_CLOCK_SKEW;
+  const header = base64UrlEncode(encoder.encode(JSON.stringify({ alg: "RS256", typ: "JWT" })));
+  const payload = base64UrlEncode(
+    encoder.encode(JSON.stringify({ iat: issuedAt, exp: issuedAt + JWT_LIFETIME, iss: appId }))
+  );
+  const key = await getSigningKey(privateKey);
+  const signature = await crypto.subtle.sign("RSASSA-PKCS1-v1_5", key, encoder.encode(`${header}.${payload}`));
+  return `${header}.${payload}.${base64UrlEncode(signature)}`;
+}
+
+async function githubRequest(env: Env, path: string, token: string, init: RequestInit = {}): Promise<Response> {
+  const policy = getGitHubRequestPolicy(env);
+  // Minting an installation token is not idempotent, so only GETs are retried or hedged
+  const requestPolicy = init.method && init.method !== "GET" ? { ...policy, retries: 0, hedgeAfterMs: 0 } : policy;
+  const response = await fetchWithRetry(
+    `${policy.apiUrl}${path}`,
+    { ...init, headers: createGitHubHeaders(token) },
+    requestPolicy
+  );
+
+  const rateLimitError = getRateLimitError(response);
+  if (rateLimitError) {
+    throw rateLimitError;
+  }
+  if (response.status >= 500) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+  return response;
+}
+
+// Returns null when the app is not installed for the repository owner
+async function lookupInstallationId(env: Env, jwt: string, org: string, repo: string): Promise<number | null> {
+  const response = await githubRequest(env, `/repos/${org}/${repo}/installation`, jwt);
+  if (response.status === 404) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+
+  const { id } = (await response.json()) as { id: number };
+  installationIds.set(org, id, INSTALLATION_CACHE_TTL * 1000);
+  return id;
+}
+
+export async function getInstallationToken(env: Env, org: string, repo: string): Promise<string | null> {
+  const createJwt = () => createAppJwt(env.GITHUB_APP_ID as string, env.GITHUB_APP_PRIVATE_KEY as string);
+
+  const installationId = installationIds.get(org) ?? (await lookupInstallationId(env, await createJwt(), org, repo));
+  if (installationId === null) {
+    return null;
+  }
+
+  const cached = installationTokens.get(String(installationId));
+  if (cached !== undefined) {
+    return cached;
+  }
+
+  const path = `/app/installations/${installationId}/access_tokens`;
+  const response = await githubRequest(env, path, await createJwt(), { method: "POST" });
+  if (!response.ok) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+
+  // Tokens are dropped a few minutes before they expire so they are never used at the edge of their lifetime
+  const { token, expires_at } = (await response.json()) as { token: string; expires_at: string };
+  const ttl = Date.parse(expires_at) - TOKEN_REFRESH_MARGIN * 1000 - Date.now();
+  installationTokens.set(String(installationId), token, ttl);
+  return token;
+}
+
+// Classic token scopes, from the X-OAuth-Scopes header; tokens without repo or public_repo get no access
+function getRepoScope(response: Response): "repo" | "public_repo" | null {
+  const scopes = (response.headers.get("X-OAuth-Scopes") ?? "").split(",").map((scope) => scope.trim());
+  if (scopes.includes("repo")) {
+    return "repo";
+  }
+  return scopes.includes("public_repo") ? "public_repo" : null;
+}
+
+// Returns null when the token is invalid; this is the only call made with the caller's own rate limit
+async function getUserLogin(env: Env, token: string): Promise<UserLogin | null> {
+  const key = await hashToken(token);
+  const cached = userLogins.get(key);
+  if (cached !== undefined) {
+    return cached;
+  }
+
+  const response = await githubRequest(env, "/user", token);
+  if (response.status === 401 || response.status === 403) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+
+  const scope = getRepoScope(response);
+  if (scope === null) {
+    void response.body?.cancel();
+    return null;
+  }
+
+  const { login } = (await response.json()) as { login: string };
+  const user = { login, publicOnly: scope === "public_repo" };
+  // A login cached longer than permissions would keep a revoked token working past AUTH_CACHE_TTL
+  userLogins.set(key, user, Math.min(LOGIN_CACHE_TTL, env.AUTH_CACHE_TTL) * 1000);
+  return user;
+}
+
+// Returns null when the installation cannot see the repository, e.g. one outside its selected repositories
+async function getRepositoryVisibility(
+  env: Env,
+  installationToken: string,
+  org: string,
+  repo: string
+): Promise<"public" | "private" | null> {
+  const response = await githubRequest(env, `/repos/${org}/${repo}`, installationToken);
+  if (response.status === 404) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+  const data: unknown = await response.json();
+  if (!isValidGitHubRepository(data)) {
+    throw new Error("GitHub API error: invalid response");
+  }
+  return data.private ? "private" : "public";
+}
+
+// Permission check through a GitHub App installation: the caller's token only identifies the user, and the
+// collaborator permission is read with an installation token that draws on the app's shared rate limit
+export async function getAppRepositoryPermission(
+  env: Env,
+  token: string,
+  org: string,
+  repo: string,
+  validator?: PermissionValidator
+): Promise<PermissionLevel> {
+  const checkWithCallerToken = () => getRepositoryPermission(token, org, repo, validator, getGitHubRequestPolicy(env));
+
+  // Installation tokens (e.g. GITHUB_TOKEN in Actions) have no user to look up. Fine-grained and app user tokens
+  // have no OAuth scopes and can be limited to some repositories, which only the caller's own request can tell
+  if (REGULAR_FLOW_TOKEN_PREFIXES.some((prefix) => token.startsWith(prefix))) {
+    return checkWithCallerToken();
+  }
+
+  if (validator) {
+    validator.etag = undefined;
+  }
+
+  const user = await getUserLogin(env, token);
+  if (user === null) {
+    return "none";
+  }
+
+  // Repositories the app does not cover are checked with the caller's token, as without app mode
+  const installationToken = await getInstallationToken(env, org, repo);
+  if (installationToken === null) {
+    return checkWithCallerToken();
+  }
+  if (user.publicOnly) {
+    const visibility = await getRepositoryVisibility(env, installationToken, org, repo);
+    if (visibility === null) {
+      return checkWithCallerToken();
+    }
+    if (visibility === "private") {
+      return "none";
+    }
+  }
+
+  const response = await githubRequest(
+    env,
+    `/repos/${org}/${repo}/collaborators/${encodeURIComponent(user.login)}/permission`,
+    installationToken
+  );
+  // Users who are not collaborators can still read public repositories. The installation ID is cached per
+  // organization, so a 404 can also mean the repository is outside the installation's selected repositories
+  if (response.status === 404) {
+    const visibility = await getRepositoryVisibility(env, installationToken, org, repo);
+    if (visibility === null) {
+      return checkWithCallerToken();
+    }
+    return visibility === "public" ? "read" : "none";
+  }
+  if (!response.ok) {
+    throw new Error(`GitHub API error: ${response.status}`);
+  }
+
+  const { permission } = (await response.json()) as { permission: string };
+  if (!isValidPermission(permission)) {
+    throw new Error("GitHub API error: invalid response");
+  }
+  return permission;
+}
+
+export function createAppPermissionFetcher(
+  env: Env
+): (token: string, org: string, repo: string, validator?: PermissionValidator) => Promise<PermissionLevel> {
+  return (token, org, repo, validator) => getAppRepositoryPermission(env, token, org, repo, validator);
+}
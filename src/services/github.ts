@@ -1,4 +1,5 @@
 import type { GitHubRepository, LFSOperation, PermissionLevel } from "../types/index.js";
+import { parseRateLimit, parseRetryAfter, type RateLimitStatus } from "./rate-limit.js";
 
 export class GitHubRateLimitError extends Error {
   readonly resetAt?: number;
@@ -12,12 +13,44 @@ export class GitHubRateLimitError extends Error {
   }
 }
 
+export interface GitHubRequestPolicy {
+  // Base URL of the REST API, without a trailing slash
+  apiUrl: string;
+  // Per-attempt timeout
+  timeoutMs: number;
+  // Extra attempts after a 5xx, a network error or a timeout
+  retries: number;
+  // Start a second attempt when the first has not answered within this time; 0 disables hedging
+  hedgeAfterMs: number;
+}
+
+export const DEFAULT_GITHUB_API_URL = "https://api.github.com";
+export const DEFAULT_REQUEST_TIMEOUT_MS = 5000;
+const RETRY_BASE_DELAY_MS = 100;
+const RETRY_MAX_DELAY_MS = 1000;
+
+export const DEFAULT_REQUEST_POLICY: GitHubRequestPolicy = {
+  apiUrl: DEFAULT_GITHUB_API_URL,
+  timeoutMs: DEFAULT_REQUEST_TIMEOUT_MS,
+  retries: 0,
+  hedgeAfterMs: 0,
+};
+
 export interface GitHubPermissions {
   admin: boolean;
   push: boolean;
   pull: boolean;
 }
 
+// Cached result of a previous lookup, used to make a conditional request. After the call, etag holds the
+// ETag the returned permission was derived from, so the caller can store it with the permission, and
+// rateLimit holds the token's GitHub budget as reported by the response
+export interface PermissionValidator {
+  permission?: PermissionLevel;
+  etag?: string;
+  rateLimit?: RateLimitStatus;
+}
+
 export function mapGitHubPermissions(permissions: GitHubPermissions): PermissionLevel {
   if (permissions.admin) return "admin";
   if (permissions.push) return "write";
@@ -45,6 +78,135 @@ export function isValidGitHubRepository(data: unknown): data is GitHubRepository
   return true;
 }
 
+export function createGitHubHeaders(token: string): Record<string, string> {
+  return {
+    Authorization: `Bearer ${token}`,
+    Accept: "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": "gitLFSflare",
+  };
+}
+
+export function getRateLimitError(response: Response): GitHubRateLimitError | null {
+  if (response.status === 429) {
+    return new GitHubRateLimitError("Rate limit exceeded", {
+      retryAfter: parseRetryAfter(response.headers.get("Retry-After")),
+    });
+  }
+
+  if (response.status === 403 && response.headers.get("X-RateLimit-Remaining") === "0") {
+    const reset = response.headers.get("X-RateLimit-Reset");
+    return new GitHubRateLimitError("Rate limit exceeded", {
+      resetAt: reset ? Number.parseInt(reset, 10) : undefined,
+    });
+  }
+
+  return null;
+}
+
+export function getGitHubApiUrl(env: Env): string {
+  return (env.GITHUB_API_URL || DEFAULT_GITHUB_API_URL).replace(/\/+$/, "");
+}
+
+export function getGitHubRequestPolicy(env: Env): GitHubRequestPolicy {
+  return {
+    apiUrl: getGitHubApiUrl(env),
+    timeoutMs: env.GITHUB_REQUEST_TIMEOUT_MS ?? DEFAULT_REQUEST_TIMEOUT_MS,
+    retries: env.GITHUB_REQUEST_RETRIES ?? 0,
+    hedgeAfterMs: env.GITHUB_HEDGE_AFTER_MS ?? 0,
+  };
+}
+
+const sleep = (ms: number) => new Promise<void>((resolve) => setTimeout(resolve, ms));
+
+const isRetryable = (response: Response) => response.status >= 500;
+
+// Timeouts surface as GitHub API errors so they are reported like any other upstream failure
+async function attemptFetch(url: string, init: RequestInit, timeoutMs: number): Promise<Response> {
+  try {
+    return await fetch(url, { ...init, signal: AbortSignal.timeout(timeoutMs) });
+  } catch (error) {
+    if (error instanceof Error && error.name === "TimeoutError") {
+      throw new Error("GitHub API error: timeout");
+    }
+    throw error;
+  }
+}
+
+// Resolves with the first response that is not a 5xx; when there is none, settles like the first attempt.
+// Every response that is not returned has its body cancelled so its connection is released
+function firstUsable(attempts: Promise<Response>[]): Promise<Response> {
+  return new Promise((resolve) => {
+    let pending = attempts.length;
+    let winner: Response | undefined;
+    const failed = new Map<number, Response>();
+    const cancelFailed = (except?: number) => {
+      for (const [i, response] of failed) {
+        if (i !== except) {
+          void response.body?.cancel();
+        }
+      }
+      failed.clear();
+    };
+    attempts.forEach((attempt, i) => {
+      attempt
+        .then(
+          (response) => {
+            if (winner) {
+              void response.body?.cancel();
+            } else if (!isRetryable(response)) {
+              winner = response;
+              cancelFailed();
+              resolve(response);
+            } else {
+              failed.set(i, response);
+            }
+          },
+          () => undefined
+        )
+        .finally(() => {
+          pending--;
+          if (pending === 0 && !winner) {
+            cancelFailed(0);
+            resolve(attempts[0] as Promise<Response>);
+          }
+        });
+    });
+  });
+}
+
+// A slow first attempt gets a parallel second one after hedgeAfterMs; whichever answers usefully first wins
+async function hedgedFetch(url: string, init: RequestInit, policy: GitHubRequestPolicy): Promise<Response> {
+  const primary = attemptFetch(url, init, policy.timeoutMs);
+  if (policy.hedgeAfterMs <= 0 || policy.hedgeAfterMs >= policy.timeoutMs) {
+    return primary;
+  }
+
+  const settled = primary.then(() => true, () => true);
+  if (await Promise.race([settled, sleep(policy.hedgeAfterMs).then(() => false)])) {
+    return primary;
+  }
+  return firstUsable([primary, attemptFetch(url, init, policy.timeoutMs)]);
+}
+
+export async function fetchWithRetry(url: string, init: RequestInit, policy: GitHubRequestPolicy): Promise<Response> {
+  for (let retry = 0; ; retry++) {
+    try {
+      const response = await hedgedFetch(url, init, policy);
+      if (!isRetryable(response) || retry >= policy.retries) {
+        return response;
+      }
+      void response.body?.cancel();
+    } catch (error) {
+      if (retry >= policy.retries) {
+        throw error;
+      }
+    }
+    // Full jitter, so isolates that failed together do not retry in lockstep
+    await sleep(Math.random() * Math.min(RETRY_MAX_DELAY_MS, RETRY_BASE_DELAY_MS * 2 ** retry));
+  }
+}
+
 export function hasOperationPermission(permission: PermissionLevel, operation: LFSOperation): boolean {
   if (operation === "download") {
     return permission !== "none";
@@ -53,34 +215,43 @@ export function hasOperationPermission(permission: PermissionLevel, operation: L
   return permission === "admin" || permission === "write";
 }
 
-export async function getRepositoryPermission(token: string, org: string, repo: string): Promise<PermissionLevel> {
-  const url = `https://api.github.com/repos/${org}/${repo}`;
+export async function getRepositoryPermission(
+  token: string,
+  org: string,
+  repo: string,
+  validator?: PermissionValidator,
+  policy: GitHubRequestPolicy = DEFAULT_REQUEST_POLICY
+): Promise<PermissionLevel> {
+  const url = `${policy.apiUrl}/repos/${org}/${repo}`;
+  const cachedPermission = validator?.permission;
+  const cachedEtag = validator?.etag;
 
-  const response = await fetch(url, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-      Accept: "application/vnd.github+json",
-      "X-GitHub-Api-Version": "2022-11-28",
-      "User-Agent": "gitLFSflare",
-    },
-  });
+  const headers = createGitHubHeaders(token);
+  if (cachedPermission && cachedEtag) {
+    headers["If-None-Match"] = cachedEtag;
+  }
+
+  const response = await fetchWithRetry(url, { headers }, policy);
+  if (validator) {
+    validator.rateLimit = parseRateLimit(response.headers) ?? undefined;
+  }
+
+  // Not modified: the cached permission is still current, and GitHub does not count this against the rate limit
+  if (response.status === 304 && cachedPermission && cachedEtag) {
+    return cachedPermission;
+  }
+
+  if (validator) {
+    validator.etag = undefined;
+  }
 
   // Check for rate limiting
-  if (response.status === 429) {
-    const retryAfter = response.headers.get("Retry-After");
-    throw new GitHubRateLimitError("Rate limit exceeded", {
-      retryAfter: retryAfter ? Number.parseInt(retryAfter, 10) : undefined,
-    });
+  const rateLimitError = getRateLimitError(response);
+  if (rateLimitError) {
+    throw rateLimitError;
   }
 
   if (response.status === 403) {
-    const remaining = response.headers.get("X-RateLimit-Remaining");
-    if (remaining === "0") {
-      const reset = response.headers.get("X-RateLimit-Reset");
-      throw new GitHubRateLimitError("Rate limit exceeded", {
-        resetAt: reset ? Number.parseInt(reset, 10) : undefined,
-      });
-    }
     return "none";
   }
 
@@ -98,6 +269,10 @@ export async function getRepositoryPermission(token: string, org: string, repo:
     throw new Error("GitHub API error: invalid response");
   }
 
+  if (validator) {
+    validator.etag = response.headers.get("ETag") ?? undefined;
+  }
+
   if (!data.permissions) {
     // Public repos may not include permissions - allow read access
     // Private repos should always have permissions; deny if missing
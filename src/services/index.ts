@@ -1,18 +1,46 @@
 export type { ParsedAuth } from "./auth.js";
 export { extractToken, parseAuthHeader, validateTokenFormat } from "./auth.js";
-export type { GitHubPermissions } from "./github.js";
+export type { CircuitState } from "./circuit-breaker.js";
+export { CircuitOpenError, getCircuitState, withCircuitBreaker } from "./circuit-breaker.js";
 export {
+  createAppJwt,
+  createAppPermissionFetcher,
+  getAppRepositoryPermission,
+  getInstallationToken,
+  isAppModeEnabled,
+} from "./github-app.js";
+export type { GitHubPermissions, GitHubRequestPolicy, PermissionValidator } from "./github.js";
+export {
+  createGitHubHeaders,
+  fetchWithRetry,
   GitHubRateLimitError,
+  getGitHubRequestPolicy,
+  getRateLimitError,
   getRepositoryPermission,
   hasOperationPermission,
   mapGitHubPermissions,
 } from "./github.js";
-export type { ValidationResult } from "./lfs.js";
+export type { DeduplicatedObjects, PendingBatch, ValidationResult } from "./lfs.js";
+export { deduplicateObjects, processBatchObjects, processBatchRequest, validateBatchRequest } from "./lfs.js";
+export type { ManifestShard, ObjectManifest } from "./manifest.js";
+export { readManifest, recordObjects } from "./manifest.js";
+export type { BatchMetrics, CacheResult } from "./metrics.js";
+export { getCacheResult, writeBatchMetrics } from "./metrics.js";
+export type { ObjectExistsResult, ObjectScope, PresignOptions, SigningOptions } from "./r2.js";
 export {
-  processBatchRequest,
-  processDownloadObject,
-  processUploadObject,
-  validateBatchRequest,
-} from "./lfs.js";
-export type { ObjectExistsResult } from "./r2.js";
-export { generateDownloadUrl, generateObjectKey, generateUploadUrl, objectExists } from "./r2.js";
+  addReference,
+  createObjectSigner,
+  generateDownloadUrl,
+  generateObjectKey,
+  generateReferenceKey,
+  generateUploadUrl,
+  getDownloadUrlLifetime,
+  getDownloadUrlWindow,
+  getObjectScope,
+  hasReference,
+  objectExists,
+  presignMany,
+  presignUrl,
+} from "./r2.js";
+export type { RateLimitStatus } from "./rate-limit.js";
+export { getRateLimit, parseRateLimit, RATE_LIMIT_RESERVE, recordRateLimit } from "./rate-limit.js";
@@ -1,8 +1,27 @@
+import { mapWithConcurrency } from "../lib/concurrency.js";
+import { type RequestTimer, timed } from "../lib/timing.js";
 import { isValidOID, isValidSize } from "../lib/validation.js";
-import type { LFSBatchRequest, LFSBatchResponse, LFSObjectRequest, LFSObjectResponse } from "../types/index.js";
-import { generateDownloadUrl, generateUploadUrl, objectExists } from "./r2.js";
+import type {
+  LFSBatchRequest,
+  LFSBatchResponse,
+  LFSObjectRequest,
+  LFSObjectResponse,
+  LFSOperation,
+  PendingBatchResponse,
+} from "../types/index.js";
+import { readManifest, recordObjects } from "./manifest.js";
+import type { ObjectExistsResult } from "./r2.js";
+import {
+  addReference,
+  createObjectSigner,
+  getDownloadUrlLifetime,
+  getObjectScope,
+  hasReference,
+  objectExists,
+} from "./r2.js";
 
 export const MAX_BATCH_OBJECTS = 100;
+export const OBJECT_CONCURRENCY = 32;
 
 export interface ValidationResult {
   valid: boolean;
@@ -10,7 +29,7 @@ export interface ValidationResult {
   status?: number;
 }
 
-export function validateBatchRequest(request: LFSBatchRequest): ValidationResult {
+export function validateBatchRequest(request: LFSBatchRequest, maxObjects = MAX_BATCH_OBJECTS): ValidationResult {
   if (request.operation !== "download" && request.operation !== "upload") {
     return { valid: false, error: "Invalid operation", status: 422 };
   }
@@ -19,7 +38,7 @@ export function validateBatchRequest(request: LFSBatchRequest): ValidationResult
     return { valid: false, error: "Objects array is required and must not be empty", status: 422 };
   }
 
-  if (request.objects.length > MAX_BATCH_OBJECTS) {
+  if (request.objects.length > maxObjects) {
     return { valid: false, error: "Batch request contains too many objects", status: 413 };
   }
 
@@ -43,100 +62,264 @@ export function validateBatchRequest(request: LFSBatchRequest): ValidationResult
   return { valid: true };
 }
 
-export async function processDownloadObject(
-  env: Env,
-  org: string,
-  repo: string,
-  obj: LFSObjectRequest
-): Promise<LFSObjectResponse> {
-  // Skip HEAD check for performance - clients handle 404s from R2 directly
+function storageError(obj: LFSObjectRequest): LFSObjectResponse {
+  return {
+    oid: obj.oid,
+    size: obj.size,
+    error: { code: 500, message: "Storage service error" },
+  };
+}
+
+function actionResponse(env: Env, obj: LFSObjectRequest, operation: LFSOperation, href: string): LFSObjectResponse {
+  return {
+    oid: obj.oid,
+    size: obj.size,
+    authenticated: true,
+    actions: {
+      [operation]: {
+        href,
+        expires_in: operation === "download" ? getDownloadUrlLifetime(env) : env.URL_EXPIRY,
+      },
+    },
+  };
+}
+
+function notFoundError(obj: LFSObjectRequest): LFSObjectResponse {
+  return {
+    oid: obj.oid,
+    size: obj.size,
+    error: { code: 404, message: "Object does not exist" },
+  };
+}
+
+async function lookupObject(env: Env, org: string, repo: string, oid: string): Promise<ObjectExistsResult | null> {
   try {
-    const url = await generateDownloadUrl(env, org, repo, obj.oid);
+    return await objectExists(env, org, repo, oid);
+  } catch {
+    return null;
+  }
+}
 
+// Returns the final response for objects that must not be uploaded, or null when an upload URL is needed
+function existingUploadResponse(obj: LFSObjectRequest, result: ObjectExistsResult | null): LFSObjectResponse | null {
+  if (!result) {
+    return storageError(obj);
+  }
+  if (!result.exists) {
+    return null;
+  }
+  if (result.size === obj.size) {
     return {
       oid: obj.oid,
       size: obj.size,
       authenticated: true,
-      actions: {
-        download: {
-          href: url,
-          expires_in: env.URL_EXPIRY,
-        },
-      },
     };
+  }
+  return {
+    oid: obj.oid,
+    size: obj.size,
+    error: { code: 422, message: "Object size mismatch" },
+  };
+}
+
+// A signing failure only fails the object being signed
+async function signObject(
+  env: Env,
+  obj: LFSObjectRequest,
+  operation: LFSOperation,
+  sign: (oid: string) => Promise<string>,
+  timer?: RequestTimer
+): Promise<LFSObjectResponse> {
+  try {
+    return actionResponse(env, obj, operation, await timed(timer, "sign", () => sign(obj.oid)));
   } catch {
-    return {
-      oid: obj.oid,
-      size: obj.size,
-      error: { code: 500, message: "Storage service error" },
-    };
+    return storageError(obj);
+  }
+}
+
+async function claimObject(env: Env, org: string, repo: string, oid: string): Promise<boolean> {
+  try {
+    await addReference(env, org, repo, oid);
+    return true;
+  } catch {
+    return false;
   }
 }
 
-export async function processUploadObject(
+// Called once per object with its final response, as soon as it is known
+type SettleObject = (index: number, response: LFSObjectResponse) => void;
+
+async function processDownloadObjects(
   env: Env,
   org: string,
   repo: string,
-  obj: LFSObjectRequest
-): Promise<LFSObjectResponse> {
-  try {
-    const result = await objectExists(env, org, repo, obj.oid);
-
-    if (result.exists) {
-      if (result.size === obj.size) {
-        return {
-          oid: obj.oid,
-          size: obj.size,
-          authenticated: true,
-        };
+  objects: LFSObjectRequest[],
+  settle: SettleObject,
+  timer?: RequestTimer
+): Promise<void> {
+  const sign = createObjectSigner(env, org, repo, "GET");
+
+  // Skip HEAD check for performance - clients handle 404s from R2 directly
+  if (getObjectScope(env) === "repo") {
+    await Promise.all(
+      objects.map(async (obj, i) => settle(i, await signObject(env, obj, "download", sign, timer)))
+    );
+    return;
+  }
+
+  // Shared objects are only served to repositories that reference them; manifest entries are always referenced
+  const oids = objects.map((obj) => obj.oid);
+  const manifest = await timed(timer, "manifest", () => readManifest(env, org, repo, oids).catch(() => null));
+  const concurrency = env.OBJECT_CONCURRENCY ?? OBJECT_CONCURRENCY;
+  await timed(timer, "r2", () =>
+    mapWithConcurrency(objects, concurrency, async (obj, i) => {
+      if (!manifest?.sizes.has(obj.oid)) {
+        timer?.count("r2.head");
+        const referenced = await hasReference(env, org, repo, obj.oid).catch(() => null);
+        if (!referenced) {
+          settle(i, referenced === null ? storageError(obj) : notFoundError(obj));
+          return;
+        }
       }
-      return {
-        oid: obj.oid,
-        size: obj.size,
-        error: { code: 422, message: "Object size mismatch" },
-      };
-    }
+      settle(i, await signObject(env, obj, "download", sign, timer));
+    })
+  );
+}
 
-    const url = await generateUploadUrl(env, org, repo, obj.oid);
+async function processUploadObjects(
+  env: Env,
+  org: string,
+  repo: string,
+  objects: LFSObjectRequest[],
+  settle: SettleObject,
+  timer?: RequestTimer
+): Promise<void> {
+  // The manifest only ever answers "already present"; objects missing from it still get a HEAD check
+  const oids = objects.map((obj) => obj.oid);
+  const manifest = await timed(timer, "manifest", () => readManifest(env, org, repo, oids).catch(() => null));
+  const sign = createObjectSigner(env, org, repo, "PUT");
+  const shared = getObjectScope(env) !== "repo";
+  const confirmed: LFSObjectRequest[] = [];
 
-    return {
-      oid: obj.oid,
-      size: obj.size,
-      authenticated: true,
-      actions: {
-        upload: {
-          href: url,
-          expires_in: env.URL_EXPIRY,
-        },
-      },
-    };
-  } catch {
-    return {
-      oid: obj.oid,
-      size: obj.size,
-      error: { code: 500, message: "Storage service error" },
-    };
+  // Bound the number of concurrent R2 HEAD calls so large batches stay within Worker subrequest limits.
+  // Each object is signed as soon as its own checks are done, without waiting for the rest of the batch
+  const concurrency = env.OBJECT_CONCURRENCY ?? OBJECT_CONCURRENCY;
+  await timed(timer, "r2", () =>
+    mapWithConcurrency(objects, concurrency, async (obj, i) => {
+      const indexedSize = manifest?.sizes.get(obj.oid);
+      if (indexedSize !== undefined) {
+        settle(i, existingUploadResponse(obj, { exists: true, size: indexedSize }) ?? storageError(obj));
+        return;
+      }
+
+      timer?.count("r2.head");
+      let result = existingUploadResponse(obj, await lookupObject(env, org, repo, obj.oid));
+
+      // In a shared keyspace, objects being uploaded or already stored by another repository are claimed
+      // with a reference record before this repository may download them
+      if (shared && !result?.error && !(await claimObject(env, org, repo, obj.oid))) {
+        result = storageError(obj);
+      }
+      if (result && !result.error) {
+        confirmed.push(obj);
+      }
+      settle(i, result ?? (await signObject(env, obj, "upload", sign, timer)));
+    })
+  );
+
+  if (manifest) {
+    await timed(timer, "manifest", () => recordObjects(env, org, repo, manifest, confirmed).catch(() => undefined));
   }
 }
 
-export async function processBatchRequest(
+export interface DeduplicatedObjects {
+  unique: LFSObjectRequest[];
+  positions: number[];
+}
+
+// The same content often appears at several paths; each (oid, size) pair is processed once and
+// positions[i] maps request.objects[i] back to its entry in unique
+export function deduplicateObjects(objects: LFSObjectRequest[]): DeduplicatedObjects {
+  const unique: LFSObjectRequest[] = [];
+  const seen = new Map<string, number>();
+  const positions = objects.map((obj) => {
+    const key = `${obj.oid}:${obj.size}`;
+    let position = seen.get(key);
+    if (position === undefined) {
+      position = unique.push(obj) - 1;
+      seen.set(key, position);
+    }
+    return position;
+  });
+  return { unique, positions };
+}
+
+interface Deferred<T> {
+  promise: Promise<T>;
+  resolve: (value: T) => void;
+  reject: (reason: unknown) => void;
+}
+
+function defer<T>(): Deferred<T> {
+  const deferred = {} as Deferred<T>;
+  deferred.promise = new Promise<T>((resolve, reject) => {
+    deferred.resolve = resolve;
+    deferred.reject = reject;
+  });
+  return deferred;
+}
+
+export interface PendingBatch {
+  response: PendingBatchResponse;
+  // Settles once every object is ready and the manifest has been updated; never rejects
+  done: Promise<void>;
+}
+
+// Starts processing a batch and returns one promise per requested object, so a streamed response can write
+// each object as soon as it is ready instead of waiting for the whole batch
+export function processBatchObjects(
   env: Env,
   org: string,
   repo: string,
-  request: LFSBatchRequest
-): Promise<LFSBatchResponse> {
-  const processObject = request.operation === "download" ? processDownloadObject : processUploadObject;
+  request: LFSBatchRequest,
+  timer?: RequestTimer
+): PendingBatch {
+  const { unique, positions } = deduplicateObjects(request.objects);
+  const results = unique.map(() => defer<LFSObjectResponse>());
+  // Whoever reads the objects reports a failure; the others must not surface as unhandled rejections
+  for (const result of results) {
+    result.promise.catch(() => undefined);
+  }
 
-  const objects = await Promise.all(request.objects.map((obj) => processObject(env, org, repo, obj)));
+  const settle: SettleObject = (index, response) => results[index]?.resolve(response);
+  const process = request.operation === "download" ? processDownloadObjects : processUploadObjects;
+  // Objects are only left unsettled by an unexpected error, which then fails each of them
+  const done = process(env, org, repo, unique, settle, timer).catch((error: unknown) => {
+    for (const result of results) {
+      result.reject(error);
+    }
+  });
 
-  const response: LFSBatchResponse = {
+  const response: PendingBatchResponse = {
     transfer: "basic",
-    objects,
+    objects: positions.map((position) => (results[position] as Deferred<LFSObjectResponse>).promise),
   };
 
   if (request.hash_algo) {
     response.hash_algo = request.hash_algo;
   }
 
-  return response;
+  return { response, done };
+}
+
+export async function processBatchRequest(
+  env: Env,
+  org: string,
+  repo: string,
+  request: LFSBatchRequest,
+  timer?: RequestTimer
+): Promise<LFSBatchResponse> {
+  const { response, done } = processBatchObjects(env, org, repo, request, timer);
+  const [objects] = await Promise.all([Promise.all(response.objects), done]);
+  return { ...response, objects };
 }
@@ -0,0 +1,140 @@
+import { mapWithConcurrency } from "../lib/concurrency.js";
+import { LRUCache } from "../lib/lru.js";
+import { isValidOID, isValidSize } from "../lib/validation.js";
+import type { LFSObjectRequest } from "../types/index.js";
+
+export interface ManifestShard {
+  etag: string | null;
+  sizes: ReadonlyMap<string, number>;
+}
+
+export interface ObjectManifest {
+  // Sizes of the requested objects that the manifest lists
+  sizes: ReadonlyMap<string, number>;
+  // Shards read for the request, by OID prefix; recordObjects only rewrites these
+  shards: ReadonlyMap<string, ManifestShard>;
+}
+
+// Manifests are split into 16 shards by the first hex digit of the OID, so each write only rewrites the shards
+// that gain objects. Few shards keep the number of R2 reads per batch low
+const SHARD_PREFIX_LENGTH = 1;
+const SHARD_CONCURRENCY = 32;
+const MANIFEST_CACHE_MAX_ENTRIES = 1024;
+const MANIFEST_CACHE_MAX_OIDS = 50_000;
+const MANIFEST_CACHE_TTL = 300;
+
+// Parsed shards, including shards that do not exist yet, are trusted per isolate for their TTL, so later batches
+// of the same push read nothing from R2. A stale shard only misses recent entries, which costs a HEAD check
+// rather than a wrong answer. The cache is bounded by the OIDs it holds, since a single shard of a large
+// repository can list thousands of objects
+const manifestCache = new LRUCache<ManifestShard>(MANIFEST_CACHE_MAX_ENTRIES, {
+  maxWeight: MANIFEST_CACHE_MAX_OIDS,
+  weigh: (shard) => shard.sizes.size,
+});
+
+const shardPrefix = (oid: string) => oid.slice(0, SHARD_PREFIX_LENGTH);
+
+export function generateManifestKey(org: string, repo: string, prefix: string): string {
+  // Organization names cannot start with a period, so this prefix never collides with object keys
+  return `.manifests/${org}/${repo}/${prefix}`;
+}
+
+export function parseManifest(text: string): Map<string, number> {
+  const sizes = new Map<string, number>();
+  for (const line of text.split("\n")) {
+    const [oid = "", size = ""] = line.split(" ");
+    const parsedSize = Number(size);
+    if (isValidOID(oid) && size !== "" && isValidSize(parsedSize)) {
+      sizes.set(oid, parsedSize);
+    }
+  }
+  return sizes;
+}
+
+export function serializeManifest(sizes: ReadonlyMap<string, number>): string {
+  return Array.from(sizes.keys())
+    .sort()
+    .map((oid) => `${oid} ${sizes.get(oid)}\n`)
+    .join("");
+}
+
+export function clearManifestCache(): void {
+  manifestCache.clear();
+}
+
+async function readShard(env: Env, key: string): Promise<ManifestShard> {
+  const cached = manifestCache.get(key);
+  if (cached) {
+    return cached;
+  }
+
+  const object = await env.LFS_BUCKET.get(key);
+  const shard: ManifestShard = object
+    ? { etag: object.etag, sizes: parseManifest(await object.text()) }
+    : { etag: null, sizes: new Map() };
+  manifestCache.set(key, shard, MANIFEST_CACHE_TTL * 1000);
+  return shard;
+}
+
+export async function readManifest(
+  env: Env,
+  org: string,
+  repo: string,
+  oids: readonly string[]
+): Promise<ObjectManifest> {
+  const prefixes = Array.from(new Set(oids.map(shardPrefix)));
+  const concurrency = env.OBJECT_CONCURRENCY ?? SHARD_CONCURRENCY;
+  const read = await mapWithConcurrency(prefixes, concurrency, (prefix) =>
+    readShard(env, generateManifestKey(org, repo, prefix))
+  );
+  const shards = new Map(prefixes.map((prefix, i) => [prefix, read[i] as ManifestShard]));
+
+  const sizes = new Map<string, number>();
+  for (const oid of oids) {
+    const size = shards.get(shardPrefix(oid))?.sizes.get(oid);
+    if (size !== undefined) {
+      sizes.set(oid, size);
+    }
+  }
+  return { sizes, shards };
+}
+
+export async function recordObjects(
+  env: Env,
+  org: string,
+  repo: string,
+  manifest: ObjectManifest,
+  objects: LFSObjectRequest[]
+): Promise<void> {
+  const updates = new Map<string, LFSObjectRequest[]>();
+  for (const obj of objects) {
+    const prefix = shardPrefix(obj.oid);
+    const added = updates.get(prefix);
+    if (added) {
+      added.push(obj);
+    } else {
+      updates.set(prefix, [obj]);
+    }
+  }
+
+  const concurrency = env.OBJECT_CONCURRENCY ?? SHARD_CONCURRENCY;
+  await mapWithConcurrency(Array.from(updates), concurrency, async ([prefix, added]) => {
+    const key = generateManifestKey(org, repo, prefix);
+    const shard = manifest.shards.get(prefix) ?? { etag: null, sizes: new Map() };
+    const sizes = new Map(shard.sizes);
+    for (const obj of added) {
+      sizes.set(obj.oid, obj.size);
+    }
+
+    // Conditional write: if another batch updated the shard first, these objects are recorded by a later batch.
+    // A new shard is written unconditionally; losing a concurrent writer's entries only costs HEAD checks
+    const options = shard.etag ? { onlyIf: { etagMatches: shard.etag } } : undefined;
+    const written = await env.LFS_BUCKET.put(key, serializeManifest(sizes), options);
+    if (written) {
+      manifestCache.set(key, { etag: written.etag, sizes }, MANIFEST_CACHE_TTL * 1000);
+    } else {
+      // The cached shard is out of date; read it again so later writes are not rejected until it expires
+      manifestCache.delete(key);
+    }
+  });
+}
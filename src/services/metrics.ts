@@ -0,0 +1,38 @@
+import type { RequestTimer } from "../lib/timing.js";
+import type { LFSOperation } from "../types/index.js";
+
+export type CacheResult = "memory" | "kv" | "stale" | "miss" | "none";
+
+export interface BatchMetrics {
+  org: string;
+  operation: LFSOperation | "unknown";
+  objects: number;
+  status: number;
+  timer: RequestTimer;
+}
+
+// "none" covers requests rejected before the permission lookup and callers that joined another request's lookup
+export function getCacheResult(timer: RequestTimer): CacheResult {
+  if (timer.getCount("cache.memory") > 0) return "memory";
+  if (timer.getCount("cache.kv") > 0) return "kv";
+  if (timer.getCount("cache.stale") > 0) return "stale";
+  if (timer.getDuration("github") !== undefined) return "miss";
+  return "none";
+}
+
+// One Analytics Engine datapoint per batch request, indexed by organization. Field order is part of the
+// dataset schema: blob1..3 and double1..5 are what queries refer to, so new fields are only ever appended
+export function writeBatchMetrics(env: Env, metrics: BatchMetrics): void {
+  const { org, operation, objects, status, timer } = metrics;
+  env.METRICS?.writeDataPoint({
+    indexes: [org],
+    blobs: [operation, getCacheResult(timer), String(status)],
+    doubles: [
+      objects,
+      timer.getDuration("github") ?? 0,
+      timer.getCount("r2.head"),
+      status,
+      timer.getDuration("total") ?? 0,
+    ],
+  });
+}
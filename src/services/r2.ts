@@ -1,47 +1,257 @@
-import { AwsV4Signer } from "aws4fetch";
+import { LRUCache } from "../lib/lru.js";
 
 export interface ObjectExistsResult {
   exists: boolean;
   size?: number;
 }
 
-export function generateObjectKey(org: string, repo: string, oid: string): string {
-  const shardPrefix = oid.slice(0, 2);
-  return `${org}/${repo}/${shardPrefix}/${oid}`;
+export type ObjectScope = "repo" | "org";
+
+export interface SigningOptions {
+  method: "GET" | "PUT";
+  accessKeyId: string;
+  secretAccessKey: string;
+  region: string;
+  service: string;
+  expiresIn: number;
+  date?: Date;
 }
 
-async function generatePresignedUrl(env: Env, objectKey: string, method: "GET" | "PUT"): Promise<string> {
-  const url = new URL(
-    `https://${env.CLOUDFLARE_ACCOUNT_ID}.r2.cloudflarestorage.com/${env.R2_BUCKET_NAME}/${objectKey}`
+export interface PresignOptions extends SigningOptions {
+  url: string;
+}
+
+type PathSigner = (path: string) => Promise<string>;
+
+const SIGNING_ALGORITHM = "AWS4-HMAC-SHA256";
+const UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD";
+const R2_REGION = "auto";
+const R2_SERVICE = "s3";
+const MAX_SIGNING_KEYS = 16;
+const MAX_CACHED_URLS = 1000;
+
+const encoder = new TextEncoder();
+
+// Derived signing keys only change with the UTC date, so they are kept for the lifetime of the isolate
+const signingKeyCache = new Map<string, Promise<CryptoKey>>();
+
+// Download URLs are signed at the start of a fixed window, so repeated requests for the same object
+// within the window get the same URL and can be served without signing again
+const downloadUrlCache = new LRUCache<string>(MAX_CACHED_URLS);
+
+function toHex(buffer: ArrayBuffer): string {
+  return Array.from(new Uint8Array(buffer))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+function encodeRfc3986(value: string): string {
+  return encodeURIComponent(value).replace(/[!'()*]/g, (c) => `%${c.charCodeAt(0).toString(16).toUpperCase()}`);
+}
+
+function formatAmzDate(date: Date): string {
+  return date.toISOString().replace(/[:-]|\.\d{3}/g, "");
+}
+
+function importHmacKey(raw: BufferSource): Promise<CryptoKey> {
+  return crypto.subtle.importKey("raw", raw, { name: "HMAC", hash: "SHA-256" }, false, ["sign"]);
+}
+
+async function hmac(key: CryptoKey, data: string): Promise<ArrayBuffer> {
+  return crypto.subtle.sign("HMAC", key, encoder.encode(data));
+}
+
+async function deriveSigningKey(
+  secretAccessKey: string,
+  dateStamp: string,
+  region: string,
+  service: string
+): Promise<CryptoKey> {
+  let key = await importHmacKey(encoder.encode(`AWS4${secretAccessKey}`));
+  for (const part of [dateStamp, region, service, "aws4_request"]) {
+    key = await importHmacKey(await hmac(key, part));
+  }
+  return key;
+}
+
+export function getSigningKey(
+  accessKeyId: string,
+  secretAccessKey: string,
+  dateStamp: string,
+  region: string,
+  service: string
+): Promise<CryptoKey> {
+  const cacheKey = `${accessKeyId}/${dateStamp}/${region}/${service}`;
+  let signingKey = signingKeyCache.get(cacheKey);
+  if (!signingKey) {
+    // Keys from previous days are never reused, so dropping everything is enough to stay bounded
+    if (signingKeyCache.size >= MAX_SIGNING_KEYS) {
+      signingKeyCache.clear();
+    }
+    signingKey = deriveSigningKey(secretAccessKey, dateStamp, region, service);
+    signingKey.catch(() => signingKeyCache.delete(cacheKey));
+    signingKeyCache.set(cacheKey, signingKey);
+  }
+  return signingKey;
+}
+
+// Everything except the object path is shared by all URLs signed in the same batch,
+// so the canonical query, credential scope and signing key are only computed once
+async function createPresigner(origin: string, query: URLSearchParams, options: SigningOptions): Promise<PathSigner> {
+  const host = new URL(origin).host;
+  const amzDate = formatAmzDate(options.date ?? new Date());
+  const dateStamp = amzDate.slice(0, 8);
+  const credentialScope = `${dateStamp}/${options.region}/${options.service}/aws4_request`;
+
+  query.set("X-Amz-Algorithm", SIGNING_ALGORITHM);
+  query.set("X-Amz-Credential", `${options.accessKeyId}/${credentialScope}`);
+  query.set("X-Amz-Date", amzDate);
+  query.set("X-Amz-Expires", String(options.expiresIn));
+  query.set("X-Amz-SignedHeaders", "host");
+
+  const canonicalQuery = Array.from(query, ([name, value]) => [encodeRfc3986(name), encodeRfc3986(value)])
+    .sort(([a = ""], [b = ""]) => (a < b ? -1 : a > b ? 1 : 0))
+    .map(([name, value]) => `${name}=${value}`)
+    .join("&");
+  const canonicalRequestSuffix = `${canonicalQuery}\nhost:${host}\n\nhost\n${UNSIGNED_PAYLOAD}`;
+  const stringToSignPrefix = `${SIGNING_ALGORITHM}\n${amzDate}\n${credentialScope}\n`;
+
+  const signingKey = await getSigningKey(
+    options.accessKeyId,
+    options.secretAccessKey,
+    dateStamp,
+    options.region,
+    options.service
   );
-  url.searchParams.set("X-Amz-Expires", String(env.URL_EXPIRY));
 
-  const signer = new AwsV4Signer({
+  return async (path: string): Promise<string> => {
+    const canonicalPath = path.split("/").map(encodeRfc3986).join("/");
+    const canonicalRequest = `${options.method}\n${canonicalPath}\n${canonicalRequestSuffix}`;
+    const canonicalRequestHash = toHex(await crypto.subtle.digest("SHA-256", encoder.encode(canonicalRequest)));
+    const signature = toHex(await hmac(signingKey, `${stringToSignPrefix}${canonicalRequestHash}`));
+    return `${origin}${canonicalPath}?${canonicalQuery}&X-Amz-Signature=${signature}`;
+  };
+}
+
+export async function presignUrl(options: PresignOptions): Promise<string> {
+  const url = new URL(options.url);
+  const sign = await createPresigner(url.origin, url.searchParams, options);
+  return sign(decodeURIComponent(url.pathname));
+}
+
+export function getObjectScope(env: Env): ObjectScope {
+  const scope: string | undefined = env.OBJECT_STORE_SCOPE;
+  // There is no deployment-wide scope: a reference would let any writer claim objects across organizations
+  return scope === "org" ? scope : "repo";
+}
+
+// Repository names cannot start with a period, so the shared prefix never collides with a repository
+export function generateObjectKey(org: string, repo: string, oid: string, scope: ObjectScope = "repo"): string {
+  const shardPrefix = oid.slice(0, 2);
+  return scope === "org" ? `${org}/.objects/${shardPrefix}/${oid}` : `${org}/${repo}/${shardPrefix}/${oid}`;
+}
+
+export function generateReferenceKey(org: string, repo: string, oid: string): string {
+  const shardPrefix = oid.slice(0, 2);
+  return `.refs/${org}/${repo}/${shardPrefix}/${oid}`;
+}
+
+// Length in seconds of the window download URLs are reused for; 0 when every URL is signed fresh
+export function getDownloadUrlWindow(env: Env): number {
+  const minRemaining = Math.min(Math.max(env.DOWNLOAD_URL_MIN_REMAINING ?? 1, 0), 1);
+  return Math.floor(env.URL_EXPIRY * (1 - minRemaining));
+}
+
+// Lifetime a download URL is guaranteed to have left when it is returned, whenever in its window that is
+export function getDownloadUrlLifetime(env: Env): number {
+  return env.URL_EXPIRY - getDownloadUrlWindow(env);
+}
+
+export function clearDownloadUrlCache(): void {
+  downloadUrlCache.clear();
+}
+
+// Origin of the S3-compatible API the presigned URLs point at
+export function getR2Endpoint(env: Env): string {
+  return (env.R2_ENDPOINT || `https://${env.CLOUDFLARE_ACCOUNT_ID}.r2.cloudflarestorage.com`).replace(/\/+$/, "");
+}
+
+function createR2Presigner(env: Env, method: "GET" | "PUT", date?: Date): Promise<PathSigner> {
+  return createPresigner(getR2Endpoint(env), new URLSearchParams(), {
+    method,
     accessKeyId: env.R2_ACCESS_KEY_ID,
     secretAccessKey: env.R2_SECRET_ACCESS_KEY,
-    url: url.toString(),
-    method,
-    service: "s3",
-    region: "auto",
-    signQuery: true,
+    region: R2_REGION,
+    service: R2_SERVICE,
+    expiresIn: env.URL_EXPIRY,
+    date,
   });
+}
+
+async function generatePresignedUrl(env: Env, objectKey: string, method: "GET" | "PUT"): Promise<string> {
+  const sign = await createR2Presigner(env, method);
+  return sign(`/${env.R2_BUCKET_NAME}/${objectKey}`);
+}
+
+// Signs one object at a time with a presigner shared by the whole batch, so each URL can be used as soon as it is
+// signed. Download URLs are signed for the current reuse window and served from the cache while it lasts
+export function createObjectSigner(
+  env: Env,
+  org: string,
+  repo: string,
+  method: "GET" | "PUT"
+): (oid: string) => Promise<string> {
+  const scope = getObjectScope(env);
+  const windowSeconds = method === "GET" ? getDownloadUrlWindow(env) : 0;
+  const now = Date.now();
+  const windowStart = windowSeconds > 0 ? now - (now % (windowSeconds * 1000)) : undefined;
+  // Created on the first object that is not cached, so a fully cached batch never derives a key
+  let presigner: Promise<PathSigner> | undefined;
+  const sign = (objectKey: string) => {
+    presigner ??= createR2Presigner(env, method, windowStart === undefined ? undefined : new Date(windowStart));
+    return presigner.then((signPath) => signPath(`/${env.R2_BUCKET_NAME}/${objectKey}`));
+  };
 
-  const signedRequest = await signer.sign();
-  return signedRequest.url.toString();
+  if (windowStart === undefined) {
+    return (oid) => sign(generateObjectKey(org, repo, oid, scope));
+  }
+
+  const ttl = windowStart + windowSeconds * 1000 - now;
+  return async (oid) => {
+    const objectKey = generateObjectKey(org, repo, oid, scope);
+    const cacheKey = `${env.R2_ACCESS_KEY_ID}/${env.R2_BUCKET_NAME}/${objectKey}@${windowStart}`;
+    const cached = downloadUrlCache.get(cacheKey, now);
+    if (cached !== undefined) {
+      return cached;
+    }
+    const url = await sign(objectKey);
+    downloadUrlCache.set(cacheKey, url, ttl, now);
+    return url;
+  };
+}
+
+export async function presignMany(
+  env: Env,
+  org: string,
+  repo: string,
+  oids: string[],
+  method: "GET" | "PUT"
+): Promise<string[]> {
+  return Promise.all(oids.map(createObjectSigner(env, org, repo, method)));
 }
 
 export async function generateUploadUrl(env: Env, org: string, repo: string, oid: string): Promise<string> {
-  const objectKey = generateObjectKey(org, repo, oid);
+  const objectKey = generateObjectKey(org, repo, oid, getObjectScope(env));
   return generatePresignedUrl(env, objectKey, "PUT");
 }
 
 export async function generateDownloadUrl(env: Env, org: string, repo: string, oid: string): Promise<string> {
-  const objectKey = generateObjectKey(org, repo, oid);
-  return generatePresignedUrl(env, objectKey, "GET");
+  const [url] = await presignMany(env, org, repo, [oid], "GET");
+  return url as string;
 }
 
 export async function objectExists(env: Env, org: string, repo: string, oid: string): Promise<ObjectExistsResult> {
-  const objectKey = generateObjectKey(org, repo, oid);
+  const objectKey = generateObjectKey(org, repo, oid, getObjectScope(env));
   const head = await env.LFS_BUCKET.head(objectKey);
 
   if (!head) {
@@ -50,3 +260,13 @@ export async function objectExists(env: Env, org: string, repo: string, oid: str
 
   return { exists: true, size: head.size };
 }
+
+// With a shared keyspace, a repository may only use objects it has a reference record for
+export async function addReference(env: Env, org: string, repo: string, oid: string): Promise<void> {
+  await env.LFS_BUCKET.put(generateReferenceKey(org, repo, oid), "");
+}
+
+export async function hasReference(env: Env, org: string, repo: string, oid: string): Promise<boolean> {
+  const head = await env.LFS_BUCKET.head(generateReferenceKey(org, repo, oid));
+  return head !== null;
+}
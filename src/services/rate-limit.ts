@@ -0,0 +1,66 @@
+import { LRUCache } from "../lib/lru.js";
+
+export interface RateLimitStatus {
+  remaining: number;
+  resetAt: number;
+}
+
+const MAX_TRACKED_TOKENS = 1000;
+// Wait assumed when GitHub asks to slow down without saying until when
+const DEFAULT_RETRY_AFTER = 60;
+
+// Below this many remaining calls, cached permissions are served instead of spending what is left
+export const RATE_LIMIT_RESERVE = 50;
+
+// Last known GitHub budget per token hash, kept until the budget resets
+const budgets = new LRUCache<RateLimitStatus>(MAX_TRACKED_TOKENS);
+
+// Retry-After is either a number of seconds or an HTTP date; returns seconds from now, or undefined if unparseable
+export function parseRetryAfter(value: string | null, now = Date.now()): number | undefined {
+  if (!value) {
+    return undefined;
+  }
+  if (/^\d+$/.test(value.trim())) {
+    return Number.parseInt(value, 10);
+  }
+  const date = Date.parse(value);
+  return Number.isFinite(date) ? Math.max(Math.ceil((date - now) / 1000), 0) : undefined;
+}
+
+function parseHeaderInt(headers: Headers, name: string): number | undefined {
+  const value = Number.parseInt(headers.get(name) ?? "", 10);
+  return Number.isFinite(value) ? value : undefined;
+}
+
+export function parseRateLimit(headers: Headers, now = Date.now()): RateLimitStatus | null {
+  const remaining = parseHeaderInt(headers, "X-RateLimit-Remaining");
+  const reset = parseHeaderInt(headers, "X-RateLimit-Reset");
+
+  if (headers.has("Retry-After")) {
+    const retryAfter = parseRetryAfter(headers.get("Retry-After"), now);
+    const nowSeconds = Math.floor(now / 1000);
+    const fallback = reset ?? nowSeconds + DEFAULT_RETRY_AFTER;
+    return { remaining: 0, resetAt: retryAfter !== undefined ? nowSeconds + retryAfter : fallback };
+  }
+
+  if (remaining === undefined || reset === undefined) {
+    return null;
+  }
+  return { remaining, resetAt: reset };
+}
+
+export function recordRateLimit(tokenHash: string, status: RateLimitStatus, now = Date.now()): void {
+  // A non-finite reset would never expire and block the token for the lifetime of the isolate
+  if (!Number.isFinite(status.resetAt) || !Number.isFinite(status.remaining)) {
+    return;
+  }
+  budgets.set(tokenHash, status, status.resetAt * 1000 - now, now);
+}
+
+export function getRateLimit(tokenHash: string, now = Date.now()): RateLimitStatus | undefined {
+  return budgets.get(tokenHash, now);
+}
+
+export function clearRateLimits(): void {
+  budgets.clear();
+}
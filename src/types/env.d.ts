@@ -4,6 +4,12 @@ declare global {
     CLOUDFLARE_ACCOUNT_ID: string;
     R2_ACCESS_KEY_ID: string;
     R2_SECRET_ACCESS_KEY: string;
+    // Optional GitHub App credentials; when both are set, permissions are checked through the app installation
+    GITHUB_APP_ID?: string;
+    GITHUB_APP_PRIVATE_KEY?: string;
+    // Optional endpoint overrides for GitHub Enterprise Server or the offline harness (test/scripts/local_harness.py)
+    GITHUB_API_URL?: string;
+    R2_ENDPOINT?: string;
   }
 }
 
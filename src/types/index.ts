@@ -6,4 +6,5 @@ export type {
   LFSObjectRequest,
   LFSObjectResponse,
   LFSOperation,
+  PendingBatchResponse,
 } from "./lfs.js";
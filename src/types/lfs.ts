@@ -40,3 +40,8 @@ export interface LFSBatchResponse {
   objects: LFSObjectResponse[];
   hash_algo?: string;
 }
+
+// A batch response whose objects settle one at a time, in any order
+export interface PendingBatchResponse extends Omit<LFSBatchResponse, "objects"> {
+  objects: Promise<LFSObjectResponse>[];
+}
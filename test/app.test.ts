@@ -1,11 +1,15 @@
 import { beforeEach, describe, expect, it, vi } from "vitest";
 import { app } from "../src/app.js";
+import { RequestTimer } from "../src/lib/timing.js";
+import { clearMemoryCache } from "../src/services/cache.js";
+import { resetCircuitBreaker } from "../src/services/circuit-breaker.js";
 import * as github from "../src/services/github.js";
 import * as lfs from "../src/services/lfs.js";
-import type { LFSBatchResponse } from "../src/types/index.js";
+import type { LFSBatchResponse, LFSObjectResponse } from "../src/types/index.js";
 
 // Mock external dependencies
 vi.mock("../src/services/github.js", () => ({
+  getGitHubRequestPolicy: vi.fn(),
   getRepositoryPermission: vi.fn(),
   hasOperationPermission: vi.fn(),
   mapGitHubPermissions: vi.fn(),
@@ -23,6 +27,7 @@ vi.mock("../src/services/github.js", () => ({
 
 vi.mock("../src/services/lfs.js", () => ({
   validateBatchRequest: vi.fn(),
+  processBatchObjects: vi.fn(),
   processBatchRequest: vi.fn(),
 }));
 
@@ -34,6 +39,7 @@ const TEST_REPO = "test-repo";
 const TEST_URL_EXPIRY = 600;
 const VALID_TOKEN = "ghp_validtoken123";
 const LFS_CONTENT_TYPE = "application/vnd.git-lfs+json";
+const TEST_REQUEST_POLICY = { apiUrl: "https://api.github.com", timeoutMs: 3000, retries: 2, hedgeAfterMs: 0 };
 
 // Helper to create mock KV namespace for caching
 const createMockKV = () =>
@@ -96,8 +102,11 @@ describe("LFS Server Application", () => {
 
   beforeEach(() => {
     vi.clearAllMocks();
+    clearMemoryCache();
+    resetCircuitBreaker();
     vi.mocked(github.hasOperationPermission).mockReturnValue(true);
     vi.mocked(lfs.validateBatchRequest).mockReturnValue({ valid: true });
+    vi.mocked(github.getGitHubRequestPolicy).mockReturnValue(TEST_REQUEST_POLICY);
   });
 
   describe("Route: POST /:org/:repo.git/info/lfs/objects/batch", () => {
@@ -155,8 +164,20 @@ describe("LFS Server Application", () => {
         const request = createRequest();
         await app.fetch(request, env);
 
-        expect(github.getRepositoryPermission).toHaveBeenCalledWith(VALID_TOKEN, TEST_ORG, TEST_REPO);
-        expect(lfs.processBatchRequest).toHaveBeenCalledWith(expect.anything(), TEST_ORG, TEST_REPO, expect.anything());
+        expect(github.getRepositoryPermission).toHaveBeenCalledWith(
+          VALID_TOKEN,
+          TEST_ORG,
+          TEST_REPO,
+          {},
+          TEST_REQUEST_POLICY
+        );
+        expect(lfs.processBatchRequest).toHaveBeenCalledWith(
+          expect.anything(),
+          TEST_ORG,
+          TEST_REPO,
+          expect.anything(),
+          expect.any(RequestTimer)
+        );
       });
 
       it("includes hash_algo in response when provided in request", async () => {
@@ -478,6 +499,18 @@ describe("LFS Server Application", () => {
       });
     });
 
+    describe("configurable batch size", () => {
+      it("passes MAX_BATCH_OBJECTS from env to batch validation", async () => {
+        vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+        vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+        const request = createRequest();
+        await app.fetch(request, createMockEnv({ MAX_BATCH_OBJECTS: 500 }));
+
+        expect(lfs.validateBatchRequest).toHaveBeenCalledWith(expect.anything(), 500);
+      });
+    });
+
     describe("invalid batch request", () => {
       it("returns 422 for invalid operation", async () => {
         vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
@@ -524,6 +557,179 @@ describe("LFS Server Application", () => {
     });
   });
 
+  describe("Request Pipeline", () => {
+    it("parses and validates the body while the permission lookup is pending", async () => {
+      let resolvePermission: (permission: "read") => void = () => {};
+      vi.mocked(github.getRepositoryPermission).mockReturnValue(
+        new Promise((resolve) => {
+          resolvePermission = resolve;
+        })
+      );
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+      const pending = app.fetch(createRequest(), env);
+      await vi.waitFor(() => expect(lfs.validateBatchRequest).toHaveBeenCalled());
+      expect(lfs.processBatchRequest).not.toHaveBeenCalled();
+
+      resolvePermission("read");
+      const response = await pending;
+
+      expect(response.status).toBe(200);
+    });
+
+    it.each([
+      ["no access", () => vi.mocked(github.getRepositoryPermission).mockResolvedValue("none"), 403],
+      [
+        "rate limiting",
+        () =>
+          vi.mocked(github.getRepositoryPermission).mockRejectedValue(new github.GitHubRateLimitError("Rate limited")),
+        429,
+      ],
+      [
+        "upstream errors",
+        () => vi.mocked(github.getRepositoryPermission).mockRejectedValue(new Error("GitHub API error: 503")),
+        502,
+      ],
+    ])("reports %s before invalid JSON bodies", async (_, setup, expectedStatus) => {
+      setup();
+
+      const request = new Request(`https://lfs.example.com/${TEST_ORG}/${TEST_REPO}.git/info/lfs/objects/batch`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${VALID_TOKEN}`, "Content-Type": "application/json" },
+        body: "{ invalid json }",
+      });
+      const response = await app.fetch(request, env);
+
+      expect(response.status).toBe(expectedStatus);
+    });
+
+    it("reports missing permissions before batch validation errors", async () => {
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("none");
+      vi.mocked(lfs.validateBatchRequest).mockReturnValue({ valid: false, error: "Invalid operation", status: 422 });
+
+      const response = await app.fetch(createRequest(), env);
+
+      expect(response.status).toBe(403);
+    });
+  });
+
+  describe("Streaming Responses", () => {
+    const batch: LFSBatchResponse = {
+      transfer: "basic",
+      objects: [{ oid: VALID_OID, size: VALID_SIZE, authenticated: true }],
+      hash_algo: "sha256",
+    };
+
+    it("sends the response before the batch is processed when the batch is large enough", async () => {
+      let resolveObject: (response: LFSObjectResponse) => void = () => {};
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchObjects).mockReturnValue({
+        response: {
+          transfer: "basic",
+          objects: [
+            new Promise((resolve) => {
+              resolveObject = resolve;
+            }),
+          ],
+          hash_algo: "sha256",
+        },
+        done: Promise.resolve(),
+      });
+
+      const response = await app.fetch(createRequest(), createMockEnv({ STREAM_RESPONSE_MIN_OBJECTS: 1 }));
+      resolveObject(batch.objects[0] as LFSObjectResponse);
+
+      expect(response.status).toBe(200);
+      expect(response.headers.get("Content-Type")).toBe(LFS_CONTENT_TYPE);
+      expect(await response.text()).toBe(JSON.stringify(batch));
+      expect(lfs.processBatchRequest).not.toHaveBeenCalled();
+    });
+
+    it("serializes batches below STREAM_RESPONSE_MIN_OBJECTS in one go", async () => {
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue(batch);
+
+      const response = await app.fetch(createRequest(), createMockEnv({ STREAM_RESPONSE_MIN_OBJECTS: 2 }));
+
+      expect(response.headers.get("Content-Type")).toBe(LFS_CONTENT_TYPE);
+      expect(await response.json()).toEqual(batch);      expect(lfs.processBatchObjects).not.toHaveBeenCalled();
+    });
+  });
+
+  describe("Server-Timing and Metrics", () => {
+    const stageNames = (response: Response) =>
+      (response.headers.get("Server-Timing") ?? "").split(", ").map((entry) => entry.split(";")[0]);
+
+    it("reports the duration of each stage", async () => {
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+      const response = await app.fetch(createRequest(), env);
+
+      expect(response.headers.get("Server-Timing")).toMatch(/^(\w+;dur=\d+(\.\d)?(, |$))+$/);
+      expect(stageNames(response)).toEqual(
+        expect.arrayContaining(["kv", "github", "permission", "body", "batch", "total"])
+      );
+    });
+
+    it("reports timings on error responses", async () => {
+      const response = await app.fetch(createRequest({ token: null }), env);
+
+      expect(response.status).toBe(401);
+      expect(stageNames(response)).toEqual(["total"]);
+    });
+
+    it("logs the timings once the batch is processed when LOG_TIMINGS is set", async () => {
+      const log = vi.spyOn(console, "log").mockImplementation(() => undefined);
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+      await app.fetch(createRequest(), createMockEnv({ LOG_TIMINGS: true }));
+
+      await vi.waitFor(() => expect(log).toHaveBeenCalledOnce());
+      const record = JSON.parse(log.mock.calls[0]?.[0] as string);
+      expect(record).toMatchObject({ message: "lfs batch", status: 200 });
+      expect(Object.keys(record.timings)).toEqual(expect.arrayContaining(["permission", "batch", "total"]));
+      log.mockRestore();
+    });
+
+    it("writes a metrics datapoint for each batch request", async () => {
+      const writeDataPoint = vi.fn();
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+      await app.fetch(createRequest(), createMockEnv({ METRICS: { writeDataPoint } }));
+
+      await vi.waitFor(() => expect(writeDataPoint).toHaveBeenCalledOnce());
+      expect(writeDataPoint.mock.calls[0]?.[0]).toMatchObject({
+        indexes: [TEST_ORG],
+        blobs: ["download", "miss", "200"],
+        doubles: [1, expect.any(Number), 0, 200, expect.any(Number)],
+      });
+    });
+
+    it("writes metrics for requests rejected before the body is read", async () => {
+      const writeDataPoint = vi.fn();
+
+      await app.fetch(createRequest({ token: null }), createMockEnv({ METRICS: { writeDataPoint } }));
+
+      await vi.waitFor(() => expect(writeDataPoint).toHaveBeenCalledOnce());
+      expect(writeDataPoint.mock.calls[0]?.[0]).toMatchObject({ blobs: ["unknown", "none", "401"] });
+    });
+
+    it("does not log without LOG_TIMINGS", async () => {
+      const log = vi.spyOn(console, "log").mockImplementation(() => undefined);
+      vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
+      vi.mocked(lfs.processBatchRequest).mockResolvedValue({ transfer: "basic", objects: [] });
+
+      await app.fetch(createRequest(), env);
+      await new Promise((resolve) => setTimeout(resolve, 0));
+
+      expect(log).not.toHaveBeenCalled();
+      log.mockRestore();
+    });
+  });
+
   describe("Content Negotiation", () => {
     it("always returns Content-Type: application/vnd.git-lfs+json", async () => {
       vi.mocked(github.getRepositoryPermission).mockResolvedValue("read");
@@ -593,6 +799,20 @@ describe("LFS Server Application", () => {
 
       expect(response.status).toBe(502);
     });
+
+    it("fails fast with 503 once GitHub keeps failing", async () => {
+      vi.mocked(github.getRepositoryPermission).mockRejectedValue(new Error("GitHub API error: 503"));
+      for (let i = 0; i < 10; i++) {
+        await app.fetch(createRequest(), env);
+      }
+      vi.mocked(github.getRepositoryPermission).mockClear();
+
+      const response = await app.fetch(createRequest(), env);
+
+      expect(response.status).toBe(503);
+      expect(response.headers.get("Retry-After")).toBe("30");
+      expect(github.getRepositoryPermission).not.toHaveBeenCalled();
+    });
   });
 });
 
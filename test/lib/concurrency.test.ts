@@ -0,0 +1,46 @@
+import { describe, expect, it } from "vitest";
+import { mapWithConcurrency } from "../../src/lib/concurrency.js";
+
+describe("mapWithConcurrency", () => {
+  it("returns results in input order", async () => {
+    const delays = [30, 10, 20, 0];
+
+    const results = await mapWithConcurrency(delays, 2, async (delay, index) => {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      return index;
+    });
+
+    expect(results).toEqual([0, 1, 2, 3]);
+  });
+
+  it.each([
+    [1, 10],
+    [3, 10],
+    [5, 2],
+  ])("runs at most %i calls at once", async (limit, count) => {
+    let active = 0;
+    let maxActive = 0;
+
+    await mapWithConcurrency(Array.from({ length: count }), limit, async () => {
+      active++;
+      maxActive = Math.max(maxActive, active);
+      await new Promise((resolve) => setTimeout(resolve, 1));
+      active--;
+    });
+
+    expect(maxActive).toBe(Math.min(limit, count));
+  });
+
+  it("returns an empty array for empty input", async () => {
+    expect(await mapWithConcurrency([], 4, async () => 1)).toEqual([]);
+  });
+
+  it("rejects when a call fails", async () => {
+    await expect(
+      mapWithConcurrency([1, 2, 3], 2, async (item) => {
+        if (item === 2) throw new Error("failed");
+        return item;
+      })
+    ).rejects.toThrow("failed");
+  });
+});
@@ -0,0 +1,83 @@
+import { describe, expect, it } from "vitest";
+import { streamBatchResponse } from "../../src/lib/json-stream.js";
+import type { LFSBatchResponse, LFSObjectResponse, PendingBatchResponse } from "../../src/types/index.js";
+
+const pending = (response: LFSBatchResponse): PendingBatchResponse => ({
+  ...response,
+  objects: response.objects.map((obj) => Promise.resolve(obj)),
+});
+
+const readChunks = async (stream: ReadableStream<Uint8Array>): Promise<string[]> => {
+  const decoder = new TextDecoder();
+  const chunks: string[] = [];
+  for await (const chunk of stream) {
+    chunks.push(decoder.decode(chunk));
+  }
+  return chunks;
+};
+
+describe("streamBatchResponse", () => {
+  it.each([
+    ["an empty batch", { transfer: "basic", objects: [] }],
+    [
+      "objects with actions and errors",
+      {
+        transfer: "basic",
+        objects: [
+          {
+            oid: "a".repeat(64),
+            size: 1,
+            authenticated: true,
+            actions: { download: { href: 'https://x/"y"', expires_in: 60 } },
+          },
+          { oid: "b".repeat(64), size: 2, error: { code: 404, message: "Object does not exist" } },
+        ],
+      },
+    ],
+    ["hash_algo", { transfer: "basic", objects: [{ oid: "a".repeat(64), size: 1 }], hash_algo: "sha256" }],
+    ["no transfer", { objects: [{ oid: "a".repeat(64), size: 1 }] }],
+  ])("matches JSON.stringify for %s", async (_, response) => {
+    const chunks = await readChunks(streamBatchResponse(pending(response as LFSBatchResponse)));
+
+    expect(chunks.join("")).toBe(JSON.stringify(response));
+  });
+
+  it("writes one chunk per object", async () => {
+    const objects = Array.from({ length: 3 }, (_, i) => ({ oid: String(i).repeat(64), size: i }));
+
+    const chunks = await readChunks(streamBatchResponse(pending({ transfer: "basic", objects })));
+
+    expect(chunks).toHaveLength(objects.length + 2);
+    expect(JSON.parse(chunks[1] as string)).toEqual(objects[0]);
+    expect(chunks[2]).toBe(`,${JSON.stringify(objects[1])}`);
+  });
+
+  it("writes the head before any object is ready and each object once it settles", async () => {
+    let resolveObject: (response: LFSObjectResponse) => void = () => {};
+    const object = { oid: "a".repeat(64), size: 1 };
+    const stream = streamBatchResponse({
+      transfer: "basic",
+      objects: [
+        new Promise((resolve) => {
+          resolveObject = resolve;
+        }),
+      ],
+    });
+    const reader = stream.getReader();
+    const decoder = new TextDecoder();
+
+    expect(decoder.decode((await reader.read()).value)).toBe('{"transfer":"basic","objects":[');
+    const next = reader.read();
+    resolveObject(object);
+    expect(decoder.decode((await next).value)).toBe(JSON.stringify(object));
+  });
+
+  it("errors the stream when an object fails", async () => {
+    const failed = Promise.reject(new Error("boom"));
+    // processBatchObjects marks its object promises as handled in the same way
+    failed.catch(() => undefined);
+    const stream = streamBatchResponse({ transfer: "basic", objects: [failed] });
+
+    await expect(readChunks(stream)).rejects.toThrow("boom");
+  });
+});
@@ -0,0 +1,123 @@
+import { describe, expect, it } from "vitest";
+import { LRUCache } from "../../src/lib/lru.js";
+
+const NOW = 1_000_000;
+const TTL_MS = 1000;
+
+describe("LRUCache", () => {
+  describe("get/set", () => {
+    it("returns undefined for missing keys", () => {
+      const cache = new LRUCache<string>(10);
+
+      expect(cache.get("missing", NOW)).toBeUndefined();
+    });
+
+    it("returns stored values before they expire", () => {
+      const cache = new LRUCache<string>(10);
+      cache.set("key", "value", TTL_MS, NOW);
+
+      expect(cache.get("key", NOW + TTL_MS - 1)).toBe("value");
+    });
+
+    it.each([
+      ["at expiry", TTL_MS],
+      ["after expiry", TTL_MS + 1],
+    ])("returns undefined and drops the entry %s", (_, elapsed) => {
+      const cache = new LRUCache<string>(10);
+      cache.set("key", "value", TTL_MS, NOW);
+
+      expect(cache.get("key", NOW + elapsed)).toBeUndefined();
+      expect(cache.size).toBe(0);
+    });
+
+    it("does not store entries with a non-positive TTL", () => {
+      const cache = new LRUCache<string>(10);
+      cache.set("key", "value", 0, NOW);
+
+      expect(cache.size).toBe(0);
+    });
+
+    it("overwrites existing entries", () => {
+      const cache = new LRUCache<string>(10);
+      cache.set("key", "old", TTL_MS, NOW);
+      cache.set("key", "new", TTL_MS, NOW);
+
+      expect(cache.get("key", NOW)).toBe("new");
+      expect(cache.size).toBe(1);
+    });
+  });
+
+  describe("eviction", () => {
+    it("evicts the least recently set entry when full", () => {
+      const cache = new LRUCache<number>(2);
+      cache.set("a", 1, TTL_MS, NOW);
+      cache.set("b", 2, TTL_MS, NOW);
+      cache.set("c", 3, TTL_MS, NOW);
+
+      expect(cache.get("a", NOW)).toBeUndefined();
+      expect(cache.get("b", NOW)).toBe(2);
+      expect(cache.get("c", NOW)).toBe(3);
+    });
+
+    it("keeps recently read entries", () => {
+      const cache = new LRUCache<number>(2);
+      cache.set("a", 1, TTL_MS, NOW);
+      cache.set("b", 2, TTL_MS, NOW);
+      cache.get("a", NOW);
+      cache.set("c", 3, TTL_MS, NOW);
+
+      expect(cache.get("a", NOW)).toBe(1);
+      expect(cache.get("b", NOW)).toBeUndefined();
+    });
+
+    it("evicts the oldest entries when the total weight exceeds maxWeight", () => {
+      const cache = new LRUCache<string>(10, { maxWeight: 5, weigh: (value) => value.length });
+      cache.set("a", "aa", TTL_MS, NOW);
+      cache.set("b", "bb", TTL_MS, NOW);
+      cache.set("c", "cc", TTL_MS, NOW);
+
+      expect(cache.get("a", NOW)).toBeUndefined();
+      expect(cache.get("b", NOW)).toBe("bb");
+      expect(cache.get("c", NOW)).toBe("cc");
+    });
+
+    it("releases the weight of deleted and replaced entries", () => {
+      const cache = new LRUCache<string>(10, { maxWeight: 4, weigh: (value) => value.length });
+      cache.set("a", "aaaa", TTL_MS, NOW);
+      cache.set("a", "a", TTL_MS, NOW);
+      cache.set("b", "bbb", TTL_MS, NOW);
+      cache.delete("b");
+      cache.set("c", "ccc", TTL_MS, NOW);
+
+      expect(cache.get("a", NOW)).toBe("a");
+      expect(cache.get("c", NOW)).toBe("ccc");
+    });
+
+    it("does not keep an entry heavier than maxWeight", () => {
+      const cache = new LRUCache<string>(10, { maxWeight: 2, weigh: (value) => value.length });
+      cache.set("a", "aaa", TTL_MS, NOW);
+
+      expect(cache.size).toBe(0);
+    });
+  });
+
+  describe("delete/clear", () => {
+    it("removes a single entry", () => {
+      const cache = new LRUCache<number>(10);
+      cache.set("a", 1, TTL_MS, NOW);
+      cache.set("b", 2, TTL_MS, NOW);
+      cache.delete("a");
+
+      expect(cache.get("a", NOW)).toBeUndefined();
+      expect(cache.get("b", NOW)).toBe(2);
+    });
+
+    it("removes all entries", () => {
+      const cache = new LRUCache<number>(10);
+      cache.set("a", 1, TTL_MS, NOW);
+      cache.clear();
+
+      expect(cache.size).toBe(0);
+    });
+  });
+});
@@ -0,0 +1,78 @@
+import { afterEach, describe, expect, it, vi } from "vitest";
+import { RequestTimer, timed } from "../../src/lib/timing.js";
+
+describe("RequestTimer", () => {
+  afterEach(() => {
+    vi.restoreAllMocks();
+  });
+
+  const mockClock = (...times: number[]) => {
+    const now = vi.spyOn(performance, "now");
+    for (const time of times) {
+      now.mockReturnValueOnce(time);
+    }
+  };
+
+  it("measures each stage and formats it as Server-Timing", async () => {
+    mockClock(0, 12.34, 20, 25);
+    const timer = new RequestTimer();
+
+    await timer.measure("kv", async () => "read");
+    await timer.measure("sign", async () => undefined);
+
+    expect(timer.toJSON()).toEqual({ kv: 12.3, sign: 5 });
+    expect(timer.toServerTiming()).toBe("kv;dur=12.3, sign;dur=5");
+  });
+
+  it("adds up repeated stages", async () => {
+    mockClock(0, 10, 20, 25);
+    const timer = new RequestTimer();
+
+    await timer.measure("r2", async () => undefined);
+    await timer.measure("r2", async () => undefined);
+
+    expect(timer.toJSON()).toEqual({ r2: 15 });
+  });
+
+  it("records failed stages and rethrows their error", async () => {
+    const timer = new RequestTimer();
+
+    await expect(timer.measure("github", () => Promise.reject(new Error("boom")))).rejects.toThrow("boom");
+
+    expect(Object.keys(timer.toJSON())).toEqual(["github"]);
+  });
+
+  it("settles once every started stage has finished", async () => {
+    const timer = new RequestTimer();
+    let finish: () => void = () => undefined;
+    void timer.measure("batch", () => new Promise<void>((resolve) => (finish = resolve)));
+
+    let settled = false;
+    const done = timer.settled().then(() => {
+      settled = true;
+    });
+    await Promise.resolve();
+    expect(settled).toBe(false);
+
+    finish();
+    await done;
+    expect(Object.keys(timer.toJSON())).toEqual(["batch"]);
+  });
+
+  it("returns an empty header when nothing was measured", () => {
+    expect(new RequestTimer().toServerTiming()).toBe("");
+  });
+});
+
+describe("timed", () => {
+  it("runs the work without a timer", async () => {
+    expect(await timed(undefined, "kv", async () => "read")).toBe("read");
+  });
+
+  it("measures the work with a timer", async () => {
+    const timer = new RequestTimer();
+
+    expect(await timed(timer, "kv", async () => "read")).toBe("read");
+    expect(Object.keys(timer.toJSON())).toEqual(["kv"]);
+  });
+});
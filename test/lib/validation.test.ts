@@ -1,5 +1,8 @@
 import { describe, expect, it } from "vitest";
 import {
+  compileAllowedOrgs,
+  getAllowedOrgs,
+  isOrgAllowed,
   isValidOID,
   isValidSize,
   parseAllowedOrgs,
@@ -115,6 +118,52 @@ describe("parseAllowedOrgs", () => {
   });
 });
 
+describe("compileAllowedOrgs", () => {
+  it("separates exact names, prefixes and the wildcard", () => {
+    const allowlist = compileAllowedOrgs("org1, acme-*, org2, team-*, *");
+
+    expect(allowlist.any).toBe(true);
+    expect(Array.from(allowlist.exact)).toEqual(["org1", "org2"]);
+    expect(Array.from(allowlist.prefixes)).toEqual(["acme-", "team-"]);
+    expect(allowlist.prefixLengths).toEqual([5]);
+  });
+
+  it("handles thousands of exact entries", () => {
+    const orgs = Array.from({ length: 5000 }, (_, i) => `org${i}`);
+    const allowlist = compileAllowedOrgs(orgs.join(","));
+
+    expect(allowlist.exact.size).toBe(5000);
+    expect(isOrgAllowed(allowlist, "org4999")).toBe(true);
+    expect(isOrgAllowed(allowlist, "org5000")).toBe(false);
+  });
+});
+
+describe("getAllowedOrgs", () => {
+  it("reuses the compiled allowlist while ALLOWED_ORGS is unchanged", () => {
+    const first = getAllowedOrgs("org1,org2");
+
+    expect(getAllowedOrgs("org1,org2")).toBe(first);
+    expect(getAllowedOrgs("org3")).not.toBe(first);
+    expect(isOrgAllowed(getAllowedOrgs("org3"), "org1")).toBe(false);
+  });
+});
+
+describe("isOrgAllowed", () => {
+  it.each([
+    ["*", "anyorg", true],
+    ["acme-*", "acme-web", true],
+    ["acme-*", "acme-", true],
+    ["acme-*", "acme", false],
+    ["acme-*", "other-acme-web", false],
+    ["acme-*,ab*", "abc", true],
+    ["acme-*,ab*", "a", false],
+    ["org1,acme-*", "org1", true],
+    ["ACME-*", "acme-web", false],
+  ])("ALLOWED_ORGS='%s' and org='%s' returns %s", (allowedOrgs, org, expected) => {
+    expect(isOrgAllowed(compileAllowedOrgs(allowedOrgs), org)).toBe(expected);
+  });
+});
+
 describe("validateOrganization", () => {
   describe("valid organization", () => {
     it.each([
@@ -147,6 +196,13 @@ describe("validateOrganization", () => {
   });
 
   describe("security edge cases", () => {
+    it("applies format checks before wildcard rules", () => {
+      const env = createMockEnv("*");
+      expect(validateOrganization(env, "anyorg")).toBe(true);
+      expect(validateOrganization(env, "../other")).toBe(false);
+      expect(validateOrganization(env, "a".repeat(256))).toBe(false);
+    });
+
     it("rejects org names with special characters", () => {
       const env = createMockEnv("myorg");
       expect(validateOrganization(env, "my<script>org")).toBe(false);
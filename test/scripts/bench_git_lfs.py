@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Git LFS push/pull benchmark on a generated repository.
+
+Generates a repository with a configurable number of LFS files, size distribution, share of
+duplicate content and directory layout, then times `git push` and `git lfs pull` against the
+LFS server end to end, the same way test_git_lfs.py does for its handful of fixed files.
+
+Usage:
+    python bench_git_lfs.py --url "https://your-worker.workers.dev" --token "ghp_xxx" --org "your-org" --repo "your-repo"
+
+    # 20,000 mostly small files, 10% duplicated, 4 directory levels with 8 subdirectories each
+    python bench_git_lfs.py --url "..." --token "ghp_xxx" --org "your-org" --repo "your-repo" \
+        --files 20000 --sizes lognormal:32K:1.5 --duplicates 0.1 --depth 4 --fanout 8
+
+    # Against the offline harness
+    python local_harness.py -- bench_git_lfs.py --files 5000 --sizes 4K-256K
+
+Sizes accept K, M and G suffixes. Every file is generated and verified in chunks, so memory use
+does not depend on file sizes.
+
+Requirements:
+    - git and git-lfs installed
+    - GitHub token with write access to the repository (for LFS authentication)
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from test_git_lfs import (
+    BLUE,
+    RESET,
+    YELLOW,
+    check_prerequisites,
+    configure_lfs,
+    error,
+    file_sha256,
+    info,
+    run,
+    success,
+    write_random_file,
+)
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+# Objects per batch request sent by git-lfs
+LFS_BATCH_SIZE = 100
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark git push and git lfs pull on a generated repository")
+    parser.add_argument("--url", required=True, help="LFS server URL (e.g., https://your-worker.workers.dev)")
+    parser.add_argument("--token", required=True, help="GitHub PAT with repo access")
+    parser.add_argument("--org", required=True, help="GitHub org/user (for LFS path)")
+    parser.add_argument("--repo", required=True, help="Repo name (for LFS path)")
+    scenario = parser.add_argument_group("scenario")
+    scenario.add_argument("--files", type=int, default=1000, help="Number of LFS files")
+    scenario.add_argument(
+        "--sizes", default="64K",
+        help='File sizes: "N", "MIN-MAX" (uniform), "exp:MEAN" or "lognormal:MEDIAN:SIGMA"',
+    )
+    scenario.add_argument("--duplicates", type=float, default=0, help="Fraction of files that copy an earlier file")
+    scenario.add_argument("--depth", type=int, default=2, help="Directory levels above each file")
+    scenario.add_argument("--fanout", type=int, default=10, help="Subdirectories per directory")
+    scenario.add_argument("--seed", type=int, help="Seed for sizes and layout (content is always random)")
+    parser.add_argument("--transfers", type=int, help="git-lfs concurrent transfers (lfs.concurrenttransfers)")
+    parser.add_argument("--no-verify", action="store_true", help="Skip hashing the pulled files")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results to a JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep temp directories after the benchmark")
+    args = parser.parse_args()
+    if args.files < 1:
+        parser.error("--files must be at least 1")
+    if not 0 <= args.duplicates < 1:
+        parser.error("--duplicates must be in [0, 1)")
+    if args.depth < 0 or args.fanout < 1:
+        parser.error("--depth must be at least 0 and --fanout at least 1")
+    try:
+        args.sizes = parse_size_distribution(args.sizes)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def parse_size(value):
+    value = value.strip().upper().removesuffix("B")
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ""
+    return int(float(value[: len(value) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def parse_size_distribution(spec):
+    """Parse a file size distribution into a sampler taking a random.Random and returning bytes (at least 1)."""
+    try:
+        if spec.startswith("exp:"):
+            mean = parse_size(spec[4:])
+            return lambda rng: max(1, math.ceil(rng.expovariate(1 / mean)))
+        if spec.startswith("lognormal:"):
+            median, sigma = spec[10:].split(":")
+            mu, sigma = math.log(parse_size(median)), float(sigma)
+            return lambda rng: max(1, round(rng.lognormvariate(mu, sigma)))
+        if "-" in spec:
+            low, high = (parse_size(n) for n in spec.split("-", 1))
+            return lambda rng: max(1, rng.randint(low, high))
+        size = parse_size(spec)
+        return lambda rng: max(1, size)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"invalid --sizes distribution: {spec!r}") from None
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def generate_files(root, args, rng):
+    """Write the scenario's files under root; returns {relative path: (sha256, size)}."""
+    files = {}
+    unique = []
+    for i in range(args.files):
+        dirs = [f"d{rng.randrange(args.fanout):02d}" for _ in range(args.depth)]
+        relpath = os.path.join("data", *dirs, f"file_{i:06d}.bin")
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if unique and rng.random() < args.duplicates:
+            source = rng.choice(unique)
+            shutil.copyfile(os.path.join(root, source), path)
+            files[relpath] = files[source]
+        else:
+            size = args.sizes(rng)
+            files[relpath] = (write_random_file(path, size), size)
+            unique.append(relpath)
+
+        if (i + 1) % 10000 == 0:
+            info(f"  {i + 1}/{args.files} files written")
+    return files
+
+
+def timed(label, cmd, **kwargs):
+    info(f"{label}...")
+    start = time.perf_counter()
+    run(cmd, capture=True, **kwargs)
+    elapsed = time.perf_counter() - start
+    success(f"{label}: {elapsed:.2f}s")
+    return elapsed
+
+
+def verify_files(root, files):
+    for relpath, (expected_hash, expected_size) in files.items():
+        path = os.path.join(root, relpath)
+        if not os.path.exists(path):
+            return f"{relpath}: NOT FOUND"
+        if os.path.getsize(path) != expected_size:
+            return f"{relpath}: SIZE MISMATCH (expected {expected_size}, got {os.path.getsize(path)})"
+        if file_sha256(path) != expected_hash:
+            return f"{relpath}: HASH MISMATCH"
+    return None
+
+
+def report(results, json_path=None):
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    print(f"\n{BLUE}{'='*40}{RESET}")
+    print(f"{BLUE}Results{RESET}")
+    print(f"{BLUE}{'='*40}{RESET}")
+    print(f"Files:          {results['files']} ({results['unique_objects']} unique objects)")
+    print(f"Total size:     {format_bytes(results['total_bytes'])} ({format_bytes(results['unique_bytes'])} unique)")
+    print(f"Batch requests: ~{results['batch_requests']} per transfer ({LFS_BATCH_SIZE} objects each)")
+    for stage in ("generate", "commit", "push", "pull"):
+        seconds = results["seconds"][stage]
+        rate = ""
+        if stage in ("push", "pull") and seconds > 0:
+            rate = (
+                f"  {results['unique_objects'] / seconds:8.1f} objects/s"
+                f"  {results['unique_bytes'] / seconds / 1024**2:8.1f} MB/s"
+            )
+        print(f"  {stage:<9} {seconds:8.2f}s{rate}")
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{BLUE}{'='*40}{RESET}")
+    print(f"{BLUE}Git LFS Push/Pull Benchmark{RESET}")
+    print(f"{BLUE}{'='*40}{RESET}\n")
+    print(f"LFS Server: {args.url}")
+    print(f"LFS Path:   {args.org}/{args.repo}")
+    print(f"Scenario:   {args.files} files, {args.duplicates:.0%} duplicates, depth {args.depth} x {args.fanout}\n")
+
+    check_prerequisites()
+
+    base_dir = tempfile.mkdtemp(prefix="gitlfs_bench_")
+    bare_dir = os.path.join(base_dir, "remote.git")
+    push_dir = os.path.join(base_dir, "push_repo")
+    clone_dir = os.path.join(base_dir, "clone_repo")
+    lfs_url = f"{args.url}/{args.org}/{args.repo}.git/info/lfs"
+
+    env = os.environ.copy()
+    env.pop("GIT_LFS_SKIP_SMUDGE", None)
+    clone_env = {**env, "GIT_LFS_SKIP_SMUDGE": "1"}
+    seconds = {}
+
+    try:
+        run(f"git init --bare {bare_dir}", capture=True)
+        run(f"git init {push_dir}", capture=True)
+        run("git config user.email 'test@example.com'", cwd=push_dir)
+        run("git config user.name 'Test User'", cwd=push_dir)
+        run("git config commit.gpgsign false", cwd=push_dir)
+        run(f"git remote add origin {bare_dir}", cwd=push_dir)
+        configure_lfs(push_dir, lfs_url, args.token)
+        if args.transfers:
+            run(f"git config lfs.concurrenttransfers {args.transfers}", cwd=push_dir)
+        run("git lfs track 'data/**/*.bin'", cwd=push_dir, capture=True)
+
+        info(f"Generating {args.files} files...")
+        start = time.perf_counter()
+        files = generate_files(push_dir, args, rng)
+        seconds["generate"] = time.perf_counter() - start
+        unique = dict(files.values())
+        success(f"{len(files)} files, {len(unique)} unique objects, {format_bytes(sum(unique.values()))}")
+
+        # git add runs the LFS clean filter, which hashes every file
+        seconds["commit"] = timed("git add + commit", "git add .gitattributes data && git commit -q -m 'Add files'",
+                                  cwd=push_dir)
+        branch = run("git branch --show-current", cwd=push_dir, capture=True).strip()
+        seconds["push"] = timed("git push (upload)", f"git push -q -u origin {branch}", cwd=push_dir, env=env)
+
+        run(f"git clone -q {bare_dir} {clone_dir}", env=clone_env, capture=True)
+        configure_lfs(clone_dir, lfs_url, args.token)
+        if args.transfers:
+            run(f"git config lfs.concurrenttransfers {args.transfers}", cwd=clone_dir)
+        seconds["pull"] = timed("git lfs pull (download)", "git lfs pull", cwd=clone_dir, env=env)
+
+        if args.no_verify:
+            print(f"{YELLOW}[-] Verification skipped{RESET}")
+        else:
+            info("Verifying pulled files...")
+            failure = verify_files(clone_dir, files)
+            if failure:
+                error(failure)
+                sys.exit(1)
+            success("All files match")
+
+        report(
+            {
+                "files": len(files),
+                "unique_objects": len(unique),
+                "total_bytes": sum(size for _, size in files.values()),
+                "unique_bytes": sum(unique.values()),
+                "batch_requests": math.ceil(len(unique) / LFS_BATCH_SIZE),
+                "seconds": {stage: round(value, 3) for stage, value in seconds.items()},
+            },
+            args.json,
+        )
+    except subprocess.CalledProcessError as e:
+        error(f"Command failed with exit code {e.returncode}")
+        sys.exit(1)
+    finally:
+        if args.keep:
+            print(f"\n{YELLOW}Temp directories kept at: {base_dir}{RESET}")
+        else:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Run the E2E scripts offline: starts the Worker under `wrangler dev` against local stand-ins for
+the GitHub API and R2, then runs test_endpoints.py and test_git_lfs.py against it.
+
+No GitHub token, Cloudflare account or network access is needed. The GitHub stand-in answers
+GET /repos/{org}/{repo} from permission fixtures, and the R2 stand-in is a minimal S3 store that
+checks the pre-signed URLs the Worker hands out and keeps objects in memory.
+
+Usage:
+    # Run both scripts against the local Worker
+    python local_harness.py
+
+    # Run one script with extra arguments, e.g. a load test with a slow GitHub
+    python local_harness.py --github-latency 80 -- test_endpoints.py --load --duration 30 --mix download=3,upload=1
+
+    # Keep everything running and point other clients at it
+    python local_harness.py --serve
+
+Permission fixtures map tokens to "org/repo" (or "*") and a permission level:
+    {"ghp_localadmin": {"*": "admin"}, "ghp_localreader": {"local-org/local-repo": "read"}}
+
+Requirements:
+    - pnpm install (for wrangler)
+    - git and git-lfs for test_git_lfs.py
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Colors
+RED, GREEN, YELLOW, BLUE, RESET = "\033[31m", "\033[32m", "\033[33m", "\033[34m", "\033[0m"
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPTS_DIR))
+
+LOCAL_ORG = "local-org"
+LOCAL_REPO = "local-repo"
+LOCAL_TOKEN = "ghp_localharness"
+DEFAULT_FIXTURES = {LOCAL_TOKEN: {"*": "admin"}, "ghp_localreader": {"*": "read"}}
+PERMISSIONS = {
+    "admin": {"admin": True, "push": True, "pull": True},
+    "write": {"admin": False, "push": True, "pull": True},
+    "read": {"admin": False, "push": False, "pull": True},
+}
+
+R2_BUCKET = "lfs-objects-local"
+R2_ACCESS_KEY_ID = "local-access-key"
+R2_SECRET_ACCESS_KEY = "local-secret-key"
+RATE_LIMIT = 5000
+STARTUP_TIMEOUT = 60
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the E2E scripts against a local Worker with fake GitHub and R2",
+        epilog="Arguments after -- name the script to run and its extra arguments; --url, --token, --org "
+        "and --repo are filled in for the local Worker.",
+    )
+    parser.add_argument("--permissions", help="JSON file of permission fixtures (default: admin and read tokens)")
+    parser.add_argument("--github-latency", type=float, default=0, help="Latency of GitHub API responses in ms")
+    parser.add_argument("--github-error-rate", type=float, default=0, help="Fraction of GitHub requests answered 502")
+    parser.add_argument("--s3-latency", type=float, default=0, help="Latency of object store responses in ms")
+    parser.add_argument("--port", type=int, default=0, help="Worker port (default: any free port)")
+    parser.add_argument("--serve", action="store_true", help="Keep everything running until interrupted")
+    parser.add_argument("--verbose", action="store_true", help="Show the stand-ins' request logs")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.command and args.command[0] == "--":
+        args.command = args.command[1:]
+    if not 0 <= args.github_error_rate <= 1:
+        parser.error("--github-error-rate must be between 0 and 1")
+    if args.permissions:
+        with open(args.permissions) as f:
+            args.fixtures = json.load(f)
+    else:
+        args.fixtures = DEFAULT_FIXTURES
+    return args
+
+
+def info(msg):
+    print(f"{BLUE}[*] {msg}{RESET}")
+
+
+def success(msg):
+    print(f"{GREEN}[✓] {msg}{RESET}")
+
+
+def error(msg):
+    print(f"{RED}[✗] {msg}{RESET}")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency / 1000)
+
+    def respond(self, status, body=b"", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class GitHubHandler(StandInHandler):
+    """GET /repos/{org}/{repo} answered from permission fixtures, with ETags and a rate limit budget."""
+
+    fixtures = {}
+    error_rate = 0
+    budgets = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        self.delay()
+        if random.random() < self.error_rate:
+            return self.respond(502, {"message": "Server Error"})
+
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        grants = self.fixtures.get(token)
+        if grants is None:
+            return self.respond(401, {"message": "Bad credentials"})
+
+        with self.lock:
+            remaining = self.budgets[token] = max(self.budgets.get(token, RATE_LIMIT) - 1, 0)
+        rate_headers = {
+            "X-RateLimit-Limit": str(RATE_LIMIT),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time()) + 3600),
+        }
+
+        parts = urllib.parse.urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "repos":
+            return self.respond(404, {"message": "Not Found"}, rate_headers)
+        permission = grants.get(f"{parts[1]}/{parts[2]}", grants.get("*"))
+        if permission not in PERMISSIONS:
+            return self.respond(404, {"message": "Not Found"}, rate_headers)
+
+        body = json.dumps({"name": parts[2], "private": True, "permissions": PERMISSIONS[permission]}).encode()
+        etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.respond(304, b"", {**rate_headers, "ETag": etag})
+        self.respond(200, body, {**rate_headers, "ETag": etag, "Content-Type": "application/json"})
+
+
+def aws_quote(value):
+    return urllib.parse.quote(value, safe="-_.~")
+
+
+def presigned_url_error(method, path, query, host, now=None):
+    """Checks an S3 query-string signature the way R2 would; returns the reason it is invalid, if any."""
+    params = urllib.parse.parse_qs(query, keep_blank_values=True)
+    params = {name: values[0] for name, values in params.items()}
+    signature = params.pop("X-Amz-Signature", None)
+    if signature is None or params.get("X-Amz-Algorithm") != "AWS4-HMAC-SHA256":
+        return "missing signature"
+
+    amz_date = params.get("X-Amz-Date", "")
+    try:
+        signed_at = datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).timestamp()
+        expires = int(params.get("X-Amz-Expires", "0"))
+    except ValueError:
+        return "malformed date or expiry"
+    if (now or time.time()) > signed_at + expires:
+        return "request has expired"
+
+    credential = params.get("X-Amz-Credential", "").split("/")
+    if len(credential) != 5 or credential[0] != R2_ACCESS_KEY_ID:
+        return "unknown access key"
+    _, date_stamp, region, service, _ = credential
+
+    canonical_query = "&".join(f"{aws_quote(k)}={aws_quote(v)}" for k, v in sorted(params.items()))
+    canonical_request = f"{method}\n{path}\n{canonical_query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+    scope = f"{date_stamp}/{region}/{service}/aws4_request"
+    string_to_sign = f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+
+    key = f"AWS4{R2_SECRET_ACCESS_KEY}".encode()
+    for part in (date_stamp, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    expected = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return None if hmac.compare_digest(expected, signature) else "signature does not match"
+
+
+class ObjectStoreHandler(StandInHandler):
+    """Path-style S3 GET, HEAD and PUT on pre-signed URLs, backed by an in-memory dict."""
+
+    objects = {}
+    lock = threading.Lock()
+
+    def authorize(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        reason = presigned_url_error(method, url.path, url.query, self.headers.get("Host", ""))
+        if reason:
+            self.respond(403, f"<Error><Code>AccessDenied</Code><Message>{reason}</Message></Error>".encode())
+            return None
+        return urllib.parse.unquote(url.path)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b"".join(chunks)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_PUT(self):
+        body = self.read_body()
+        self.delay()
+        key = self.authorize("PUT")
+        if key is not None:
+            with self.lock:
+                self.objects[key] = body
+            self.respond(200, b"", {"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_GET(self):
+        self.delay()
+        # Like S3, a URL signed for GET is also good for HEAD
+        key = self.authorize("GET")
+        if key is None:
+            return
+        with self.lock:
+            body = self.objects.get(key)
+        if body is None:
+            return self.respond(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        self.respond(200, body, {"Content-Type": "application/octet-stream"})
+
+    do_HEAD = do_GET
+
+
+def start_stand_in(handler, **attributes):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), type(handler.__name__, (handler,), attributes))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wrangler_command():
+    if shutil.which("pnpm"):
+        return ["pnpm", "exec", "wrangler"]
+    if shutil.which("npx"):
+        return ["npx", "--no-install", "wrangler"]
+    error("wrangler not found: run pnpm install first")
+    sys.exit(1)
+
+
+def start_worker(port, github_url, s3_url, state_dir, log_file):
+    overrides = {
+        "ALLOWED_ORGS": LOCAL_ORG,
+        "GITHUB_API_URL": github_url,
+        "R2_ENDPOINT": s3_url,
+        "R2_BUCKET_NAME": R2_BUCKET,
+        "R2_ACCESS_KEY_ID": R2_ACCESS_KEY_ID,
+        "R2_SECRET_ACCESS_KEY": R2_SECRET_ACCESS_KEY,
+        "CLOUDFLARE_ACCOUNT_ID": "local",
+    }
+    cmd = wrangler_command() + [
+        "dev", "--ip", "127.0.0.1", "--port", str(port), "--inspector-port", str(free_port()), "--persist-to", state_dir,
+    ]
+    for name, value in overrides.items():
+        cmd += ["--var", f"{name}:{value}"]
+    env = {**os.environ, "WRANGLER_SEND_METRICS": "false", "NO_UPDATE_NOTIFIER": "1"}
+    return subprocess.Popen(
+        cmd, cwd=REPO_ROOT, env=env, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+
+
+def wait_for_worker(url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop_worker(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def run_script(script, extra, url, token):
+    path = script if os.path.sep in script else os.path.join(SCRIPTS_DIR, script)
+    cmd = [sys.executable, path, "--url", url, "--token", token, "--org", LOCAL_ORG, "--repo", LOCAL_REPO, *extra]
+    print(f"\n{BLUE}$ {' '.join(cmd)}{RESET}")
+    return subprocess.run(cmd).returncode
+
+
+def main():
+    args = parse_args()
+    token = next(iter(args.fixtures), LOCAL_TOKEN)
+    StandInHandler.verbose = args.verbose
+
+    github, github_url = start_stand_in(
+        GitHubHandler, fixtures=args.fixtures, error_rate=args.github_error_rate, latency=args.github_latency
+    )
+    s3, s3_url = start_stand_in(ObjectStoreHandler, latency=args.s3_latency)
+    success(f"GitHub stand-in: {github_url} ({args.github_latency:g} ms, {args.github_error_rate:.0%} errors)")
+    success(f"R2 stand-in:     {s3_url} ({args.s3_latency:g} ms)")
+
+    work_dir = tempfile.mkdtemp(prefix="gitlfsflare_local_")
+    log_path = os.path.join(work_dir, "wrangler.log")
+    url = f"http://127.0.0.1:{args.port or free_port()}"
+    info(f"Starting the Worker with wrangler dev (log: {log_path})...")
+    with open(log_path, "w") as log_file:
+        worker = start_worker(urllib.parse.urlsplit(url).port, github_url, s3_url, work_dir, log_file)
+    try:
+        if not wait_for_worker(url, worker):
+            error(f"Worker did not become healthy within {STARTUP_TIMEOUT}s, see {log_path}")
+            return 1
+        success(f"Worker:          {url}")
+        print(f"Org/repo: {LOCAL_ORG}/{LOCAL_REPO}, token: {token}")
+
+        if args.serve:
+            info("Serving until interrupted (Ctrl+C)...")
+            try:
+                worker.wait()
+            except KeyboardInterrupt:
+                pass
+            return 0
+
+        scripts = [(args.command[0], args.command[1:])] if args.command else [
+            ("test_endpoints.py", []),
+            ("test_git_lfs.py", []),
+        ]
+        failed = [script for script, extra in scripts if run_script(script, extra, url, token) != 0]
+        print()
+        if failed:
+            error(f"Failed: {', '.join(failed)} (Worker log: {log_path})")
+            return 1
+        success("All scripts passed against the local Worker")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return 0
+    finally:
+        stop_worker(worker)
+        github.shutdown()
+        s3.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,19 +7,31 @@ Usage:
 
     # With authentication for full test coverage
     python test_endpoints.py --url "..." --token "ghp_xxx" --org "your-org" --repo "your-repo"
+
+    # Load test: 50 concurrent clients at up to 200 req/s for 60s, 3 downloads per upload
+    python test_endpoints.py --url "..." --token "ghp_xxx" --org "your-org" --repo "your-repo" \
+        --load --concurrency 50 --rate 200 --duration 60 --mix download=3,upload=1 --objects exp:10
 """
 
 import argparse
+import asyncio
+import http.client
 import json
+import math
 import os
+import random
+import socket
 import sys
-import urllib.request
-import urllib.error
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 # Colors
 RED, GREEN, YELLOW, BLUE, RESET = "\033[31m", "\033[32m", "\033[33m", "\033[34m", "\033[0m"
 
 VALID_OID = "a" * 64
+MAX_BATCH_OBJECTS = 100
 results = {"passed": 0, "failed": 0, "skipped": 0}
 
 
@@ -29,23 +41,115 @@ def parse_args():
     parser.add_argument("--token", default=os.environ.get("GITHUB_TOKEN"), help="GitHub PAT")
     parser.add_argument("--org", default=os.environ.get("TEST_ORG", "test-org"), help="Test org")
     parser.add_argument("--repo", default=os.environ.get("TEST_REPO", "test-repo"), help="Test repo")
+    parser.add_argument(
+        "--max-objects", type=int, default=MAX_BATCH_OBJECTS, help="Server batch limit (MAX_BATCH_OBJECTS)"
+    )
+    load = parser.add_argument_group("load test")
+    load.add_argument("--load", action="store_true", help="Run a load test against the batch endpoint instead")
+    load.add_argument("--concurrency", type=int, default=10, help="Maximum requests in flight")
+    load.add_argument("--rate", type=float, default=0, help="Requests per second (0: as fast as concurrency allows)")
+    load.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    load.add_argument("--mix", default="download=1", help="Operation weights, e.g. download=3,upload=1")
+    load.add_argument("--objects", default="1", help='Objects per batch: "N", "MIN-MAX" (uniform) or "exp:MEAN"')
+    load.add_argument("--no-reuse", action="store_true", help="Open a new connection for every request")
     args = parser.parse_args()
     if not args.url:
         parser.error("--url or LFS_SERVER_URL is required")
+    if args.max_objects < 1:
+        parser.error("--max-objects must be at least 1")
+    if args.load:
+        if not args.token:
+            parser.error("--load requires --token or GITHUB_TOKEN")
+        try:
+            args.mix = parse_mix(args.mix)
+            args.objects = parse_distribution(args.objects, args.max_objects)
+        except ValueError as e:
+            parser.error(str(e))
     return args
 
 
-def lfs_batch(base_url, org, repo, request_body, token=None):
+def parse_mix(spec):
+    """Parse "download=3,upload=1" into ([operations], [weights])."""
+    operations, weights = [], []
+    for part in spec.split(","):
+        operation, _, weight = part.partition("=")
+        if operation not in ("download", "upload"):
+            raise ValueError(f"invalid operation in --mix: {operation!r}")
+        operations.append(operation)
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+def parse_distribution(spec, max_objects=MAX_BATCH_OBJECTS):
+    """Parse an object-count distribution into a sampler returning 1..max_objects."""
+    def clamp(n):
+        return max(1, min(max_objects, n))
+
+    try:
+        if spec.startswith("exp:"):
+            mean = float(spec[4:])
+            return lambda: clamp(math.ceil(random.expovariate(1 / mean)))
+        if "-" in spec:
+            low, high = (int(n) for n in spec.split("-", 1))
+            return lambda: clamp(random.randint(low, high))
+        count = int(spec)
+        return lambda: clamp(count)
+    except ValueError:
+        raise ValueError(f"invalid --objects distribution: {spec!r}") from None
+
+
+# Persistent connections per (scheme, host), one set per thread since http.client connections are not thread-safe
+_connections = threading.local()
+
+
+def http_request(method, url, body=None, headers=None, reuse=True):
+    """Send a request and return (status, body bytes).
+
+    With reuse, the connection is kept open for the next request to the same host, so only the first
+    request pays for the TCP and TLS handshakes. A kept connection the server has closed in the meantime
+    is replaced once.
+    """
+    parts = urllib.parse.urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    pool = _connections.__dict__.setdefault("pool", {})
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+    conn = pool.pop(key, None) if reuse else None
+    for attempt in range(2):
+        pooled = conn is not None
+        if conn is None:
+            connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            conn = connection_class(parts.netloc, timeout=30)
+            conn.connect()
+            # http.client writes headers and body separately; without this, Nagle's algorithm and delayed ACKs
+            # add tens of milliseconds to every request on a kept-alive connection
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            conn.request(method, path, body, headers or {})
+            resp = conn.getresponse()
+            data = resp.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            conn = None
+            if pooled and attempt == 0:
+                continue
+            raise
+        if reuse and not resp.will_close:
+            pool[key] = conn
+        else:
+            conn.close()
+        return resp.status, data
+
+
+def lfs_batch(base_url, org, repo, request_body, token=None, reuse=True):
     url = f"{base_url}/{org}/{repo}.git/info/lfs/objects/batch"
     headers = {"Content-Type": "application/vnd.git-lfs+json", "Accept": "application/vnd.git-lfs+json"}
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    req = urllib.request.Request(url, json.dumps(request_body).encode(), headers, method="POST")
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return resp.status, json.loads(resp.read())
-    except urllib.error.HTTPError as e:
-        return e.code, e.read().decode()
+    status, data = http_request("POST", url, json.dumps(request_body).encode(), headers, reuse)
+    if status >= 400:
+        return status, data.decode()
+    return status, json.loads(data)
 
 
 def test_pass(msg):
@@ -71,9 +175,8 @@ def section(title):
 
 def test_health(base_url):
     section("Health Endpoint")
-    req = urllib.request.Request(f"{base_url}/health")
-    with urllib.request.urlopen(req) as resp:
-        status, body = resp.status, resp.read().decode()
+    status, body = http_request("GET", f"{base_url}/health")
+    body = body.decode()
     test_pass("GET /health returns 200") if status == 200 else test_fail("GET /health returns 200", "200", status)
     test_pass('Response contains status:"ok"') if '"status":"ok"' in body else test_fail('Response contains status:"ok"', '{"status":"ok"}', body)
 
@@ -139,17 +242,140 @@ def test_invalid_repo_name(base_url, org, token):
     test_pass("Invalid repo name returns 400") if status == 400 else test_fail("Invalid repo name returns 400", "400", status)
 
 
-def test_batch_size_limit(base_url, org, repo, token):
+def test_batch_size_limit(base_url, org, repo, token, max_objects=MAX_BATCH_OBJECTS):
     section("Batch Size Limit")
     if not token:
         return skip("Batch size limit test", "token not set")
-    objects = [{"oid": f"{i:04x}".ljust(64, "a"), "size": 100} for i in range(101)]
+    objects = [{"oid": f"{i:06x}".ljust(64, "a"), "size": 100} for i in range(max_objects + 1)]
     status, _ = lfs_batch(base_url, org, repo, {"operation": "download", "objects": objects}, token)
-    test_pass("101 objects returns 413") if status == 413 else test_fail("101 objects returns 413", "413", status)
+    label = f"{max_objects + 1} objects returns 413"
+    test_pass(label) if status == 413 else test_fail(label, "413", status)
+
+
+def random_batch(operation, count):
+    objects = [{"oid": os.urandom(32).hex(), "size": random.randint(1, 10 * 1024 * 1024)} for _ in range(count)]
+    return {"operation": operation, "objects": objects}
+
+
+def timed_batch(base_url, org, repo, request_body, token, reuse=True, scheduled=None):
+    """Send one batch request; returns (status, seconds).
+
+    Network errors are reported as status "error" and response bodies that are not JSON as "invalid-json".
+    With a scheduled start (perf_counter time), latency includes the time the request waited to be sent.
+    """
+    started = time.perf_counter() if scheduled is None else scheduled
+    try:
+        status, _ = lfs_batch(base_url, org, repo, request_body, token, reuse)
+    except (http.client.HTTPException, OSError):
+        status = "error"
+    except ValueError:
+        status = "invalid-json"
+    return status, time.perf_counter() - started
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+async def run_load(args):
+    """Send batch requests until the duration has passed and return [(operation, status, seconds)].
+
+    Each request runs lfs_batch in a worker thread. With --rate, requests start on a fixed schedule
+    (open loop) as long as fewer than --concurrency are in flight; without it, a new request starts as
+    soon as one finishes. Scheduled requests are timed from their slot in the schedule, so waiting for a
+    free slot under saturation shows up in the latencies instead of being hidden.
+    """
+    operations, weights = args.mix
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    slots = asyncio.Semaphore(args.concurrency)
+    samples, tasks = [], set()
+
+    async def send(operation, scheduled):
+        body = random_batch(operation, args.objects())
+        status, seconds = await asyncio.to_thread(
+            timed_batch, args.url, args.org, args.repo, body, args.token, not args.no_reuse, scheduled
+        )
+        samples.append((operation, status, seconds))
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    sent = 0
+    while True:
+        scheduled = start + sent / args.rate if args.rate else None
+        if scheduled is not None:
+            await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        await slots.acquire()
+        if time.perf_counter() >= deadline:
+            slots.release()
+            break
+        task = asyncio.create_task(send(random.choices(operations, weights)[0], scheduled))
+        tasks.add(task)
+        task.add_done_callback(lambda t: (tasks.discard(t), slots.release()))
+        sent += 1
+
+    await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - start
+
+
+def report_load(samples, elapsed):
+    section("Load Test Results")
+    if not samples:
+        print("  No requests completed")
+        return
+    print(f"  Requests:   {len(samples)} in {elapsed:.1f}s ({len(samples) / elapsed:.1f} req/s)")
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    print("  Statuses:   " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+
+    print(f"\n  {'operation':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    for name, group in groups.items():
+        latencies = sorted(seconds * 1000 for _, _, seconds in group)
+        columns = " ".join(f"{percentile(latencies, p):>9.1f}" for p in (50, 95, 99, 100))
+        print(f"  {name:<10} {len(group):>7} {columns}")
+
+
+def load_main(args):
+    print(f"{BLUE}{'='*32}{RESET}")
+    print(f"{BLUE}Git LFS Batch Load Test{RESET}")
+    print(f"{BLUE}{'='*32}{RESET}\n")
+    print(f"Server URL:  {args.url}")
+    print(f"Target:      {args.org}/{args.repo}")
+    rate = f"{args.rate:g} req/s" if args.rate else "unlimited"
+    print(f"Concurrency: {args.concurrency}, rate: {rate}, duration: {args.duration:g}s")
+    print(f"Connections: {'new per request' if args.no_reuse else 'kept alive'}")
+
+    samples, elapsed = asyncio.run(run_load(args))
+    report_load(samples, elapsed)
+    errors = sum(1 for _, status, _ in samples if status != 200)
+    sys.exit(1 if errors else 0)
+
+
+def test_connection_reuse(base_url, org, repo, token, count=10):
+    """Compare request latency over new connections with latency over one kept-alive connection."""
+    section("Connection Reuse")
+    # Without a token the batch endpoint answers 401 before calling GitHub, so the comparison stays cheap
+    body = {"operation": "download", "objects": [{"oid": VALID_OID, "size": 100}]}
+    latencies = {}
+    for reuse in (False, True):
+        http_request("GET", f"{base_url}/health", reuse=reuse)  # warm up DNS and, with reuse, the connection
+        samples = sorted(timed_batch(base_url, org, repo, body, None, reuse)[1] * 1000 for _ in range(count))
+        latencies[reuse] = samples
+        label = "kept alive" if reuse else "new connection"
+        print(f"  {label:<15} p50 {percentile(samples, 50):7.1f} ms   p95 {percentile(samples, 95):7.1f} ms")
+    saved = percentile(latencies[False], 50) - percentile(latencies[True], 50)
+    print(f"  Connection reuse saves {saved:.1f} ms per request (p50)")
 
 
 def main():
     args = parse_args()
+    if args.load:
+        return load_main(args)
     print(f"{BLUE}{'='*32}{RESET}")
     print(f"{BLUE}Git LFS Server Endpoint Tests{RESET}")
     print(f"{BLUE}{'='*32}{RESET}\n")
@@ -164,7 +390,8 @@ def main():
     test_invalid_batch(args.url, args.org, args.repo, args.token)
     test_download_success(args.url, args.org, args.repo, args.token)
     test_invalid_repo_name(args.url, args.org, args.token)
-    test_batch_size_limit(args.url, args.org, args.repo, args.token)
+    test_batch_size_limit(args.url, args.org, args.repo, args.token, args.max_objects)
+    test_connection_reuse(args.url, args.org, args.repo, args.token)
 
     print(f"\n{BLUE}{'='*32}{RESET}")
     print(f"{BLUE}Summary{RESET}")
@@ -8,6 +8,9 @@ pushes a large file, then clones locally to verify download works.
 Usage:
     python test_git_lfs.py --url "https://your-worker.workers.dev" --token "ghp_xxx" --org "your-org" --repo "your-repo"
 
+    # Also push and pull a 4GB object; files are generated and hashed in chunks
+    python test_git_lfs.py --url "..." --token "ghp_xxx" --org "your-org" --repo "your-repo" --large-mb 4096
+
 Requirements:
     - git and git-lfs installed
     - GitHub token with repo access (for LFS authentication)
@@ -24,6 +27,9 @@ import tempfile
 # Colors
 RED, GREEN, YELLOW, BLUE, RESET = "\033[31m", "\033[32m", "\033[33m", "\033[34m", "\033[0m"
 
+# Files are generated and hashed in chunks so memory use does not grow with their size
+CHUNK_SIZE = 1024 * 1024
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="E2E Git LFS test using git client")
@@ -32,6 +38,7 @@ def parse_args():
     parser.add_argument("--org", required=True, help="GitHub org/user (for LFS path)")
     parser.add_argument("--repo", required=True, help="Repo name (for LFS path)")
     parser.add_argument("--keep", action="store_true", help="Keep temp directories after test")
+    parser.add_argument("--large-mb", type=int, default=0, help="Also push and pull a file of this many MB")
     return parser.parse_args()
 
 
@@ -62,6 +69,41 @@ def error(msg):
     print(f"{RED}[✗] {msg}{RESET}")
 
 
+def write_random_file(path, size):
+    """Write size random bytes to path and return their SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = os.urandom(min(CHUNK_SIZE, remaining))
+            digest.update(chunk)
+            f.write(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def configure_lfs(repo_dir, lfs_url, token):
+    """Point the repository's git-lfs at the server, with the token stored for the full LFS path."""
+    run("git lfs install --local", cwd=repo_dir, capture=True)
+    run(f"git config lfs.url {lfs_url}", cwd=repo_dir)
+    run(f"git config lfs.{lfs_url}.access basic", cwd=repo_dir)
+    run("git config credential.useHttpPath true", cwd=repo_dir)
+    cred_file = os.path.join(repo_dir, ".git-credentials")
+    with open(cred_file, "w") as f:
+        f.write(lfs_url.replace("://", f"://user:{token}@", 1) + "\n")
+    run(f"git config credential.helper 'store --file={cred_file}'", cwd=repo_dir)
+
+
 def check_prerequisites():
     """Verify git and git-lfs are installed."""
     try:
@@ -96,7 +138,6 @@ def main():
 
     # Build LFS URL
     lfs_url = f"{args.url}/{args.org}/{args.repo}.git/info/lfs"
-    lfs_host = args.url.replace("https://", "").replace("http://", "")
 
     # Environment
     env = os.environ.copy()
@@ -119,19 +160,7 @@ def main():
 
         # Step 3: Configure git-lfs
         info("Configuring git-lfs...")
-        run("git lfs install --local", cwd=push_dir, capture=True)
-        run(f"git config lfs.url {lfs_url}", cwd=push_dir)
-        run(f"git config lfs.{lfs_url}.access basic", cwd=push_dir)
-
-        # Store credentials for LFS (full path for useHttpPath)
-        run("git config credential.useHttpPath true", cwd=push_dir)
-        cred_file = os.path.join(push_dir, ".git-credentials")
-        # Store credential with full LFS path
-        lfs_cred_url = f"https://user:{args.token}@{lfs_host}/{args.org}/{args.repo}.git/info/lfs"
-        with open(cred_file, "w") as f:
-            f.write(f"{lfs_cred_url}\n")
-        run(f"git config credential.helper 'store --file={cred_file}'", cwd=push_dir)
-
+        configure_lfs(push_dir, lfs_url, args.token)
         success(f"git-lfs configured with URL: {lfs_url}")
 
         # Step 4: Create test files (various sizes)
@@ -146,13 +175,12 @@ def main():
             ("file_2mb.bin", 2 * 1024 * 1024),
             ("file_small.bin", 64 * 1024),  # 64KB
         ]
+        if args.large_mb > 0:
+            unique_files.append(("file_large.bin", args.large_mb * 1024 * 1024))
 
         for filename, size in unique_files:
             filepath = os.path.join(push_dir, filename)
-            data = os.urandom(size)
-            original_hashes[filename] = hashlib.sha256(data).hexdigest()
-            with open(filepath, "wb") as f:
-                f.write(data)
+            original_hashes[filename] = write_random_file(filepath, size)
             success(f"  {filename}: {size // 1024}KB, hash: {original_hashes[filename][:12]}...")
 
         # Create duplicate content file (same content as file_small.bin -> same OID)
@@ -193,14 +221,7 @@ def main():
         run(f"git clone {bare_dir} {clone_dir}", env=clone_env, capture=True)
 
         # Configure LFS for clone
-        run("git lfs install --local", cwd=clone_dir, capture=True)
-        run(f"git config lfs.url {lfs_url}", cwd=clone_dir)
-        run(f"git config lfs.{lfs_url}.access basic", cwd=clone_dir)
-        run("git config credential.useHttpPath true", cwd=clone_dir)
-        clone_cred_file = os.path.join(clone_dir, ".git-credentials")
-        with open(clone_cred_file, "w") as f:
-            f.write(f"{lfs_cred_url}\n")
-        run(f"git config credential.helper 'store --file={clone_cred_file}'", cwd=clone_dir)
+        configure_lfs(clone_dir, lfs_url, args.token)
         success("Clone ready")
 
         # Step 9: Pull LFS files
@@ -219,10 +240,8 @@ def main():
                 error(f"  {filename}: NOT FOUND")
                 sys.exit(1)
 
-            with open(downloaded_file, "rb") as f:
-                downloaded_data = f.read()
-
-            downloaded_hash = hashlib.sha256(downloaded_data).hexdigest()
+            downloaded_size = os.path.getsize(downloaded_file)
+            downloaded_hash = file_sha256(downloaded_file)
             expected_hash = original_hashes[filename]
 
             if expected_hash != downloaded_hash:
@@ -231,13 +250,13 @@ def main():
                 error(f"    Got:      {downloaded_hash}")
                 sys.exit(1)
 
-            if len(downloaded_data) != expected_size:
+            if downloaded_size != expected_size:
                 error(f"  {filename}: SIZE MISMATCH")
                 error(f"    Expected: {expected_size}")
-                error(f"    Got:      {len(downloaded_data)}")
+                error(f"    Got:      {downloaded_size}")
                 sys.exit(1)
 
-            success(f"  {filename}: OK ({len(downloaded_data) // 1024}KB)")
+            success(f"  {filename}: OK ({downloaded_size // 1024}KB)")
 
         total_size = sum(size for _, size in test_files)
         print(f"\n{BLUE}{'='*40}{RESET}")
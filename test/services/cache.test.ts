@@ -1,5 +1,8 @@
 import { beforeEach, describe, expect, it, vi } from "vitest";
+import { RequestTimer } from "../../src/lib/timing.js";
 import * as cache from "../../src/services/cache.js";
+import { GitHubRateLimitError } from "../../src/services/github.js";
+import { clearRateLimits, getRateLimit, recordRateLimit } from "../../src/services/rate-limit.js";
 
 // Test constants - use non-default TTL to verify config is read
 const TEST_TOKEN = "ghp_testtoken123456789";
@@ -7,16 +10,36 @@ const TEST_ORG = "test-org";
 const TEST_REPO = "test-repo";
 const TEST_TTL = 600;
 
-// Mock KV namespace - only mock get/put which are used by cache service
-function createMockKV(store: Map<string, string> = new Map()): KVNamespace {
+// Mock KV namespace - only mock get/getWithMetadata/put which are used by cache service
+function createMockKV(
+  store: Map<string, string> = new Map(),
+  metadataStore: Map<string, unknown> = new Map()
+): KVNamespace {
   return {
     get: vi.fn(async (key: string) => store.get(key) ?? null),
-    put: vi.fn(async (key: string, value: string) => {
+    getWithMetadata: vi.fn(async (key: string) => ({
+      value: store.get(key) ?? null,
+      metadata: metadataStore.get(key) ?? null,
+    })),
+    put: vi.fn(async (key: string, value: string, options?: { metadata?: unknown }) => {
       store.set(key, value);
+      if (options?.metadata !== undefined) {
+        metadataStore.set(key, options.metadata);
+      }
     }),
   } as unknown as KVNamespace;
 }
 
+// Mock ExecutionContext - only waitUntil is used by cache service
+function createMockCtx(): ExecutionContext & { waitUntil: ReturnType<typeof vi.fn> } {
+  return { waitUntil: vi.fn() } as unknown as ExecutionContext & { waitUntil: ReturnType<typeof vi.fn> };
+}
+
+// Waits for everything handed to waitUntil: the shared lookup and any background refresh
+function settleWaitUntil(ctx: ReturnType<typeof createMockCtx>) {
+  return Promise.all(ctx.waitUntil.mock.calls.map(([promise]) => promise));
+}
+
 // Mock Env - only include properties used by cache service
 function createMockEnv(overrides: Record<string, unknown> = {}): Env {
   return {
@@ -27,6 +50,11 @@ function createMockEnv(overrides: Record<string, unknown> = {}): Env {
 }
 
 describe("cache service", () => {
+  beforeEach(() => {
+    cache.clearMemoryCache();
+    clearRateLimits();
+  });
+
   describe("isValidPermission", () => {
     it.each([
       ["admin", true],
@@ -191,6 +219,22 @@ describe("cache service", () => {
       expect(mockGetPermission).not.toHaveBeenCalled();
     });
 
+    it("counts memory and KV hits and times the GitHub call", async () => {
+      const env = createMockEnv();
+      mockGetPermission.mockResolvedValue("read");
+      const [miss, memory, kvHit] = [new RequestTimer(), new RequestTimer(), new RequestTimer()];
+
+      await cache.withCache(env, mockGetPermission, undefined, miss)(TEST_TOKEN, TEST_ORG, TEST_REPO);
+      await cache.withCache(env, mockGetPermission, undefined, memory)(TEST_TOKEN, TEST_ORG, TEST_REPO);
+      cache.clearMemoryCache();
+      await cache.withCache(env, mockGetPermission, undefined, kvHit)(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+      expect(miss.getDuration("github")).toBeDefined();
+      expect(memory.getCount("cache.memory")).toBe(1);
+      expect(kvHit.getCount("cache.kv")).toBe(1);
+      expect(kvHit.getDuration("github")).toBeUndefined();
+    });
+
     it("calls wrapped function on cache miss", async () => {
       const env = createMockEnv();
       mockGetPermission.mockResolvedValue("write");
@@ -199,7 +243,7 @@ describe("cache service", () => {
       const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
 
       expect(result).toBe("write");
-      expect(mockGetPermission).toHaveBeenCalledWith(TEST_TOKEN, TEST_ORG, TEST_REPO);
+      expect(mockGetPermission).toHaveBeenCalledWith(TEST_TOKEN, TEST_ORG, TEST_REPO, {});
     });
 
     it("stores result in cache after calling wrapped function", async () => {
@@ -279,5 +323,350 @@ describe("cache service", () => {
 
       expect(mockGetPermission).toHaveBeenCalledTimes(2);
     });
+
+    describe("in-memory tier", () => {
+      it("serves repeated lookups without reading KV again", async () => {
+        const kv = createMockKV();
+        const env = createMockEnv({ AUTH_CACHE: kv });
+        mockGetPermission.mockResolvedValue("write");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("write");
+        expect(kv.get).toHaveBeenCalledTimes(1);
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+      });
+
+      it("remembers permissions read from KV", async () => {
+        const store = new Map<string, string>();
+        const kv = createMockKV(store);
+        const env = createMockEnv({ AUTH_CACHE: kv });
+        store.set(await cache.generateCacheKey(TEST_TOKEN, TEST_ORG, TEST_REPO), "read");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(kv.get).toHaveBeenCalledTimes(1);
+        expect(mockGetPermission).not.toHaveBeenCalled();
+      });
+
+      it.each([
+        ["AUTH_CACHE_TTL", 10, 10_000],
+        ["the in-memory TTL cap", 600, 60_000],
+      ])("expires entries after %s", async (_, authCacheTtl, expiryMs) => {
+        vi.useFakeTimers();
+        const kv = createMockKV();
+        const env = createMockEnv({ AUTH_CACHE: kv, AUTH_CACHE_TTL: authCacheTtl });
+        mockGetPermission.mockResolvedValue("admin");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        vi.advanceTimersByTime(expiryMs - 1);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        expect(kv.get).toHaveBeenCalledTimes(1);
+
+        vi.advanceTimersByTime(1);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        vi.useRealTimers();
+
+        expect(kv.get).toHaveBeenCalledTimes(2);
+      });
+
+      it("keeps a KV entry in memory no longer than its remaining freshness", async () => {
+        vi.useFakeTimers();
+        const store = new Map<string, string>();
+        const metadataStore = new Map<string, unknown>();
+        const kv = createMockKV(store, metadataStore);
+        const env = createMockEnv({ AUTH_CACHE: kv, AUTH_CACHE_STALE_TTL: 3600 });
+        const key = await cache.generateCacheKey(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        store.set(key, "read");
+        metadataStore.set(key, { staleAt: Date.now() + 1000 });
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        vi.advanceTimersByTime(999);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        expect(kv.getWithMetadata).toHaveBeenCalledTimes(1);
+
+        vi.advanceTimersByTime(1);
+        mockGetPermission.mockResolvedValue("read");
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        vi.useRealTimers();
+
+        expect(kv.getWithMetadata).toHaveBeenCalledTimes(2);
+      });
+
+      it("does not remember failed lookups", async () => {
+        const kv = createMockKV();
+        const env = createMockEnv({ AUTH_CACHE: kv });
+        mockGetPermission.mockRejectedValueOnce(new Error("GitHub API error: 503")).mockResolvedValueOnce("read");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await expect(wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO)).rejects.toThrow();
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("read");
+        expect(mockGetPermission).toHaveBeenCalledTimes(2);
+      });
+    });
+
+    describe("request coalescing", () => {
+      it("shares a single lookup between concurrent misses for the same key", async () => {
+        const kv = createMockKV();
+        const env = createMockEnv({ AUTH_CACHE: kv });
+        mockGetPermission.mockResolvedValue("write");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        const results = await Promise.all([
+          wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO),
+          wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO),
+          wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO),
+        ]);
+
+        expect(results).toEqual(["write", "write", "write"]);
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+        expect(kv.get).toHaveBeenCalledTimes(1);
+        expect(kv.put).toHaveBeenCalledTimes(1);
+      });
+
+      it("does not coalesce lookups for different keys", async () => {
+        const env = createMockEnv();
+        mockGetPermission.mockResolvedValue("read");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await Promise.all([wrapped(TEST_TOKEN, TEST_ORG, "repo1"), wrapped(TEST_TOKEN, TEST_ORG, "repo2")]);
+
+        expect(mockGetPermission).toHaveBeenCalledTimes(2);
+      });
+
+      it("propagates errors to every waiting caller", async () => {
+        const env = createMockEnv();
+        mockGetPermission.mockRejectedValue(new Error("GitHub API error: 503"));
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        const results = await Promise.allSettled([
+          wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO),
+          wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO),
+        ]);
+
+        expect(results.map((result) => result.status)).toEqual(["rejected", "rejected"]);
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+      });
+
+      it("keeps the shared lookup alive with the execution context of the request that started it", async () => {
+        const env = createMockEnv();
+        mockGetPermission.mockRejectedValue(new Error("GitHub API error: 503"));
+        const owner = createMockCtx();
+        const joiner = createMockCtx();
+
+        const first = cache.withCache(env, mockGetPermission, owner)(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        const second = cache.withCache(env, mockGetPermission, joiner)(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        await Promise.allSettled([first, second]);
+
+        expect(owner.waitUntil).toHaveBeenCalledTimes(1);
+        expect(joiner.waitUntil).not.toHaveBeenCalled();
+        await expect(owner.waitUntil.mock.calls[0]?.[0]).resolves.toBeUndefined();
+      });
+    });
+
+    describe("stale-while-revalidate", () => {
+      const TEST_STALE_TTL = 3600;
+
+      async function seedEntry(permission: string, staleAt: number, etag?: string) {
+        const store = new Map<string, string>();
+        const metadataStore = new Map<string, unknown>();
+        const env = createMockEnv({
+          AUTH_CACHE: createMockKV(store, metadataStore),
+          AUTH_CACHE_STALE_TTL: TEST_STALE_TTL,
+        });
+        const key = await cache.generateCacheKey(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        store.set(key, permission);
+        metadataStore.set(key, etag ? { staleAt, etag } : { staleAt });
+        return { env, store, metadataStore, key };
+      }
+
+      it("stores entries for the soft plus hard TTL with the stale time as metadata", async () => {
+        const kv = createMockKV();
+        const env = createMockEnv({ AUTH_CACHE: kv, AUTH_CACHE_STALE_TTL: TEST_STALE_TTL });
+        mockGetPermission.mockResolvedValue("write");
+        const before = Date.now();
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        const expectedKey = await cache.generateCacheKey(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        expect(kv.put).toHaveBeenCalledWith(expectedKey, "write", {
+          expirationTtl: TEST_TTL + TEST_STALE_TTL,
+          metadata: { staleAt: expect.any(Number) },
+        });
+        const [, , options] = vi.mocked(kv.put).mock.calls[0] as [string, string, { metadata: { staleAt: number } }];
+        expect(options.metadata.staleAt).toBeGreaterThanOrEqual(before + TEST_TTL * 1000);
+      });
+
+      it("returns fresh entries without refreshing", async () => {
+        const { env } = await seedEntry("read", Date.now() + 60_000);
+        const ctx = createMockCtx();
+
+        const wrapped = cache.withCache(env, mockGetPermission, ctx);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("read");
+        expect(ctx.waitUntil).toHaveBeenCalledTimes(1);
+        expect(mockGetPermission).not.toHaveBeenCalled();
+      });
+
+      it("serves stale entries immediately and refreshes them in the background", async () => {
+        const { env, store, key } = await seedEntry("read", Date.now() - 1);
+        mockGetPermission.mockResolvedValue("admin");
+        const ctx = createMockCtx();
+
+        const wrapped = cache.withCache(env, mockGetPermission, ctx);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("read");
+        expect(ctx.waitUntil).toHaveBeenCalledTimes(2);
+
+        await settleWaitUntil(ctx);
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+        expect(store.get(key)).toBe("admin");
+        expect(await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO)).toBe("admin");
+      });
+
+      it("keeps serving the stale entry when the background refresh fails", async () => {
+        const { env, store, key } = await seedEntry("write", Date.now() - 1);
+        mockGetPermission.mockRejectedValue(new Error("GitHub API error: 503"));
+        const ctx = createMockCtx();
+
+        const wrapped = cache.withCache(env, mockGetPermission, ctx);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+        await settleWaitUntil(ctx);
+
+        expect(result).toBe("write");
+        expect(store.get(key)).toBe("write");
+      });
+
+      it("falls back to the stale entry when the inline refresh fails", async () => {
+        const { env } = await seedEntry("write", Date.now() - 1);
+        mockGetPermission.mockRejectedValue(new Error("GitHub API error: 503"));
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("write");
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+      });
+
+      it("revalidates stale entries with their ETag and renews them", async () => {
+        const { env, metadataStore, key } = await seedEntry("write", Date.now() - 1, '"abc"');
+        mockGetPermission.mockImplementation(async (_token, _org, _repo, validator) => validator?.permission ?? "none");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("write");
+        expect(mockGetPermission).toHaveBeenCalledWith(TEST_TOKEN, TEST_ORG, TEST_REPO, {
+          permission: "write",
+          etag: '"abc"',
+        });
+        const metadata = metadataStore.get(key) as { staleAt: number; etag: string };
+        expect(metadata.etag).toBe('"abc"');
+        expect(metadata.staleAt).toBeGreaterThan(Date.now());
+      });
+
+      it("stores the ETag reported by the wrapped function", async () => {
+        const { env, metadataStore, key } = await seedEntry("read", Date.now() - 1, '"old"');
+        mockGetPermission.mockImplementation(async (_token, _org, _repo, validator) => {
+          if (validator) {
+            validator.etag = '"new"';
+          }
+          return "admin";
+        });
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(metadataStore.get(key)).toEqual({ staleAt: expect.any(Number), etag: '"new"' });
+      });
+
+      it("refreshes stale entries inline when no execution context is available", async () => {
+        const { env } = await seedEntry("read", Date.now() - 1);
+        mockGetPermission.mockResolvedValue("none");
+
+        const wrapped = cache.withCache(env, mockGetPermission);
+        const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+        expect(result).toBe("none");
+        expect(mockGetPermission).toHaveBeenCalledTimes(1);
+      });
+
+      describe("rate-limit budget", () => {
+        const resetAt = () => Math.floor(Date.now() / 1000) + 600;
+
+        it("records the budget reported by the wrapped function", async () => {
+          const env = createMockEnv();
+          mockGetPermission.mockImplementation(async (_token, _org, _repo, validator) => {
+            validator.rateLimit = { remaining: 42, resetAt: resetAt() };
+            return "read";
+          });
+
+          const wrapped = cache.withCache(env, mockGetPermission);
+          await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+          expect(getRateLimit(await cache.hashToken(TEST_TOKEN))?.remaining).toBe(42);
+        });
+
+        it("records the budget when the wrapped function fails", async () => {
+          const env = createMockEnv();
+          mockGetPermission.mockImplementation(async (_token, _org, _repo, validator) => {
+            validator.rateLimit = { remaining: 0, resetAt: resetAt() };
+            throw new GitHubRateLimitError("Rate limit exceeded");
+          });
+
+          const wrapped = cache.withCache(env, mockGetPermission);
+          await expect(wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO)).rejects.toThrow(GitHubRateLimitError);
+
+          expect(getRateLimit(await cache.hashToken(TEST_TOKEN))?.remaining).toBe(0);
+        });
+
+        it.each([0, 10])("serves stale entries without refreshing when %s calls remain", async (remaining) => {
+          const { env } = await seedEntry("write", Date.now() - 1);
+          recordRateLimit(await cache.hashToken(TEST_TOKEN), { remaining, resetAt: resetAt() });
+          const ctx = createMockCtx();
+
+          const wrapped = cache.withCache(env, mockGetPermission, ctx);
+          const result = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO);
+
+          expect(result).toBe("write");
+          expect(ctx.waitUntil).toHaveBeenCalledTimes(1);
+          expect(mockGetPermission).not.toHaveBeenCalled();
+        });
+
+        it("fails fast on a miss when the budget is exhausted", async () => {
+          const env = createMockEnv();
+          const reset = resetAt();
+          recordRateLimit(await cache.hashToken(TEST_TOKEN), { remaining: 0, resetAt: reset });
+
+          const wrapped = cache.withCache(env, mockGetPermission);
+          const error = await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO).catch((e: unknown) => e);
+
+          expect(error).toBeInstanceOf(GitHubRateLimitError);
+          expect((error as GitHubRateLimitError).resetAt).toBe(reset);
+          expect(mockGetPermission).not.toHaveBeenCalled();
+        });
+
+        it("still calls GitHub on a miss while some budget is left", async () => {
+          const env = createMockEnv();
+          recordRateLimit(await cache.hashToken(TEST_TOKEN), { remaining: 10, resetAt: resetAt() });
+          mockGetPermission.mockResolvedValue("read");
+
+          const wrapped = cache.withCache(env, mockGetPermission);
+
+          expect(await wrapped(TEST_TOKEN, TEST_ORG, TEST_REPO)).toBe("read");
+        });
+      });
+    });
   });
 });
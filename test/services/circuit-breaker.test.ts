@@ -0,0 +1,119 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest";
+import {
+  CircuitOpenError,
+  getCircuitState,
+  resetCircuitBreaker,
+  withCircuitBreaker,
+} from "../../src/services/circuit-breaker.js";
+import { GitHubRateLimitError } from "../../src/services/github.js";
+
+const createMockEnv = (overrides: Record<string, unknown> = {}) =>
+  ({
+    GITHUB_CIRCUIT_FAILURE_THRESHOLD: 0.5,
+    GITHUB_CIRCUIT_OPEN_SECONDS: 30,
+    ...overrides,
+  }) as unknown as Env;
+
+const failing = () => vi.fn(async () => Promise.reject(new Error("GitHub API error: 503")));
+
+const callTimes = async (fn: () => Promise<unknown>, times: number) => {
+  for (let i = 0; i < times; i++) {
+    await fn().catch(() => undefined);
+  }
+};
+
+describe("withCircuitBreaker", () => {
+  beforeEach(() => {
+    resetCircuitBreaker();
+    vi.useFakeTimers();
+    vi.setSystemTime(new Date("2024-06-01T12:00:00Z"));
+  });
+
+  afterEach(() => {
+    vi.useRealTimers();
+  });
+
+  it("passes calls through while closed", async () => {
+    const env = createMockEnv();
+    const fn = vi.fn(async (value: string) => value);
+
+    const result = await withCircuitBreaker(env, fn)("read");
+
+    expect(result).toBe("read");
+    expect(getCircuitState(env)).toBe("closed");
+  });
+
+  it("opens once the failure rate reaches the threshold", async () => {
+    const env = createMockEnv();
+    const fn = failing();
+    const wrapped = withCircuitBreaker(env, fn);
+
+    await callTimes(wrapped, 10);
+
+    expect(getCircuitState(env)).toBe("open");
+    const error = await wrapped().catch((e: unknown) => e);
+    expect(error).toBeInstanceOf(CircuitOpenError);
+    expect((error as CircuitOpenError).retryAfter).toBe(30);
+    expect(fn).toHaveBeenCalledTimes(10);
+  });
+
+  it("stays closed below the minimum number of calls", async () => {
+    const env = createMockEnv();
+
+    await callTimes(withCircuitBreaker(env, failing()), 9);
+
+    expect(getCircuitState(env)).toBe("closed");
+  });
+
+  it("stays closed while the failure rate is below the threshold", async () => {
+    const env = createMockEnv({ GITHUB_CIRCUIT_FAILURE_THRESHOLD: 0.8 });
+    const fn = vi.fn(async (fail: boolean) => (fail ? Promise.reject(new Error("GitHub API error: 502")) : "read"));
+    const wrapped = withCircuitBreaker(env, fn);
+
+    for (let i = 0; i < 20; i++) {
+      await wrapped(i % 2 === 0).catch(() => undefined);
+    }
+
+    expect(getCircuitState(env)).toBe("closed");
+  });
+
+  it("does not count rate limit errors as failures", async () => {
+    const env = createMockEnv();
+    const fn = vi.fn(async () => Promise.reject(new GitHubRateLimitError("Rate limit exceeded")));
+
+    await callTimes(withCircuitBreaker(env, fn), 20);
+
+    expect(getCircuitState(env)).toBe("closed");
+  });
+
+  it("lets a single trial call through once the open period has passed", async () => {
+    const env = createMockEnv();
+    await callTimes(withCircuitBreaker(env, failing()), 10);
+    vi.advanceTimersByTime(30_000);
+
+    let release: (value: string) => void = () => undefined;
+    const trial = vi.fn(() => new Promise<string>((resolve) => (release = resolve)));
+    const wrapped = withCircuitBreaker(env, trial);
+    const first = wrapped();
+
+    expect(getCircuitState(env)).toBe("half-open");
+    await expect(wrapped()).rejects.toBeInstanceOf(CircuitOpenError);
+    release("read");
+    expect(await first).toBe("read");
+    expect(trial).toHaveBeenCalledOnce();
+    expect(getCircuitState(env)).toBe("closed");
+  });
+
+  it("opens again when the trial call fails", async () => {
+    const env = createMockEnv({ GITHUB_CIRCUIT_OPEN_SECONDS: 10 });
+    const wrapped = withCircuitBreaker(env, failing());
+    await callTimes(wrapped, 10);
+    vi.advanceTimersByTime(10_000);
+
+    await expect(wrapped()).rejects.toThrow("GitHub API error: 503");
+
+    expect(getCircuitState(env)).toBe("open");
+    const error = await wrapped().catch((e: unknown) => e);
+    expect((error as CircuitOpenError).retryAfter).toBe(10);
+  });
+});
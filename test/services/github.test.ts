@@ -1,11 +1,16 @@
 import type { MockInstance } from "vitest";
 import { afterEach, beforeEach, describe, expect, it, vi } from "vitest";
 import {
+  DEFAULT_REQUEST_POLICY,
+  fetchWithRetry,
   GitHubRateLimitError,
+  type GitHubRequestPolicy,
+  getGitHubRequestPolicy,
   getRepositoryPermission,
   hasOperationPermission,
   isValidGitHubRepository,
   mapGitHubPermissions,
+  type PermissionValidator,
 } from "../../src/services/github.js";
 
 describe("isValidGitHubRepository", () => {
@@ -141,6 +146,16 @@ describe("getRepositoryPermission", () => {
       });
     });
 
+    it("calls the API URL of the request policy", async () => {
+      fetchSpy.mockResolvedValueOnce(new Response(JSON.stringify({ private: true }), { status: 200 }));
+      const policy = { ...DEFAULT_REQUEST_POLICY, apiUrl: "http://127.0.0.1:8788" };
+
+      await getRepositoryPermission("ghp_mytoken123", "my-org", "my-repo", undefined, policy);
+
+      const [url] = fetchSpy.mock.calls[0] as [string, RequestInit];
+      expect(url).toBe("http://127.0.0.1:8788/repos/my-org/my-repo");
+    });
+
     it("handles repository without permissions field (public repo)", async () => {
       fetchSpy.mockResolvedValueOnce(
         new Response(
@@ -289,6 +304,91 @@ describe("getRepositoryPermission", () => {
         expect((error as GitHubRateLimitError).retryAfter).toBe(120);
       }
     });
+
+    it("ignores a Retry-After date that cannot be parsed", async () => {
+      fetchSpy.mockResolvedValueOnce(new Response("", { status: 429, headers: { "Retry-After": "later" } }));
+
+      const error = await getRepositoryPermission("ghp_token", "org", "repo").catch((e: unknown) => e);
+
+      expect(error).toBeInstanceOf(GitHubRateLimitError);
+      expect((error as GitHubRateLimitError).retryAfter).toBeUndefined();
+    });
+  });
+
+  describe("conditional requests", () => {
+    const repository = JSON.stringify({ private: true, permissions: { admin: false, push: true, pull: true } });
+
+    it("sends If-None-Match and returns the cached permission on 304", async () => {
+      fetchSpy.mockResolvedValueOnce(new Response(null, { status: 304 }));
+      const validator = { permission: "read" as const, etag: 'W/"abc"' };
+
+      const result = await getRepositoryPermission("ghp_token", "org", "repo", validator);
+
+      const [, options] = fetchSpy.mock.calls[0] as [string, RequestInit];
+      expect(options.headers).toMatchObject({ "If-None-Match": 'W/"abc"' });
+      expect(result).toBe("read");
+      expect(validator.etag).toBe('W/"abc"');
+    });
+
+    it("reports the new ETag when the repository changed", async () => {
+      fetchSpy.mockResolvedValueOnce(new Response(repository, { status: 200, headers: { ETag: 'W/"def"' } }));
+      const validator: PermissionValidator = { permission: "read", etag: 'W/"abc"' };
+
+      const result = await getRepositoryPermission("ghp_token", "org", "repo", validator);
+
+      expect(result).toBe("write");
+      expect(validator.etag).toBe('W/"def"');
+    });
+
+    it.each([
+      ["no validator", undefined],
+      ["a validator without a cached permission", { etag: 'W/"abc"' }],
+    ])("sends an unconditional request with %s", async (_, validator) => {
+      fetchSpy.mockResolvedValueOnce(new Response(repository, { status: 200 }));
+
+      await getRepositoryPermission("ghp_token", "org", "repo", validator);
+
+      const [, options] = fetchSpy.mock.calls[0] as [string, RequestInit];
+      expect(options.headers).not.toHaveProperty("If-None-Match");
+    });
+
+    it("clears the ETag when access is denied", async () => {
+      fetchSpy.mockResolvedValueOnce(new Response("Not Found", { status: 404 }));
+      const validator: PermissionValidator = { permission: "read", etag: 'W/"abc"' };
+
+      const result = await getRepositoryPermission("ghp_token", "org", "repo", validator);
+
+      expect(result).toBe("none");
+      expect(validator.etag).toBeUndefined();
+    });
+  });
+
+  describe("rate-limit reporting", () => {
+    it("reports the remaining budget from the response headers", async () => {
+      fetchSpy.mockResolvedValueOnce(
+        new Response(JSON.stringify({ private: false, permissions: { admin: false, push: false, pull: true } }), {
+          status: 200,
+          headers: { "X-RateLimit-Remaining": "4321", "X-RateLimit-Reset": "1700003600" },
+        })
+      );
+      const validator: PermissionValidator = {};
+
+      await getRepositoryPermission("ghp_token", "org", "repo", validator);
+
+      expect(validator.rateLimit).toEqual({ remaining: 4321, resetAt: 1700003600 });
+    });
+
+    it("reports an exhausted budget before throwing GitHubRateLimitError", async () => {
+      fetchSpy.mockResolvedValueOnce(
+        new Response("", { status: 403, headers: { "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1700003600" } })
+      );
+      const validator: PermissionValidator = {};
+
+      await expect(getRepositoryPermission("ghp_token", "org", "repo", validator)).rejects.toThrow(
+        GitHubRateLimitError
+      );
+      expect(validator.rateLimit).toEqual({ remaining: 0, resetAt: 1700003600 });
+    });
   });
 
   describe("edge cases", () => {
@@ -330,3 +430,152 @@ describe("getRepositoryPermission", () => {
     });
   });
 });
+
+describe("getGitHubRequestPolicy", () => {
+  it("reads the policy from the environment", () => {
+    const env = {
+      GITHUB_API_URL: "https://github.example.com/api/v3/",
+      GITHUB_REQUEST_TIMEOUT_MS: 1000,
+      GITHUB_REQUEST_RETRIES: 3,
+      GITHUB_HEDGE_AFTER_MS: 200,
+    };
+
+    expect(getGitHubRequestPolicy(env as unknown as Env)).toEqual({
+      apiUrl: "https://github.example.com/api/v3",
+      timeoutMs: 1000,
+      retries: 3,
+      hedgeAfterMs: 200,
+    });
+  });
+
+  it("defaults to a single attempt without hedging against api.github.com", () => {
+    expect(getGitHubRequestPolicy({} as Env)).toEqual({
+      apiUrl: "https://api.github.com",
+      timeoutMs: 5000,
+      retries: 0,
+      hedgeAfterMs: 0,
+    });
+  });
+});
+
+describe("fetchWithRetry", () => {
+  const REPO_URL = "https://api.github.com/repos/org/repo";
+  const policy = (overrides: Partial<GitHubRequestPolicy>) => ({ ...DEFAULT_REQUEST_POLICY, ...overrides });
+  let fetchSpy: MockInstance;
+
+  // Never answers; rejects with the abort reason once the attempt times out
+  const hang = (_input: RequestInfo | URL, init?: RequestInit) =>
+    new Promise<Response>((_, reject) => {
+      init?.signal?.addEventListener("abort", () => reject(init.signal?.reason));
+    });
+
+  beforeEach(() => {
+    fetchSpy = vi.spyOn(globalThis, "fetch");
+    vi.spyOn(Math, "random").mockReturnValue(0);
+  });
+
+  afterEach(() => {
+    vi.restoreAllMocks();
+  });
+
+  it("retries 5xx responses up to the configured number of times", async () => {
+    fetchSpy
+      .mockResolvedValueOnce(new Response("", { status: 502 }))
+      .mockResolvedValueOnce(new Response("", { status: 503 }))
+      .mockResolvedValueOnce(new Response("", { status: 200 }));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 2, hedgeAfterMs: 0 }));
+
+    expect(response.status).toBe(200);
+    expect(fetchSpy).toHaveBeenCalledTimes(3);
+  });
+
+  it("returns the last 5xx response once retries are exhausted", async () => {
+    fetchSpy.mockImplementation(async () => new Response("", { status: 503 }));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 1, hedgeAfterMs: 0 }));
+
+    expect(response.status).toBe(503);
+    expect(fetchSpy).toHaveBeenCalledTimes(2);
+  });
+
+  it.each([401, 403, 404, 429])("does not retry %i responses", async (status) => {
+    fetchSpy.mockResolvedValueOnce(new Response("", { status }));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 2, hedgeAfterMs: 0 }));
+
+    expect(response.status).toBe(status);
+    expect(fetchSpy).toHaveBeenCalledOnce();
+  });
+
+  it("retries network errors", async () => {
+    fetchSpy.mockRejectedValueOnce(new TypeError("Network connection lost")).mockResolvedValueOnce(new Response(""));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 1, hedgeAfterMs: 0 }));
+
+    expect(response.status).toBe(200);
+  });
+
+  it("reports timed out attempts as GitHub API errors", async () => {
+    fetchSpy.mockImplementation(hang);
+
+    await expect(fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 10, retries: 1, hedgeAfterMs: 0 }))).rejects.toThrow(
+      "GitHub API error: timeout"
+    );
+    expect(fetchSpy).toHaveBeenCalledTimes(2);
+  });
+
+  it("sends a hedged request when the first one is slow", async () => {
+    fetchSpy.mockImplementationOnce(hang).mockResolvedValueOnce(new Response("hedged"));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 0, hedgeAfterMs: 10 }));
+
+    expect(await response.text()).toBe("hedged");
+    expect(fetchSpy).toHaveBeenCalledTimes(2);
+  });
+
+  it("does not hedge requests that answer in time", async () => {
+    fetchSpy.mockResolvedValueOnce(new Response("first"));
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 0, hedgeAfterMs: 50 }));
+
+    expect(await response.text()).toBe("first");
+    expect(fetchSpy).toHaveBeenCalledOnce();
+  });
+
+  it("prefers a usable hedged response over a 5xx", async () => {
+    let answerPrimary: (response: Response) => void = () => undefined;
+    const primary = new Response("error", { status: 502 });
+    const cancelPrimary = vi.spyOn(primary.body as ReadableStream, "cancel");
+    fetchSpy
+      .mockImplementationOnce(() => new Promise<Response>((resolve) => (answerPrimary = resolve)))
+      .mockImplementationOnce(async () => {
+        answerPrimary(primary);
+        await new Promise((resolve) => setTimeout(resolve, 10));
+        return new Response("hedged");
+      });
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 0, hedgeAfterMs: 10 }));
+
+    expect(await response.text()).toBe("hedged");
+    expect(cancelPrimary).toHaveBeenCalled();
+  });
+
+  it("returns the first attempt and releases the hedged one when both answer 5xx", async () => {
+    const primary = new Response("primary", { status: 502 });
+    const hedged = new Response("hedged", { status: 503 });
+    const cancelHedged = vi.spyOn(hedged.body as ReadableStream, "cancel");
+    fetchSpy
+      .mockImplementationOnce(async () => {
+        await new Promise((resolve) => setTimeout(resolve, 30));
+        return primary;
+      })
+      .mockResolvedValueOnce(hedged);
+
+    const response = await fetchWithRetry(REPO_URL, {}, policy({ timeoutMs: 1000, retries: 0, hedgeAfterMs: 10 }));
+
+    expect(response).toBe(primary);
+    expect(await response.text()).toBe("primary");
+    expect(cancelHedged).toHaveBeenCalled();
+  });
+});
@@ -1,10 +1,12 @@
 import { beforeEach, describe, expect, it, vi } from "vitest";
+import { RequestTimer } from "../../src/lib/timing.js";
 import {
+  deduplicateObjects,
+  processBatchObjects,
   processBatchRequest,
-  processDownloadObject,
-  processUploadObject,
   validateBatchRequest,
 } from "../../src/services/lfs.js";
+import * as manifest from "../../src/services/manifest.js";
 import * as r2 from "../../src/services/r2.js";
 import type { LFSBatchRequest, LFSObjectRequest } from "../../src/types/index.js";
 
@@ -14,6 +16,17 @@ vi.mock("../../src/services/r2.js", () => ({
   generateDownloadUrl: vi.fn(),
   generateUploadUrl: vi.fn(),
   generateObjectKey: vi.fn(),
+  getObjectScope: vi.fn(),
+  getDownloadUrlLifetime: vi.fn(),
+  addReference: vi.fn(),
+  hasReference: vi.fn(),
+  createObjectSigner: vi.fn(),
+}));
+
+// Mock manifest module
+vi.mock("../../src/services/manifest.js", () => ({
+  readManifest: vi.fn(),
+  recordObjects: vi.fn(),
 }));
 
 // Test constants
@@ -25,6 +38,17 @@ const TEST_REPO = "test-repo";
 const TEST_URL_EXPIRY = 600;
 const MOCK_SIGNED_URL = "https://r2.cloudflarestorage.com/bucket/object?signed";
 
+// Signer handed out by createObjectSigner; called once per object that needs a URL
+const signUrl = vi.fn<(oid: string) => Promise<string>>();
+
+const mockObjectSigner = () => {
+  signUrl.mockResolvedValue(MOCK_SIGNED_URL);
+  vi.mocked(r2.createObjectSigner).mockReturnValue(signUrl);
+};
+
+// Manifest lookup result listing the given objects; the shards are only passed through to recordObjects
+const manifestListing = (entries: [string, number][] = []) => ({ sizes: new Map(entries), shards: new Map() });
+
 const createMockEnv = (overrides: Record<string, unknown> = {}) =>
   ({
     URL_EXPIRY: TEST_URL_EXPIRY,
@@ -34,6 +58,10 @@ const createMockEnv = (overrides: Record<string, unknown> = {}) =>
 describe("LFS Service", () => {
   beforeEach(() => {
     vi.clearAllMocks();
+    vi.mocked(manifest.readManifest).mockResolvedValue(manifestListing());
+    vi.mocked(manifest.recordObjects).mockResolvedValue();
+    vi.mocked(r2.getObjectScope).mockReturnValue("repo");
+    vi.mocked(r2.getDownloadUrlLifetime).mockImplementation((env) => env.URL_EXPIRY);
   });
 
   describe("validateBatchRequest", () => {
@@ -128,6 +156,20 @@ describe("LFS Service", () => {
 
         expect(result.valid).toBe(true);
       });
+
+      it.each([
+        [250, 250, true],
+        [250, 251, false],
+        [10, 11, false],
+      ])("uses a configured limit of %i objects (%i objects valid: %s)", (maxObjects, count, expected) => {
+        const objects = Array.from({ length: count }, (_, i) => ({
+          oid: `${i.toString(16).padStart(4, "0")}${"a".repeat(60)}`,
+          size: VALID_SIZE,
+        }));
+        const result = validateBatchRequest({ operation: "upload", objects }, maxObjects);
+
+        expect(result.valid).toBe(expected);
+      });
     });
 
     describe("invalid object OID", () => {
@@ -230,125 +272,34 @@ describe("LFS Service", () => {
     });
   });
 
-  describe("processDownloadObject", () => {
-    const env = createMockEnv();
-
-    it("always returns download action with pre-signed URL", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
-
-      const result = await processDownloadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.oid).toBe(VALID_OID);
-      expect(result.size).toBe(VALID_SIZE);
-      expect(result.authenticated).toBe(true);
-      expect(result.actions?.download).toBeDefined();
-      expect(result.actions?.download?.href).toBe(MOCK_SIGNED_URL);
-      expect(result.actions?.download?.expires_in).toBe(TEST_URL_EXPIRY);
-      expect(result.error).toBeUndefined();
-    });
-
-    it("does not call objectExists (HEAD check skipped for performance)", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
-
-      await processDownloadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(r2.objectExists).not.toHaveBeenCalled();
-    });
-
-    it("calls generateDownloadUrl with correct parameters", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
-
-      await processDownloadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(r2.generateDownloadUrl).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, VALID_OID);
+  describe("deduplicateObjects", () => {
+    it("maps every position to its unique object", () => {
+      const objects: LFSObjectRequest[] = [
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID_2, size: 2048 },
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID_2, size: 2048 },
+      ];
+
+      const { unique, positions } = deduplicateObjects(objects);
+
+      expect(unique).toEqual([
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID_2, size: 2048 },
+      ]);
+      expect(positions).toEqual([0, 1, 0, 1]);
     });
 
-    it("returns 500 error when generateDownloadUrl throws", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.generateDownloadUrl).mockRejectedValue(new Error("Signing failed"));
+    it("keeps entries with the same OID but different sizes apart", () => {
+      const objects: LFSObjectRequest[] = [
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID, size: 2048 },
+      ];
 
-      const result = await processDownloadObject(env, TEST_ORG, TEST_REPO, obj);
+      const { unique, positions } = deduplicateObjects(objects);
 
-      expect(result.error).toEqual({ code: 500, message: "Storage service error" });
-    });
-  });
-
-  describe("processUploadObject", () => {
-    const env = createMockEnv();
-
-    it("returns upload action for non-existent object", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
-      vi.mocked(r2.generateUploadUrl).mockResolvedValue(MOCK_SIGNED_URL);
-
-      const result = await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.oid).toBe(VALID_OID);
-      expect(result.size).toBe(VALID_SIZE);
-      expect(result.authenticated).toBe(true);
-      expect(result.actions?.upload).toBeDefined();
-      expect(result.actions?.upload?.href).toBe(MOCK_SIGNED_URL);
-      expect(result.actions?.upload?.expires_in).toBe(TEST_URL_EXPIRY);
-      expect(result.error).toBeUndefined();
-    });
-
-    it("returns no actions for already existing object with same size", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: VALID_SIZE });
-
-      const result = await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.oid).toBe(VALID_OID);
-      expect(result.size).toBe(VALID_SIZE);
-      expect(result.authenticated).toBe(true);
-      expect(result.actions).toBeUndefined();
-      expect(result.error).toBeUndefined();
-    });
-
-    it("returns 422 error for existing object with different size", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: 2048 });
-
-      const result = await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.error).toEqual({
-        code: 422,
-        message: "Object size mismatch",
-      });
-      expect(result.actions).toBeUndefined();
-    });
-
-    it("calls objectExists with correct parameters", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
-      vi.mocked(r2.generateUploadUrl).mockResolvedValue(MOCK_SIGNED_URL);
-
-      await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(r2.objectExists).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, VALID_OID);
-    });
-
-    it("returns 500 error when objectExists throws", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockRejectedValue(new Error("R2 service unavailable"));
-
-      const result = await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.error).toEqual({ code: 500, message: "Storage service error" });
-      expect(result.actions).toBeUndefined();
-    });
-
-    it("returns 500 error when generateUploadUrl throws", async () => {
-      const obj: LFSObjectRequest = { oid: VALID_OID, size: VALID_SIZE };
-      vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
-      vi.mocked(r2.generateUploadUrl).mockRejectedValue(new Error("Signing failed"));
-
-      const result = await processUploadObject(env, TEST_ORG, TEST_REPO, obj);
-
-      expect(result.error).toEqual({ code: 500, message: "Storage service error" });
+      expect(unique).toHaveLength(2);
+      expect(positions).toEqual([0, 1]);
     });
   });
 
@@ -364,7 +315,7 @@ describe("LFS Service", () => {
             { oid: VALID_OID_2, size: 2048 },
           ],
         };
-        vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -374,6 +325,40 @@ describe("LFS Service", () => {
         expect(result.objects.at(1)?.actions?.download).toBeDefined();
         expect(r2.objectExists).not.toHaveBeenCalled();
       });
+
+      it("signs every object with one signer for the batch", async () => {
+        const request: LFSBatchRequest = {
+          operation: "download",
+          objects: [
+            { oid: VALID_OID, size: VALID_SIZE },
+            { oid: VALID_OID_2, size: 2048 },
+          ],
+        };
+        mockObjectSigner();
+
+        await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(r2.createObjectSigner).toHaveBeenCalledTimes(1);
+        expect(r2.createObjectSigner).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, "GET");
+        expect(signUrl.mock.calls).toEqual([[VALID_OID], [VALID_OID_2]]);
+        expect(r2.generateDownloadUrl).not.toHaveBeenCalled();
+      });
+
+      it("returns 500 error for every object when signing fails", async () => {
+        const request: LFSBatchRequest = {
+          operation: "download",
+          objects: [
+            { oid: VALID_OID, size: VALID_SIZE },
+            { oid: VALID_OID_2, size: 2048 },
+          ],
+        };
+        mockObjectSigner();
+        signUrl.mockRejectedValue(new Error("Signing failed"));
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(result.objects.map((obj) => obj.error?.code)).toEqual([500, 500]);
+      });
     });
 
     describe("upload operation", () => {
@@ -383,7 +368,7 @@ describe("LFS Service", () => {
           objects: [{ oid: VALID_OID, size: VALID_SIZE }],
         };
         vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
-        vi.mocked(r2.generateUploadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -391,6 +376,20 @@ describe("LFS Service", () => {
         expect(result.objects.at(0)?.actions?.upload).toBeDefined();
       });
 
+      it("records the manifest, R2 and signing stages", async () => {
+        const request: LFSBatchRequest = {
+          operation: "upload",
+          objects: [{ oid: VALID_OID, size: VALID_SIZE }],
+        };
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
+        mockObjectSigner();
+        const timer = new RequestTimer();
+
+        await processBatchRequest(env, TEST_ORG, TEST_REPO, request, timer);
+
+        expect(Object.keys(timer.toJSON())).toEqual(expect.arrayContaining(["manifest", "r2", "sign"]));
+      });
+
       it("skips upload for already existing objects", async () => {
         const request: LFSBatchRequest = {
           operation: "upload",
@@ -402,6 +401,28 @@ describe("LFS Service", () => {
 
         expect(result.objects.at(0)?.actions).toBeUndefined();
         expect(result.objects.at(0)?.error).toBeUndefined();
+        expect(signUrl).not.toHaveBeenCalled();
+      });
+
+      it("only signs objects that do not exist yet", async () => {
+        const request: LFSBatchRequest = {
+          operation: "upload",
+          objects: [
+            { oid: VALID_OID, size: VALID_SIZE },
+            { oid: VALID_OID_2, size: 2048 },
+          ],
+        };
+        vi.mocked(r2.objectExists)
+          .mockResolvedValueOnce({ exists: true, size: VALID_SIZE })
+          .mockResolvedValueOnce({ exists: false });
+        mockObjectSigner();
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(r2.createObjectSigner).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, "PUT");
+        expect(signUrl.mock.calls).toEqual([[VALID_OID_2]]);
+        expect(result.objects.at(0)?.actions).toBeUndefined();
+        expect(result.objects.at(1)?.actions?.upload?.href).toBe(MOCK_SIGNED_URL);
       });
     });
 
@@ -411,7 +432,7 @@ describe("LFS Service", () => {
           operation: "download",
           objects: [{ oid: VALID_OID, size: VALID_SIZE }],
         };
-        vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -424,7 +445,7 @@ describe("LFS Service", () => {
           hash_algo: "sha256",
           objects: [{ oid: VALID_OID, size: VALID_SIZE }],
         };
-        vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -439,7 +460,7 @@ describe("LFS Service", () => {
             { oid: VALID_OID_2, size: 2048 },
           ],
         };
-        vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -448,6 +469,222 @@ describe("LFS Service", () => {
       });
     });
 
+    describe("duplicate OIDs", () => {
+      const duplicated: LFSObjectRequest[] = [
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID_2, size: 2048 },
+        { oid: VALID_OID, size: VALID_SIZE },
+      ];
+
+      it("signs each unique download once", async () => {
+        mockObjectSigner();
+
+        const request: LFSBatchRequest = { operation: "download", objects: duplicated };
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(signUrl.mock.calls).toEqual([[VALID_OID], [VALID_OID_2]]);
+        expect(result.objects.map((obj) => obj.oid)).toEqual([VALID_OID, VALID_OID_2, VALID_OID]);
+        expect(result.objects.at(2)?.actions?.download?.href).toBe(MOCK_SIGNED_URL);
+      });
+
+      it("checks each unique upload once", async () => {
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
+        mockObjectSigner();
+
+        const request: LFSBatchRequest = { operation: "upload", objects: duplicated };
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(r2.objectExists).toHaveBeenCalledTimes(2);
+        expect(result.objects).toHaveLength(3);
+        expect(result.objects.at(2)?.actions?.upload).toBeDefined();
+      });
+    });
+
+    describe("upload existence manifest", () => {
+      it("skips the HEAD check for objects listed in the manifest", async () => {
+        const request: LFSBatchRequest = {
+          operation: "upload",
+          objects: [
+            { oid: VALID_OID, size: VALID_SIZE },
+            { oid: VALID_OID_2, size: 2048 },
+          ],
+        };
+        vi.mocked(manifest.readManifest).mockResolvedValue(manifestListing([[VALID_OID, VALID_SIZE]]));
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
+        mockObjectSigner();
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(r2.objectExists).toHaveBeenCalledTimes(1);
+        expect(r2.objectExists).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, VALID_OID_2);
+        expect(result.objects.at(0)?.actions).toBeUndefined();
+        expect(result.objects.at(0)?.error).toBeUndefined();
+        expect(result.objects.at(1)?.actions?.upload).toBeDefined();
+      });
+
+      it("reports a size mismatch for manifest entries with a different size", async () => {
+        const request: LFSBatchRequest = { operation: "upload", objects: [{ oid: VALID_OID, size: VALID_SIZE }] };
+        vi.mocked(manifest.readManifest).mockResolvedValue(manifestListing([[VALID_OID, 1]]));
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(result.objects.at(0)?.error?.code).toBe(422);
+        expect(r2.objectExists).not.toHaveBeenCalled();
+      });
+
+      it("records objects confirmed by HEAD checks", async () => {
+        const request: LFSBatchRequest = {
+          operation: "upload",
+          objects: [
+            { oid: VALID_OID, size: VALID_SIZE },
+            { oid: VALID_OID_2, size: 2048 },
+          ],
+        };
+        const current = manifestListing();
+        vi.mocked(manifest.readManifest).mockResolvedValue(current);
+        vi.mocked(r2.objectExists)
+          .mockResolvedValueOnce({ exists: true, size: VALID_SIZE })
+          .mockResolvedValueOnce({ exists: false });
+        mockObjectSigner();
+
+        await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(manifest.recordObjects).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, current, [
+          { oid: VALID_OID, size: VALID_SIZE },
+        ]);
+      });
+
+      it("falls back to HEAD checks when the manifest cannot be read", async () => {
+        const request: LFSBatchRequest = { operation: "upload", objects: [{ oid: VALID_OID, size: VALID_SIZE }] };
+        vi.mocked(manifest.readManifest).mockRejectedValue(new Error("R2 unavailable"));
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: VALID_SIZE });
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(r2.objectExists).toHaveBeenCalledTimes(1);
+        expect(result.objects.at(0)?.error).toBeUndefined();
+        expect(manifest.recordObjects).not.toHaveBeenCalled();
+      });
+
+      it("ignores manifest write failures", async () => {
+        const request: LFSBatchRequest = { operation: "upload", objects: [{ oid: VALID_OID, size: VALID_SIZE }] };
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: VALID_SIZE });
+        vi.mocked(manifest.recordObjects).mockRejectedValue(new Error("R2 unavailable"));
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(result.objects.at(0)?.error).toBeUndefined();
+      });
+    });
+
+    describe("shared object store", () => {
+      const pair: LFSObjectRequest[] = [
+        { oid: VALID_OID, size: VALID_SIZE },
+        { oid: VALID_OID_2, size: 2048 },
+      ];
+
+      beforeEach(() => {
+        vi.mocked(r2.getObjectScope).mockReturnValue("org");
+        vi.mocked(r2.addReference).mockResolvedValue();
+        mockObjectSigner();
+      });
+
+      it("does not touch reference records in the repo scope", async () => {
+        vi.mocked(r2.getObjectScope).mockReturnValue("repo");
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
+
+        await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "upload", objects: pair });
+        await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "download", objects: pair });
+
+        expect(r2.addReference).not.toHaveBeenCalled();
+        expect(r2.hasReference).not.toHaveBeenCalled();
+      });
+
+      it("references objects stored by another repository without uploading them again", async () => {
+        vi.mocked(r2.objectExists)
+          .mockResolvedValueOnce({ exists: true, size: VALID_SIZE })
+          .mockResolvedValueOnce({ exists: false });
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "upload", objects: pair });
+
+        expect(result.objects.at(0)?.actions).toBeUndefined();
+        expect(result.objects.at(0)?.error).toBeUndefined();
+        expect(result.objects.at(1)?.actions?.upload).toBeDefined();
+        expect(r2.addReference).toHaveBeenCalledTimes(2);
+        expect(r2.addReference).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, VALID_OID);
+        expect(r2.addReference).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, VALID_OID_2);
+      });
+
+      it("skips reference writes for manifest entries and rejected objects", async () => {
+        vi.mocked(manifest.readManifest).mockResolvedValue(manifestListing([[VALID_OID, VALID_SIZE]]));
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: 1 });
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "upload", objects: pair });
+
+        expect(result.objects.at(1)?.error?.code).toBe(422);
+        expect(r2.addReference).not.toHaveBeenCalled();
+      });
+
+      it("returns 500 and does not record objects whose reference cannot be written", async () => {
+        vi.mocked(r2.objectExists).mockResolvedValue({ exists: true, size: VALID_SIZE });
+        vi.mocked(r2.addReference).mockRejectedValue(new Error("R2 unavailable"));
+        const request: LFSBatchRequest = { operation: "upload", objects: [{ oid: VALID_OID, size: VALID_SIZE }] };
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
+
+        expect(result.objects.at(0)?.error?.code).toBe(500);
+        expect(manifest.recordObjects).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, expect.anything(), []);
+      });
+
+      it("only signs downloads for referenced objects", async () => {
+        vi.mocked(r2.hasReference).mockResolvedValueOnce(true).mockResolvedValueOnce(false);
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "download", objects: pair });
+
+        expect(result.objects.at(0)?.actions?.download).toBeDefined();
+        expect(result.objects.at(1)?.error?.code).toBe(404);
+        expect(signUrl.mock.calls).toEqual([[VALID_OID]]);
+      });
+
+      it("treats manifest entries as referenced", async () => {
+        vi.mocked(manifest.readManifest).mockResolvedValue(manifestListing([[VALID_OID, VALID_SIZE]]));
+        vi.mocked(r2.hasReference).mockRejectedValue(new Error("R2 unavailable"));
+
+        const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, { operation: "download", objects: pair });
+
+        expect(r2.hasReference).toHaveBeenCalledTimes(1);
+        expect(result.objects.at(0)?.actions?.download).toBeDefined();
+        expect(result.objects.at(1)?.error?.code).toBe(500);
+      });
+    });
+
+    describe("concurrency", () => {
+      it.each([
+        [undefined, 32],
+        [4, 4],
+      ])("limits concurrent existence checks (OBJECT_CONCURRENCY=%s)", async (configured, expected) => {
+        const concurrencyEnv = createMockEnv({ OBJECT_CONCURRENCY: configured });
+        const objects = Array.from({ length: 50 }, (_, i) => ({
+          oid: `${i.toString(16).padStart(4, "0")}${"a".repeat(60)}`,
+          size: VALID_SIZE,
+        }));
+        let active = 0;
+        let maxActive = 0;
+        vi.mocked(r2.objectExists).mockImplementation(async () => {
+          active++;
+          maxActive = Math.max(maxActive, active);
+          await new Promise((resolve) => setTimeout(resolve, 1));
+          active--;
+          return { exists: true, size: VALID_SIZE };
+        });
+
+        const result = await processBatchRequest(concurrencyEnv, TEST_ORG, TEST_REPO, { operation: "upload", objects });
+
+        expect(result.objects).toHaveLength(50);
+        expect(maxActive).toBe(expected);
+      });
+    });
+
     describe("per-object error handling", () => {
       it("does not fail upload batch for individual object errors", async () => {
         const request: LFSBatchRequest = {
@@ -460,7 +697,7 @@ describe("LFS Service", () => {
         vi.mocked(r2.objectExists)
           .mockResolvedValueOnce({ exists: true, size: 9999 }) // size mismatch = error
           .mockResolvedValueOnce({ exists: false }); // new object = upload action
-        vi.mocked(r2.generateUploadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
 
@@ -480,10 +717,10 @@ describe("LFS Service", () => {
           objects: [{ oid: VALID_OID, size: VALID_SIZE }],
         };
         if (operation === "download") {
-          vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+          mockObjectSigner();
         } else {
           vi.mocked(r2.objectExists).mockResolvedValue({ exists: false });
-          vi.mocked(r2.generateUploadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+          mockObjectSigner();
         }
 
         const result = await processBatchRequest(env, TEST_ORG, TEST_REPO, request);
@@ -498,7 +735,7 @@ describe("LFS Service", () => {
           operation: "download",
           objects: [{ oid: VALID_OID, size: VALID_SIZE }],
         };
-        vi.mocked(r2.generateDownloadUrl).mockResolvedValue(MOCK_SIGNED_URL);
+        mockObjectSigner();
 
         const result = await processBatchRequest(customEnv, TEST_ORG, TEST_REPO, request);
 
@@ -506,4 +743,50 @@ describe("LFS Service", () => {
       });
     });
   });
+
+  describe("processBatchObjects", () => {
+    const env = createMockEnv();
+
+    it("settles each object as soon as it is ready", async () => {
+      let releaseFirst: (result: r2.ObjectExistsResult) => void = () => undefined;
+      vi.mocked(r2.objectExists)
+        .mockReturnValueOnce(new Promise((resolve) => (releaseFirst = resolve)))
+        .mockResolvedValueOnce({ exists: false });
+      mockObjectSigner();
+      const request: LFSBatchRequest = {
+        operation: "upload",
+        objects: [
+          { oid: VALID_OID, size: VALID_SIZE },
+          { oid: VALID_OID_2, size: 2048 },
+        ],
+      };
+
+      const { response, done } = processBatchObjects(env, TEST_ORG, TEST_REPO, request);
+      const second = await response.objects[1];
+
+      expect(second?.actions?.upload?.href).toBe(MOCK_SIGNED_URL);
+      expect(manifest.recordObjects).not.toHaveBeenCalled();
+
+      releaseFirst({ exists: true, size: VALID_SIZE });
+      const first = await response.objects[0];
+      await done;
+
+      expect(first?.actions).toBeUndefined();
+      expect(manifest.recordObjects).toHaveBeenCalledWith(env, TEST_ORG, TEST_REPO, expect.anything(), [
+        { oid: VALID_OID, size: VALID_SIZE },
+      ]);
+    });
+
+    it("fails every unsettled object on an unexpected error without rejecting done", async () => {
+      vi.mocked(r2.createObjectSigner).mockImplementation(() => {
+        throw new Error("Missing credentials");
+      });
+      const request: LFSBatchRequest = { operation: "download", objects: [{ oid: VALID_OID, size: VALID_SIZE }] };
+
+      const { response, done } = processBatchObjects(env, TEST_ORG, TEST_REPO, request);
+
+      await expect(done).resolves.toBeUndefined();
+      await expect(response.objects[0]).rejects.toThrow("Missing credentials");
+    });
+  });
 });
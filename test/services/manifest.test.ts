@@ -0,0 +1,216 @@
+import { beforeEach, describe, expect, it, vi } from "vitest";
+import {
+  clearManifestCache,
+  generateManifestKey,
+  parseManifest,
+  readManifest,
+  recordObjects,
+  serializeManifest,
+} from "../../src/services/manifest.js";
+
+// Test constants
+const OID_A = "a".repeat(64);
+const OID_B = "b".repeat(64);
+const OID_C = "c".repeat(64);
+// Same shard as OID_A
+const OID_A2 = `${"a".repeat(63)}f`;
+const OID_A3 = `${"a".repeat(63)}e`;
+const TEST_ORG = "test-org";
+const TEST_REPO = "test-repo";
+
+interface StoredShard {
+  body: string;
+  etag: string;
+}
+
+interface ConditionalOptions {
+  onlyIf?: { etagMatches?: string };
+}
+
+const shardKey = (prefix: string) => generateManifestKey(TEST_ORG, TEST_REPO, prefix);
+
+// Mock R2 bucket - only mock get/put with the conditional behaviour used by the manifest service
+function createMockBucket(initial: Record<string, StoredShard> = {}) {
+  const stored = new Map(Object.entries(initial));
+  let version = 0;
+  return {
+    get: vi.fn(async (key: string) => {
+      const shard = stored.get(key);
+      if (!shard) return null;
+      const { body, etag } = shard;
+      return { etag, text: async () => body };
+    }),
+    put: vi.fn(async (key: string, body: string, options?: ConditionalOptions) => {
+      if (options?.onlyIf?.etagMatches !== undefined && options.onlyIf.etagMatches !== stored.get(key)?.etag) {
+        return null;
+      }
+      const etag = `etag-${++version}`;
+      stored.set(key, { body, etag });
+      return { etag };
+    }),
+  };
+}
+
+describe("manifest service", () => {
+  beforeEach(() => {
+    clearManifestCache();
+  });
+
+  describe("generateManifestKey", () => {
+    it("uses a prefix that cannot collide with organization names", () => {
+      expect(generateManifestKey(TEST_ORG, TEST_REPO, "ab")).toBe(".manifests/test-org/test-repo/ab");
+    });
+  });
+
+  describe("parseManifest/serializeManifest", () => {
+    it("round-trips entries sorted by OID", () => {
+      const text = serializeManifest(
+        new Map([
+          [OID_B, 20],
+          [OID_A, 10],
+        ])
+      );
+
+      expect(text).toBe(`${OID_A} 10\n${OID_B} 20\n`);
+      expect(parseManifest(text)).toEqual(
+        new Map([
+          [OID_A, 10],
+          [OID_B, 20],
+        ])
+      );
+    });
+
+    it.each([
+      ["invalid OID", `${"z".repeat(64)} 10`],
+      ["missing size", OID_A],
+      ["negative size", `${OID_A} -1`],
+      ["non-numeric size", `${OID_A} abc`],
+      ["empty line", ""],
+    ])("skips lines with %s", (_, line) => {
+      expect(parseManifest(`${line}\n${OID_B} 5\n`)).toEqual(new Map([[OID_B, 5]]));
+    });
+  });
+
+  describe("readManifest", () => {
+    it("returns an empty manifest when none is stored", async () => {
+      const env = createMockEnv(createMockBucket());
+
+      const manifest = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A]);
+
+      expect(manifest).toEqual({ sizes: new Map(), shards: new Map([["a", { etag: null, sizes: new Map() }]]) });
+    });
+
+    it("returns the sizes of the requested objects", async () => {
+      const env = createMockEnv(
+        createMockBucket({ [shardKey("a")]: { body: `${OID_A} 10\n${OID_A2} 11\n`, etag: "etag-0" } })
+      );
+
+      const manifest = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A, OID_B]);
+
+      expect(manifest.sizes).toEqual(new Map([[OID_A, 10]]));
+      expect(manifest.shards.get("a")?.etag).toBe("etag-0");
+    });
+
+    it("only reads the shards of the requested objects", async () => {
+      const bucket = createMockBucket({
+        [shardKey("a")]: { body: `${OID_A} 10\n`, etag: "etag-0" },
+        [shardKey("b")]: { body: `${OID_B} 20\n`, etag: "etag-0" },
+      });
+
+      await readManifest(createMockEnv(bucket), TEST_ORG, TEST_REPO, [OID_A, OID_A]);
+
+      expect(bucket.get).toHaveBeenCalledOnce();
+      expect(bucket.get).toHaveBeenCalledWith(shardKey("a"));
+    });
+
+    it("trusts cached shards, including missing ones, without reading R2 again", async () => {
+      const bucket = createMockBucket({ [shardKey("a")]: { body: `${OID_A} 10\n`, etag: "etag-0" } });
+      const env = createMockEnv(bucket);
+
+      const first = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A, OID_B]);
+      const second = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A, OID_B]);
+
+      expect(second.shards.get("a")).toBe(first.shards.get("a"));
+      expect(second.sizes).toEqual(new Map([[OID_A, 10]]));
+      expect(bucket.get).toHaveBeenCalledTimes(2);
+    });
+
+    it("needs fewer R2 calls for a 100-object batch than a HEAD per object", async () => {
+      // Spread over every shard, like real SHA-256 OIDs
+      const oids = Array.from({ length: 100 }, (_, i) => (i % 16).toString(16) + i.toString(16).padStart(63, "0"));
+      const bucket = createMockBucket();
+      const env = createMockEnv(bucket);
+
+      // First push: every shard is read once, then the confirmed objects are recorded
+      const pushed = await readManifest(env, TEST_ORG, TEST_REPO, oids);
+      await recordObjects(env, TEST_ORG, TEST_REPO, pushed, oids.map((oid) => ({ oid, size: 1 })));
+      expect(bucket.get).toHaveBeenCalledTimes(16);
+      expect(bucket.put).toHaveBeenCalledTimes(16);
+
+      // Re-push: answered from the cached shards
+      bucket.get.mockClear();
+      bucket.put.mockClear();
+      const repushed = await readManifest(env, TEST_ORG, TEST_REPO, oids);
+
+      expect(repushed.sizes.size).toBe(100);
+      expect(bucket.get.mock.calls.length + bucket.put.mock.calls.length).toBe(0);
+
+      // A cold isolate reads each shard once instead of sending 100 HEADs
+      clearManifestCache();
+      await readManifest(env, TEST_ORG, TEST_REPO, oids);
+      expect(bucket.get.mock.calls.length).toBeLessThan(oids.length);
+    });
+  });
+
+  describe("recordObjects", () => {
+    it("merges new objects into their shard", async () => {
+      const bucket = createMockBucket({ [shardKey("a")]: { body: `${OID_A2} 20\n`, etag: "etag-0" } });
+      const env = createMockEnv(bucket);
+      const manifest = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A]);
+
+      await recordObjects(env, TEST_ORG, TEST_REPO, manifest, [{ oid: OID_A, size: 10 }]);
+
+      expect(bucket.put).toHaveBeenCalledWith(shardKey("a"), `${OID_A} 10\n${OID_A2} 20\n`, {
+        onlyIf: { etagMatches: "etag-0" },
+      });
+      const updated = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A]);
+      expect(updated.sizes.get(OID_A)).toBe(10);
+    });
+
+    it("only rewrites the shards of new objects", async () => {
+      const bucket = createMockBucket();
+      const env = createMockEnv(bucket);
+      const manifest = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A, OID_B, OID_C]);
+
+      await recordObjects(env, TEST_ORG, TEST_REPO, manifest, [
+        { oid: OID_A, size: 10 },
+        { oid: OID_C, size: 30 },
+      ]);
+
+      expect(bucket.put.mock.calls.map(([key]) => key).sort()).toEqual([shardKey("a"), shardKey("c")]);
+    });
+
+    it("does not write when there is nothing to record", async () => {
+      const bucket = createMockBucket();
+      const env = createMockEnv(bucket);
+
+      await recordObjects(env, TEST_ORG, TEST_REPO, { sizes: new Map(), shards: new Map() }, []);
+
+      expect(bucket.put).not.toHaveBeenCalled();
+    });
+
+    it("drops the update and reads the shard again when another writer changed it first", async () => {
+      const bucket = createMockBucket({ [shardKey("a")]: { body: `${OID_A} 10\n`, etag: "etag-0" } });
+      const env = createMockEnv(bucket);
+      const manifest = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A, OID_A2]);
+      await recordObjects(env, TEST_ORG, TEST_REPO, manifest, [{ oid: OID_A2, size: 20 }]);
+
+      await recordObjects(env, TEST_ORG, TEST_REPO, manifest, [{ oid: OID_A3, size: 30 }]);
+
+      const current = await readManifest(env, TEST_ORG, TEST_REPO, [OID_A2, OID_A3]);
+      expect(bucket.get).toHaveBeenCalledTimes(2);
+      expect(current.sizes.has(OID_A2)).toBe(true);
+      expect(current.sizes.has(OID_A3)).toBe(false);
+    });
+  });
+});
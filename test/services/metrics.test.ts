@@ -0,0 +1,48 @@
+import { describe, expect, it, vi } from "vitest";
+import { RequestTimer } from "../../src/lib/timing.js";
+import { getCacheResult, writeBatchMetrics } from "../../src/services/metrics.js";
+
+const createTimer = (counts: Record<string, number> = {}, durations: Record<string, number> = {}) => {
+  const timer = new RequestTimer();
+  for (const [name, amount] of Object.entries(counts)) {
+    timer.count(name, amount);
+  }
+  for (const [name, duration] of Object.entries(durations)) {
+    timer.record(name, duration);
+  }
+  return timer;
+};
+
+describe("getCacheResult", () => {
+  it.each([
+    ["memory", { "cache.memory": 1 }, {}],
+    ["kv", { "cache.kv": 1 }, { kv: 3 }],
+    ["stale", { "cache.stale": 1 }, { kv: 3, github: 40 }],
+    ["miss", {}, { kv: 3, github: 40 }],
+    ["none", {}, {}],
+  ])("returns %s", (expected, counts, durations) => {
+    expect(getCacheResult(createTimer(counts, durations))).toBe(expected);
+  });
+});
+
+describe("writeBatchMetrics", () => {
+  it("writes one datapoint indexed by organization", () => {
+    const writeDataPoint = vi.fn();
+    const env = { METRICS: { writeDataPoint } } as unknown as Env;
+    const timer = createTimer({ "r2.head": 3 }, { kv: 2, github: 45, total: 60 });
+
+    writeBatchMetrics(env, { org: "test-org", operation: "upload", objects: 4, status: 200, timer });
+
+    expect(writeDataPoint).toHaveBeenCalledWith({
+      indexes: ["test-org"],
+      blobs: ["upload", "miss", "200"],
+      doubles: [4, 45, 3, 200, 60],
+    });
+  });
+
+  it("does nothing without the METRICS binding", () => {
+    expect(() =>
+      writeBatchMetrics({} as Env, { org: "o", operation: "unknown", objects: 0, status: 401, timer: createTimer() })
+    ).not.toThrow();
+  });
+});
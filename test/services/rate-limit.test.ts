@@ -0,0 +1,71 @@
+import { beforeEach, describe, expect, it } from "vitest";
+import {
+  clearRateLimits,
+  getRateLimit,
+  parseRateLimit,
+  parseRetryAfter,
+  recordRateLimit,
+} from "../../src/services/rate-limit.js";
+
+const NOW = 1_700_000_000_000;
+
+describe("parseRateLimit", () => {
+  it.each([
+    [{ "X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "1700003600" }, { remaining: 4999, resetAt: 1700003600 }],
+    [{ "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1700000060" }, { remaining: 0, resetAt: 1700000060 }],
+    [{ "Retry-After": "30", "X-RateLimit-Remaining": "12" }, { remaining: 0, resetAt: 1700000030 }],
+    [{ "Retry-After": "Tue, 14 Nov 2023 22:14:20 GMT" }, { remaining: 0, resetAt: 1700000060 }],
+    [{ "Retry-After": "soon", "X-RateLimit-Reset": "1700000600" }, { remaining: 0, resetAt: 1700000600 }],
+    [{ "Retry-After": "soon" }, { remaining: 0, resetAt: 1700000060 }],
+    [{ "X-RateLimit-Remaining": "many", "X-RateLimit-Reset": "1700003600" }, null],
+    [{ "X-RateLimit-Remaining": "10" }, null],
+    [{}, null],
+  ])("parses %o to %o", (headers, expected) => {
+    expect(parseRateLimit(new Headers(headers), NOW)).toEqual(expected);
+  });
+});
+
+describe("parseRetryAfter", () => {
+  it.each([
+    ["120", 120],
+    ["Tue, 14 Nov 2023 22:14:20 GMT", 60],
+    ["Tue, 14 Nov 2023 22:00:00 GMT", 0],
+    ["soon", undefined],
+    [null, undefined],
+  ])("parses %s to %s", (value, expected) => {
+    expect(parseRetryAfter(value, NOW)).toBe(expected);
+  });
+});
+
+describe("recordRateLimit / getRateLimit", () => {
+  beforeEach(() => {
+    clearRateLimits();
+  });
+
+  it("returns the last recorded budget for a token hash", () => {
+    recordRateLimit("hash", { remaining: 100, resetAt: 1700000060 }, NOW);
+    recordRateLimit("hash", { remaining: 99, resetAt: 1700000060 }, NOW);
+
+    expect(getRateLimit("hash", NOW)).toEqual({ remaining: 99, resetAt: 1700000060 });
+    expect(getRateLimit("other", NOW)).toBeUndefined();
+  });
+
+  it("forgets the budget once it resets", () => {
+    recordRateLimit("hash", { remaining: 0, resetAt: 1700000060 }, NOW);
+
+    expect(getRateLimit("hash", NOW + 59_999)).toBeDefined();
+    expect(getRateLimit("hash", NOW + 60_000)).toBeUndefined();
+  });
+
+  it("ignores budgets with a non-finite reset", () => {
+    recordRateLimit("hash", { remaining: 0, resetAt: Number.NaN }, NOW);
+
+    expect(getRateLimit("hash", NOW)).toBeUndefined();
+  });
+
+  it("does not record budgets that have already reset", () => {
+    recordRateLimit("hash", { remaining: 0, resetAt: 1699999999 }, NOW);
+
+    expect(getRateLimit("hash", NOW)).toBeUndefined();
+  });
+});